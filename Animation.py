@@ -0,0 +1,181 @@
+import math
+from collections import OrderedDict
+
+import pygame
+
+from Card import Card
+
+
+class FrameCache:
+    """LRU cache of pre-rendered animation frames, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.misses = 0
+        self._frames = OrderedDict()
+
+    def get(self, key):
+        frames = self._frames.get(key)
+        if frames is not None:
+            self._frames.move_to_end(key)
+        else:
+            self.misses += 1
+        return frames
+
+    def __contains__(self, key):
+        return key in self._frames
+
+    def put(self, key, frames):
+        self._frames[key] = frames
+        self.nbytes += sum(f.get_bytesize() * f.get_width() * f.get_height() for f in frames)
+        while self.nbytes > self.max_bytes and len(self._frames) > 1:
+            _, evicted = self._frames.popitem(last=False)
+            self.nbytes -= sum(f.get_bytesize() * f.get_width() * f.get_height() for f in evicted)
+
+    def clear(self):
+        self._frames.clear()
+        self.nbytes = 0
+
+
+class Animator:
+    """Flip, match and mismatch animations for the cards on the board.
+
+    Every frame is a full card-sized surface rendered ahead of time by
+    prepare(), once per face, card back and card size, so playing an
+    animation is only a blit. A card whose frames were evicted from the
+    cache just changes instantly; nothing is scaled in the frame loop.
+    """
+
+    FLIP_MS = 200
+    MATCH_MS = 240
+    MISMATCH_MS = 240
+    FLIP_STEPS = 6       # frames per half of a flip
+    MATCH_SCALES = (0.94, 0.88, 0.82, 0.88, 0.94)
+    MISMATCH_TINT = (200, 0, 0)
+    MISMATCH_ALPHAS = (60, 120, 60)
+
+    def __init__(self, background, cache=None):
+        self.background = background
+        self.cache = cache if cache is not None else FrameCache()
+        self.active = {}  # card -> (frames, start_ms, frame_ms)
+        self.blanks = {}  # size -> empty frame, copied for each new frame
+        self.tints = {}   # (size, alpha) -> mismatch overlay
+
+    def prepare(self, faces, cards, size):
+        """Render the frames for these faces and the backs of these cards, skipping any already cached."""
+        for _ in self.preparing(faces, cards, size):
+            pass
+
+    def preparing(self, faces, cards, size):
+        """prepare() one face or back per step, for spreading the work over several frames."""
+        for face in faces:
+            self.frames(('flip', face), lambda: self.squash_frames(face, size))
+            self.frames(('match', face), lambda: self.pulse_frames(face, size))
+            self.frames(('mismatch', face), lambda: self.tint_frames(face, size))
+            yield
+        for back in Card.get_backs(len(cards), size):
+            self.frames(('flip', back), lambda: self.squash_frames(back, size))
+            yield
+
+    def frames(self, key, render):
+        if key not in self.cache:
+            self.cache.put(key, render())
+
+    def new_frame(self, size):
+        blank = self.blanks.get(size)
+        if blank is None:
+            blank = self.blanks[size] = pygame.Surface((size, size)).convert()
+            blank.fill(self.background)
+        return blank.copy()
+
+    def tint(self, size, alpha):
+        tint = self.tints.get((size, alpha))
+        if tint is None:
+            tint = self.tints[(size, alpha)] = pygame.Surface((size, size)).convert()
+            tint.fill(self.MISMATCH_TINT)
+            tint.set_alpha(alpha)
+        return tint
+
+    def squash_frames(self, surface, size):
+        """The surface turning edge-on: narrower each frame, as seen rotating about its vertical axis."""
+        frames = []
+        for i in range(1, self.FLIP_STEPS + 1):
+            width = int(size * math.cos(i / (self.FLIP_STEPS + 1) * math.pi / 2))
+            frame = self.new_frame(size)
+            if width > 0:
+                scaled = pygame.transform.smoothscale(surface, (width, size))
+                frame.blit(scaled, scaled.get_rect(center=(size // 2, size // 2)))
+            frames.append(frame)
+        return frames
+
+    def pulse_frames(self, surface, size):
+        frames = []
+        for scale in self.MATCH_SCALES:
+            side = max(1, int(size * scale))
+            frame = self.new_frame(size)
+            scaled = pygame.transform.smoothscale(surface, (side, side))
+            frame.blit(scaled, scaled.get_rect(center=(size // 2, size // 2)))
+            frames.append(frame)
+        return frames
+
+    def tint_frames(self, surface, size):
+        frames = []
+        for alpha in self.MISMATCH_ALPHAS:
+            frame = self.new_frame(size)
+            frame.blit(surface, (0, 0))
+            frame.blit(self.tint(size, alpha), (0, 0))
+            frames.append(frame)
+        return frames
+
+    def look(self, card, face_up):
+        return card.image if face_up else Card.get_back_surface(card.index, card.size)
+
+    def flip(self, card, face_up, now):
+        """Animate the card turning over to show its face (or its back)."""
+        before = self.cache.get(('flip', self.look(card, not face_up)))
+        after = self.cache.get(('flip', self.look(card, face_up)))
+        if before is not None and after is not None:
+            self.play(card, before + after[::-1], self.FLIP_MS, now)
+
+    def match(self, card, now):
+        frames = self.cache.get(('match', card.image))
+        if frames is not None:
+            self.play(card, frames, self.MATCH_MS, now)
+
+    def mismatch(self, card, now):
+        frames = self.cache.get(('mismatch', card.image))
+        if frames is not None:
+            self.play(card, frames, self.MISMATCH_MS, now)
+
+    def play(self, card, frames, duration_ms, now):
+        """Start `frames` on the card, or queue them after the animation it is already playing."""
+        current = self.active.get(card)
+        if current is not None:
+            old_frames, start, frame_ms = current
+            done = min(len(old_frames), int((now - start) // frame_ms))
+            # Re-time what is left of the old animation at the new frame rate
+            frames = old_frames[done:] + frames
+            duration_ms += (len(old_frames) - done) * frame_ms
+        self.active[card] = (frames, now, duration_ms / len(frames))
+        card.frame = frames[0]
+        card.mark_dirty()
+
+    def update(self, now):
+        """Advance every running animation to `now`. Only cards whose frame changed are redrawn."""
+        finished = []
+        for card, (frames, start, frame_ms) in self.active.items():
+            i = int((now - start) // frame_ms)
+            frame = frames[i] if i < len(frames) else None
+            if frame is not card.frame:
+                card.frame = frame
+                card.mark_dirty()
+            if frame is None:
+                finished.append(card)
+        for card in finished:
+            del self.active[card]
+
+    def clear(self):
+        for card in self.active:
+            card.frame = None
+        self.active.clear()
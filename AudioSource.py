@@ -0,0 +1,139 @@
+import sys
+import time
+import wave
+
+
+SAMPLE_RATE = 16000
+CHANNEL_COUNT = 1
+SAMPLE_WIDTH = 2  # 16-bit signed little-endian PCM
+FRAMES_PER_BUFFER = 1600  # 100 ms, so partial results are checked ten times a second
+
+
+class AudioSource:
+    """16 kHz mono 16-bit PCM for the recognizer, from wherever it comes from.
+
+    read(frames) returns up to `frames` frames as bytes and b'' once the source
+    is exhausted. File-backed sources can be paced to real time with
+    realtime=True, so they stand in for a microphone in the game loop.
+    """
+
+    def __init__(self, realtime=False):
+        self.realtime = realtime
+        self.frames_read = 0
+        self.started = None
+
+    def read(self, frames):
+        data = self.read_bytes(frames * SAMPLE_WIDTH * CHANNEL_COUNT)
+        if self.realtime and data:
+            if self.started is None:
+                self.started = time.perf_counter()
+            self.frames_read += len(data) // (SAMPLE_WIDTH * CHANNEL_COUNT)
+            delay = self.started + self.frames_read / SAMPLE_RATE - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return data
+
+    def read_bytes(self, size):
+        raise NotImplementedError
+
+    def chunks(self, frames):
+        while True:
+            data = self.read(frames)
+            if not data:
+                return
+            yield data
+
+    def read_all(self):
+        return b''.join(self.chunks(SAMPLE_RATE))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Microphone(AudioSource):
+    """The default input device, through PyAudio."""
+
+    def __init__(self, frames_per_buffer=FRAMES_PER_BUFFER):
+        super().__init__()
+        import pyaudio  # only needed for live input
+        self.pyaudio = pyaudio.PyAudio()
+        self.stream = self.pyaudio.open(format=pyaudio.paInt16, channels=CHANNEL_COUNT, rate=SAMPLE_RATE,
+                                        input=True, frames_per_buffer=frames_per_buffer)
+        self.stream.start_stream()
+
+    def read(self, frames):
+        return self.stream.read(frames, exception_on_overflow=False)
+
+    def close(self):
+        self.stream.stop_stream()
+        self.stream.close()
+        self.pyaudio.terminate()
+
+
+class WavFile(AudioSource):
+    def __init__(self, path, realtime=False):
+        super().__init__(realtime)
+        self.path = path
+        self.wav = wave.open(path, 'rb')
+        if (self.wav.getframerate(), self.wav.getnchannels(), self.wav.getsampwidth()) != \
+                (SAMPLE_RATE, CHANNEL_COUNT, SAMPLE_WIDTH):
+            self.wav.close()
+            raise ValueError(f"expected {SAMPLE_RATE} Hz mono 16-bit PCM")
+
+    @property
+    def duration(self):
+        return self.wav.getnframes() / SAMPLE_RATE
+
+    def read_bytes(self, size):
+        return self.wav.readframes(size // (SAMPLE_WIDTH * CHANNEL_COUNT))
+
+    def close(self):
+        self.wav.close()
+
+
+class RawPcm(AudioSource):
+    """Headerless PCM from any binary stream: a file, a pipe from arecord/ffmpeg, stdin."""
+
+    def __init__(self, stream, realtime=False):
+        super().__init__(realtime)
+        self.stream = stream
+
+    def read_bytes(self, size):
+        return self.stream.read(size)
+
+    def close(self):
+        if self.stream is not sys.stdin.buffer:
+            self.stream.close()
+
+
+class Buffer(AudioSource):
+    """PCM already in memory, e.g. synthesized or cached test audio."""
+
+    def __init__(self, data, realtime=False):
+        super().__init__(realtime)
+        self.data = memoryview(data)
+        self.position = 0
+
+    def read_bytes(self, size):
+        data = self.data[self.position:self.position + size]
+        self.position += len(data)
+        return bytes(data)
+
+
+def open_microphone():
+    return Microphone(FRAMES_PER_BUFFER)
+
+
+def open_source(spec, realtime=False):
+    """'-' for raw PCM on stdin, a .wav path, or any other path as raw PCM."""
+    if spec == '-':
+        return RawPcm(sys.stdin.buffer, realtime)
+    if spec.lower().endswith('.wav'):
+        return WavFile(spec, realtime)
+    return RawPcm(open(spec, 'rb'), realtime)
@@ -0,0 +1,99 @@
+import numpy as np
+
+
+class BatchBoards:
+    """Many single-player boards advanced together with NumPy.
+
+    Each row of the arrays is one board. step() flips two cards on every
+    unfinished board at once, so a policy only has to pick a (first, second)
+    column per row.
+    """
+
+    def __init__(self, count, rows=4, cols=4, seed=None):
+        if rows * cols % 2:
+            raise ValueError("a board needs an even number of cards")
+        self.count = count
+        self.size = rows * cols
+        self.rng = np.random.default_rng(seed)
+        self.rows_index = np.arange(count)
+
+        base = np.repeat(np.arange(self.size // 2, dtype=np.int32), 2)
+        self.pairs = self.rng.permuted(np.broadcast_to(base, (count, self.size)), axis=1)
+        # partner[b, i] is the other card with the same pair id on board b.
+        order = np.argsort(self.pairs, axis=1, kind='stable')
+        self.partner = np.empty_like(order)
+        np.put_along_axis(self.partner, order[:, 0::2], order[:, 1::2], axis=1)
+        np.put_along_axis(self.partner, order[:, 1::2], order[:, 0::2], axis=1)
+
+        self.matched = np.zeros((count, self.size), dtype=bool)
+        self.seen = np.zeros((count, self.size), dtype=bool)
+        self.tries = np.zeros(count, dtype=np.int32)
+        self.matched_pairs = np.zeros(count, dtype=np.int32)
+        self.done = np.zeros(count, dtype=bool)
+
+    def step(self, first, second):
+        """Flip cards `first` and `second` on every unfinished board.
+
+        Returns a bool array telling which boards found a pair.
+        """
+        b = self.rows_index
+        active = ~self.done
+        hit = active & (first != second) & (self.pairs[b, first] == self.pairs[b, second])
+        self.tries += active
+        self.seen[b[active], first[active]] = True
+        self.seen[b[active], second[active]] = True
+        self.matched[b[hit], first[hit]] = True
+        self.matched[b[hit], second[hit]] = True
+        self.matched_pairs += hit
+        self.done = self.matched_pairs == self.size // 2
+        return hit
+
+    def random_choice(self, mask):
+        """One random True column per row of `mask` (column 0 for empty rows)."""
+        scores = self.rng.random(mask.shape)
+        scores[~mask] = -1.0
+        return scores.argmax(axis=1)
+
+    def run(self, policy, max_steps=None):
+        """Play every board to completion and return the tries per board."""
+        steps = 0
+        while not self.done.all():
+            first, second = policy(self)
+            self.step(first, second)
+            steps += 1
+            if max_steps is not None and steps >= max_steps:
+                break
+        return self.tries
+
+
+def random_policy(boards):
+    """Flip two random unmatched cards, remembering nothing."""
+    hidden = ~boards.matched
+    first = boards.random_choice(hidden)
+    hidden[boards.rows_index, first] = False
+    second = boards.random_choice(hidden)
+    return first, second
+
+
+def memory_policy(boards):
+    """Perfect memory: take a known pair if there is one, otherwise explore."""
+    b = boards.rows_index
+    known = boards.seen & ~boards.matched
+    known_pair = known & known[b[:, None], boards.partner]
+    has_pair = known_pair.any(axis=1)
+
+    unseen = ~boards.seen & ~boards.matched
+    explore = boards.random_choice(unseen)
+    first = np.where(has_pair, known_pair.argmax(axis=1), explore)
+
+    partner = boards.partner[b, first]
+    partner_known = boards.seen[b, partner]
+    unseen[b, first] = False
+    second = np.where(has_pair | partner_known, partner, boards.random_choice(unseen))
+    return first, second
+
+
+POLICIES = {
+    'random': random_policy,
+    'memory': memory_policy,
+}
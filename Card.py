@@ -1,33 +1,182 @@
+from collections import OrderedDict
+from collections.abc import Sequence
+
 import pygame
 
+from Engine import VISIBLE, MATCHED
+from TextCache import text_cache
+
 
 
 class Card:
     CARD_BACK_COLOR = (255, 255, 255)
     CARD_SIZE = 100
     TEXT_COLOR = (0, 0, 0)
-    
+    MIN_LABEL_SIZE = 16
+    # Card sizes whose backs are kept; a resize back to one of them renders nothing
+    BACK_SIZES_CACHED = 4
+
     """Represents a single memory card."""
 
-    def __init__(self, image, position, index):
+    fonts = {}
+    back_surfaces = OrderedDict()  # size -> {index: surface}
+    # Cards whose look changed since they were last drawn, so the renderer
+    # never has to scan the whole deck.
+    dirty_cards = []
+
+    def __init__(self, image, position, index, size=CARD_SIZE, visible=False, matched=False):
         self.image = image
-        self.rect = pygame.Rect(position[0], position[1], self.CARD_SIZE, self.CARD_SIZE)
-        
-        
+        self.size = size
+        self.rect = pygame.Rect(position[0], position[1], size, size)
+
+
         self.index = index
-        self.matched = False
-        self.visible = False
-        self.font = pygame.font.Font(None, 36)
+        self._matched = matched
+        self._visible = visible
+        self.dirty = False
+        # Set while an animation plays; drawn instead of the face or back
+        self.frame = None
+
+    @property
+    def matched(self):
+        return self._matched
+
+    @matched.setter
+    def matched(self, value):
+        if value != self._matched:
+            self._matched = value
+            self.mark_dirty()
+
+    @property
+    def visible(self):
+        return self._visible
+
+    @visible.setter
+    def visible(self, value):
+        if value != self._visible:
+            self._visible = value
+            self.mark_dirty()
+
+    def place(self, position, size):
+        """Move and resize the card after the window was resized."""
+        self.size = size
+        self.rect = pygame.Rect(position[0], position[1], size, size)
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        if not self.dirty:
+            self.dirty = True
+            Card.dirty_cards.append(self)
+
+    @classmethod
+    def get_font(cls, size):
+        # 36pt on the original 100px card, scaled with the card.
+        font_size = max(8, size * 36 // cls.CARD_SIZE)
+        font = cls.fonts.get(font_size)
+        if font is None:
+            font = cls.fonts[font_size] = pygame.font.Font(None, font_size)
+        return font
+
+    @classmethod
+    def get_back_surface(cls, index, size=CARD_SIZE):
+        """Card back with its index label, rendered once per index and size."""
+        if size < cls.MIN_LABEL_SIZE:
+            # Labels would be unreadable on tiny cards of very large boards; they share one plain back
+            index = None
+        backs = cls.back_surfaces.get(size)
+        if backs is None:
+            backs = cls.back_surfaces[size] = {}
+            if len(cls.back_surfaces) > cls.BACK_SIZES_CACHED:
+                cls.back_surfaces.popitem(last=False)
+        else:
+            cls.back_surfaces.move_to_end(size)
+        surf = backs.get(index)
+        if surf is None:
+            surf = pygame.Surface((size, size))
+            surf.fill(cls.CARD_BACK_COLOR)
+            if index is not None:
+                text_surf = text_cache.render(cls.get_font(size), str(index), cls.TEXT_COLOR)
+                surf.blit(text_surf, text_surf.get_rect(center=surf.get_rect().center))
+            backs[index] = surf
+        return surf
+
+    @classmethod
+    def get_backs(cls, count, size=CARD_SIZE):
+        """The distinct backs of cards 1 to `count`."""
+        if size < cls.MIN_LABEL_SIZE:
+            return [cls.get_back_surface(None, size)]
+        return [cls.get_back_surface(index, size) for index in range(1, count + 1)]
+
+    def surface(self):
+        """What the card shows right now."""
+        if self.frame is not None:
+            return self.frame
+        if self.visible or self.matched:
+            return self.image
+        return self.get_back_surface(self.index, self.size)
 
     def draw(self, screen):
         """Draw the card on the screen."""
-        if self.visible or self.matched:
-            screen.blit(self.image, self.rect)
-        else:
-            pygame.draw.rect(screen, self.CARD_BACK_COLOR, self.rect)
-            text_surf = self.font.render(str(self.index), True, Card.TEXT_COLOR)
-            text_rect = text_surf.get_rect(center=self.rect.center)
-            screen.blit(text_surf, text_rect)
-            
+        screen.blit(self.surface(), self.rect)
+        self.dirty = False
+
     def get_card_size(self):
-        return self.CARD_SIZE
\ No newline at end of file
+        return self.size
+
+
+class CardDeck(Sequence):
+    """The cards of a board, each created the first time something asks for it.
+
+    A card nobody has touched yet is drawn straight from `shown`, the board
+    flags as they were when the deck was dealt, so dealing or restoring a
+    10,000-card board builds no Card objects and a full redraw is one blits()
+    call. Once created, a card keeps its own state, as before.
+    """
+
+    def __init__(self, board, faces, layout):
+        self.board = board
+        self.faces = faces
+        self.layout = layout
+        self.shown = bytes(board.flags)
+        self.cards = [None] * board.size
+        self.created = []
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __getitem__(self, index):
+        card = self.cards[index]
+        if card is None:
+            flags = self.shown[index]
+            card = self.cards[index] = Card(self.faces[self.board.pairs[index]], self.layout.card_position(index),
+                                            index + 1, self.layout.card_size,
+                                            visible=bool(flags & VISIBLE), matched=bool(flags & MATCHED))
+            self.created.append(card)
+        return card
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self.cards)))
+
+    def relayout(self, faces, layout):
+        """New faces or card positions, after a theme change or a resize."""
+        self.faces = faces
+        self.layout = layout
+        for card in self.created:
+            i = card.index - 1
+            card.image = faces[self.board.pairs[i]]
+            card.place(layout.card_position(i), layout.card_size)
+
+    def draw(self, screen):
+        """Draw every card, for a full redraw."""
+        layout = self.layout
+        size = layout.card_size
+        (x0, y0), step, cols = layout.origin, layout.step, layout.cols
+        faces, pairs, shown = self.faces, self.board.pairs, self.shown
+        back = Card.get_back_surface
+        plain_back = back(None, size) if size < Card.MIN_LABEL_SIZE else None
+        screen.blits([(card.surface(), card.rect) if card is not None else
+                      (faces[pairs[i]] if shown[i] else plain_back or back(i + 1, size),
+                       (x0 + i % cols * step, y0 + i // cols * step))
+                      for i, card in enumerate(self.cards)], doreturn=False)
+        for card in self.created:
+            card.dirty = False
\ No newline at end of file
@@ -0,0 +1,157 @@
+import random
+
+from Engine import MATCHED
+
+
+class IndexSet:
+    """Set of card indices with O(1) add, remove and random pick."""
+
+    def __init__(self, items=()):
+        self.items = []
+        self.positions = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def add(self, item):
+        if item not in self.positions:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+
+    def discard(self, item):
+        position = self.positions.pop(item, None)
+        if position is None:
+            return
+        last = self.items.pop()
+        if last != item:
+            self.items[position] = last
+            self.positions[last] = position
+
+    def choice(self, rng, exclude=None):
+        if exclude in self.positions and len(self.items) > 1:
+            while True:
+                item = rng.choice(self.items)
+                if item != exclude:
+                    return item
+        return rng.choice(self.items)
+
+
+class CpuOpponent:
+    """Computer player. It only learns a card's pair when that card is turned over.
+
+    easy   -- flips random cards and remembers nothing
+    medium -- remembers each card it sees with probability MEDIUM_RECALL
+    hard   -- perfect memory, plus the precomputed optimal policy from StrategyTable
+              (once the table has loaded in the background; until then, memory alone)
+    """
+
+    LEVELS = ('easy', 'medium', 'hard')
+    MEDIUM_RECALL = 0.6
+
+    def __init__(self, board, difficulty='hard', rng=None):
+        self.board = board
+        self.difficulty = difficulty
+        self.rng = rng or random.Random()
+        if difficulty == 'hard':
+            import StrategyTable  # NumPy, so only once a hard opponent plays
+            StrategyTable.warm_up(board.size)
+        self.hidden = IndexSet(range(board.size))   # unmatched cards
+        self.unknown = IndexSet(range(board.size))  # unmatched cards it does not remember
+        self.singles = IndexSet()                   # remembered cards whose partner it has not seen
+        self.known_pairs = IndexSet()               # pair ids with both cards remembered
+        self.known_by_pair = {}                     # pair id -> remembered indices
+        self.turn_start = None
+
+    def observe(self, index):
+        """A card was turned face up in front of everyone."""
+        if self.difficulty == 'easy' or index not in self.unknown:
+            return
+        if self.difficulty == 'medium' and self.rng.random() > self.MEDIUM_RECALL:
+            return
+        pair = self.board.pairs[index]
+        self.unknown.discard(index)
+        indices = self.known_by_pair.setdefault(pair, [])
+        indices.append(index)
+        if len(indices) == 1:
+            self.singles.add(index)
+        else:
+            self.singles.discard(indices[0])
+            self.known_pairs.add(pair)
+
+    def matched(self, first, second):
+        for index in (first, second):
+            self.hidden.discard(index)
+            self.unknown.discard(index)
+            self.singles.discard(index)
+        pair = self.board.pairs[first]
+        self.known_by_pair.pop(pair, None)
+        self.known_pairs.discard(pair)
+
+    @property
+    def table(self):
+        if self.difficulty != 'hard':
+            return None
+        import StrategyTable
+        return StrategyTable.ready_table(self.board.size)
+
+    def restore(self):
+        """Catch up with a board put back from a saved game: it has lost its memory of
+        the cards seen before, but matched ones are out of play and a face-up one is in view."""
+        for index, flags in enumerate(self.board.flags):
+            if flags & MATCHED:
+                self.hidden.discard(index)
+                self.unknown.discard(index)
+        self.turn_start = (len(self.unknown), len(self.singles))
+        for index in self.board.selected:
+            self.observe(index)
+
+    def pick(self, cards, exclude=None):
+        if len(cards) == 0 or (len(cards) == 1 and exclude in cards):
+            return None
+        return cards.choice(self.rng, exclude)
+
+    def choose_first(self):
+        # (unknown cards, known singles) at the start of the turn, for choose_second
+        self.turn_start = (len(self.unknown), len(self.singles))
+        if self.difficulty == 'easy':
+            return self.hidden.choice(self.rng)
+        if len(self.known_pairs):
+            return self.known_by_pair[self.known_pairs.items[0]][0]
+        table = self.table
+        if table is not None and len(self.singles):
+            import StrategyTable
+            if StrategyTable.action(table, *self.turn_start) & StrategyTable.FIRST_KNOWN:
+                return self.pick(self.singles)
+        choice = self.pick(self.unknown)
+        return choice if choice is not None else self.pick(self.singles)
+
+    def choose_second(self, first):
+        if self.difficulty == 'easy':
+            return self.hidden.choice(self.rng, exclude=first)
+        partner = self.partner_of(first)
+        if partner is not None:
+            return partner
+
+        n, k = self.turn_start
+        first_was_new = len(self.unknown) < n
+        table = self.table
+        if table is not None and first_was_new and k >= 1:
+            import StrategyTable
+            if StrategyTable.action(table, n, k) & StrategyTable.SECOND_KNOWN:
+                return self.pick(self.singles, exclude=first)
+        for cards in (self.unknown, self.singles, self.hidden):
+            choice = self.pick(cards, exclude=first)
+            if choice is not None:
+                return choice
+        return None
+
+    def partner_of(self, index):
+        for other in self.known_by_pair.get(self.board.pairs[index], ()):
+            if other != index:
+                return other
+        return None
@@ -0,0 +1,133 @@
+from array import array
+import random
+
+
+# Per-card flag bits stored in Board.flags
+VISIBLE = 1
+MATCHED = 2
+
+# Results of Board.step()
+INVALID = 0
+FIRST = 1
+MATCH = 2
+MISMATCH = 3
+
+
+class Board:
+    """Headless memory-game rules. No pygame in here.
+
+    Cards are numbered 0..rows*cols-1. pairs[i] is the pair id of card i and
+    flags[i] holds its VISIBLE/MATCHED bits. A mismatched pair stays visible in
+    `pending` until conceal() is called, or until the next step() does it.
+    """
+
+    def __init__(self, rows=4, cols=4, num_players=1, seed=None, deal=True):
+        if rows * cols % 2:
+            raise ValueError("a board needs an even number of cards")
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.num_players = num_players
+        self.rng = random.Random(seed)
+        if deal:
+            self.reset()  # otherwise restore() sets the cards up
+
+    def reset(self):
+        pair_ids = list(range(self.size // 2)) * 2
+        self.rng.shuffle(pair_ids)
+        self.pairs = array('H' if self.size // 2 <= 0xFFFF else 'I', pair_ids)
+        self.flags = bytearray(self.size)
+        self.scores = [0] * self.num_players
+        self.current_player = 0
+        self.tries = 0
+        self.matched_count = 0
+        self.selected = []
+        self.pending = []
+        self.changed = []
+
+    def restore(self, pairs, flags, scores, current_player, tries):
+        """Put a saved game back (see Snapshot). A mismatched pair that was still showing is turned down."""
+        if len(pairs) != self.size or len(flags) != self.size:
+            raise ValueError("saved cards do not fit this board")
+        self.pairs = array('H' if self.size // 2 <= 0xFFFF else 'I', pairs)
+        self.flags = bytearray(flags)
+        # Dealing on from the seed alone would repeat the session's first deal
+        # after Play Again, so the next deal also depends on this one
+        self.rng.seed(self.rng.getrandbits(64).to_bytes(8, 'little') + self.pairs.tobytes())
+        face_up = []
+        index = self.flags.find(VISIBLE)
+        while index != -1:
+            face_up.append(index)
+            index = self.flags.find(VISIBLE, index + 1)
+        if len(face_up) > 1:
+            for index in face_up:
+                self.flags[index] = 0
+            face_up = []
+        self.selected = face_up
+        self.pending = []
+        self.changed = []
+        self.matched_count = self.size - self.flags.count(0) - len(face_up)
+        self.num_players = len(scores)
+        self.scores = list(scores)
+        self.current_player = current_player
+        self.tries = tries
+
+    def set_num_players(self, num_players):
+        self.num_players = num_players
+        self.scores = [0] * num_players
+        self.current_player = 0
+
+    def is_visible(self, index):
+        return bool(self.flags[index] & VISIBLE)
+
+    def is_matched(self, index):
+        return bool(self.flags[index] & MATCHED)
+
+    def is_selectable(self, index):
+        return 0 <= index < self.size and not self.flags[index] & (VISIBLE | MATCHED)
+
+    def step(self, index):
+        """Flip one card for the current player and return FIRST, MATCH, MISMATCH or INVALID.
+
+        The indices whose flags changed during the call are left in `changed`.
+        """
+        self.changed = []
+        if self.pending:
+            self.conceal()
+        if not self.is_selectable(index):
+            return INVALID
+
+        self.flags[index] |= VISIBLE
+        self.changed.append(index)
+        self.selected.append(index)
+        if len(self.selected) < 2:
+            return FIRST
+
+        first, second = self.selected
+        self.selected = []
+        self.tries += 1
+        if self.pairs[first] == self.pairs[second]:
+            self.flags[first] |= MATCHED
+            self.flags[second] |= MATCHED
+            self.changed.append(first)
+            self.scores[self.current_player] += 1
+            self.matched_count += 2
+            return MATCH
+
+        self.pending = [first, second]
+        self.current_player = (self.current_player + 1) % self.num_players
+        return MISMATCH
+
+    def conceal(self):
+        """Turn the pending mismatched pair face down again."""
+        for index in self.pending:
+            self.flags[index] &= ~VISIBLE & 0xFF
+        self.changed.extend(self.pending)
+        self.pending = []
+
+    def is_complete(self):
+        return self.matched_count == self.size
+
+    def winner(self):
+        """1-based number of the leading player; ties go to the lowest number."""
+        return self.scores.index(max(self.scores)) + 1
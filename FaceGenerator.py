@@ -0,0 +1,197 @@
+import os
+
+import numpy as np
+import pygame
+
+import UserCache
+from Theme import Theme
+
+
+FACE_CACHE_DIR = 'faces'  # in the user cache directory
+FACE_SEED = 0x6D656D6F  # the same faces every run, so the disk cache is reused
+BATCH_SIZE = 256        # faces rendered per NumPy pass; bounds the temporary arrays
+PATTERNS = 8
+GLYPH_CELLS = 5         # glyphs are 5x5, mirrored left to right
+GLYPH_BITS = GLYPH_CELLS * (GLYPH_CELLS + 1) // 2
+
+
+def mix(x):
+    """splitmix64 finalizer: a well-spread 64-bit hash of every element of a uint64 array."""
+    x = x.copy()
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+def hsv_to_rgb(h, s, v):
+    """Vectorized HSV (all in 0..1) to uint8 RGB, shape (..., 3)."""
+    i = np.floor(h * 6).astype(np.int64) % 6
+    f = h * 6 - np.floor(h * 6)
+    p, q, t = v * (1 - s), v * (1 - f * s), v * (1 - (1 - f) * s)
+    r = np.choose(i, [v, q, p, p, t, v])
+    g = np.choose(i, [t, v, v, q, p, p])
+    b = np.choose(i, [p, p, t, v, v, q])
+    return (np.stack([r, g, b], axis=-1) * 255).round().astype(np.uint8)
+
+
+def glyph_codes(index):
+    """A different glyph for each of the first 2**GLYPH_BITS faces: an odd multiplier permutes the codes."""
+    return (index * np.uint64(0x2F6B) + np.uint64(0x1234)) % np.uint64(1 << GLYPH_BITS)
+
+
+def generate_faces(start, count, size, seed=FACE_SEED):
+    """Faces start..start+count-1 at `size` pixels as a uint8 array (count, size, size, 3), indexed [face, x, y].
+
+    Face i depends only on the seed, i and size, so any range can be rendered
+    on its own and a bigger set starts with the faces of a smaller one.
+    """
+    faces = np.empty((count, size, size, 3), dtype=np.uint8)
+    for offset in range(0, count, BATCH_SIZE):
+        n = min(BATCH_SIZE, count - offset)
+        faces[offset:offset + n] = render_batch(np.arange(start + offset, start + offset + n, dtype=np.uint64),
+                                                size, seed)
+    return faces
+
+
+def render_batch(index, size, seed):
+    h = mix(index ^ mix(np.array([seed], dtype=np.uint64)))
+    bits = lambda shift, mod: ((h >> np.uint64(shift)) % np.uint64(mod)).astype(np.int64)
+
+    # Colors: hues spread by the golden ratio, a darker complementary color for the pattern
+    hue = (index.astype(np.float64) * 0.618033988749895 + bits(0, 1000) / 1000 * 0.1) % 1.0
+    saturation = 0.55 + 0.15 * bits(10, 3)
+    value = 0.95 - 0.15 * bits(12, 3)
+    background = hsv_to_rgb(hue, saturation, value)
+    pattern_color = hsv_to_rgb((hue + 0.5) % 1.0, np.full_like(hue, 0.8), value * 0.6)
+    luminance = background @ np.array([0.299, 0.587, 0.114])
+    ink = np.repeat(np.where(luminance > 140, 0, 255).astype(np.uint8)[:, None], 3, axis=1)
+
+    # Pixel centers in 0..1; x runs along axis 1 and y along axis 2, as in pygame.surfarray
+    u = ((np.arange(size, dtype=np.float32) + 0.5) / size)[None, :, None]
+    v = ((np.arange(size, dtype=np.float32) + 0.5) / size)[None, None, :]
+    k = (2 + bits(20, 4)).astype(np.float32)[:, None, None]
+    kinds = bits(24, PATTERNS)
+    pattern = np.zeros((len(index), size, size), dtype=bool)
+    # One pass per kind of pattern over all the faces that use it
+    for kind in range(PATTERNS):
+        chosen = np.flatnonzero(kinds == kind)
+        if len(chosen):
+            pattern[chosen] = pattern_mask(kind, u, v, k[chosen])
+
+    # A plain panel in the middle with the glyph on it
+    panel = (np.abs(u - 0.5) < 0.34) & (np.abs(v - 0.5) < 0.34)
+    codes = glyph_codes(index)
+    half = (GLYPH_CELLS + 1) // 2
+    cells = ((codes[:, None] >> np.arange(GLYPH_BITS, dtype=np.uint64)) & np.uint64(1)).astype(bool)
+    cells = cells.reshape(len(index), GLYPH_CELLS, half)
+    glyph = np.concatenate([cells, cells[:, :, half - 2::-1]], axis=2)  # rows x columns, mirrored
+    cell_x = np.clip(((u[0, :, 0] - 0.25) * 2 * GLYPH_CELLS).astype(np.int64), 0, GLYPH_CELLS - 1)
+    cell_y = np.clip(((v[0, 0, :] - 0.25) * 2 * GLYPH_CELLS).astype(np.int64), 0, GLYPH_CELLS - 1)
+    in_glyph = (np.abs(u - 0.5) < 0.25) & (np.abs(v - 0.5) < 0.25)
+    glyph_on = glyph[:, cell_y[None, :], cell_x[:, None]] & in_glyph
+
+    # Every pixel picks one of three colors per face: background, pattern or glyph ink
+    shade = (pattern & ~panel).astype(np.intp)
+    shade[glyph_on] = 2
+    shade += 3 * np.arange(len(index))[:, None, None]
+    palette = np.stack([background, pattern_color, ink], axis=1).reshape(-1, 3)
+    return palette[shade]
+
+
+def pattern_mask(kind, u, v, k):
+    """Boolean (faces, x, y) mask of one kind of pattern; k is the number of repeats per face."""
+    if kind == 0:  # horizontal stripes
+        return np.broadcast_to(np.floor(v * k * 2) % 2 == 0, (len(k), u.shape[1], v.shape[2]))
+    if kind == 1:  # vertical stripes
+        return np.broadcast_to(np.floor(u * k * 2) % 2 == 0, (len(k), u.shape[1], v.shape[2]))
+    if kind == 2:  # diagonal stripes
+        return np.floor((u + v) * k) % 2 == 0
+    if kind == 3:  # checkerboard
+        return (np.floor(u * k) + np.floor(v * k)) % 2 == 0
+    if kind == 4:  # rings
+        return np.floor(np.sqrt((u - 0.5) ** 2 + (v - 0.5) ** 2) * k * 3) % 2 == 0
+    if kind == 5:  # dots
+        return ((u * k) % 1 - 0.5) ** 2 + ((v * k) % 1 - 0.5) ** 2 < 0.09
+    if kind == 6:  # diamonds
+        return np.floor((np.abs(u - 0.5) + np.abs(v - 0.5)) * k * 3) % 2 == 0
+    return np.broadcast_to(u + v < 1, (len(k), u.shape[1], v.shape[2]))  # two halves
+
+
+def cache_path(directory, seed, size):
+    return os.path.join(directory, f"faces-{seed:016x}-{size}.npy")
+
+
+def load_faces(count, size, seed=FACE_SEED, directory=None):
+    """`count` faces at `size` pixels, read from the disk cache in one go, or generated and saved there."""
+    directory = directory or UserCache.cache_path(FACE_CACHE_DIR)
+    path = cache_path(directory, seed, size)
+    try:
+        faces = np.load(path)
+        if faces.shape[0] >= count and faces.shape[1:] == (size, size, 3) and faces.dtype == np.uint8:
+            return faces[:count]
+    except (OSError, ValueError):
+        pass  # missing, unreadable or too small: generate it again
+    faces = generate_faces(0, count, size, seed)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, faces)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"card faces not cached: {e}")
+    return faces
+
+
+class GeneratedTheme(Theme):
+    """Procedural faces for any number of pairs, written into the atlas in one blit."""
+
+    def __init__(self, card_size, capacity, seed=FACE_SEED, directory=None):
+        super().__init__(card_size, capacity)
+        faces = load_faces(capacity, card_size, seed, directory)
+        rows = self.atlas.get_height() // card_size
+        padded = np.full((rows * self.columns, card_size, card_size, 3), 255, dtype=np.uint8)
+        padded[:capacity] = faces
+        # (rows, columns, x, y) -> one (width, height) array laid out like the atlas slots
+        pixels = padded.reshape(rows, self.columns, card_size, card_size, 3).transpose(1, 2, 0, 3, 4)
+        pygame.surfarray.blit_array(self.atlas, pixels.reshape(self.columns * card_size, rows * card_size, 3))
+        self._faces = [None] * capacity  # subsurfaces, made on first use
+
+    def face(self, i):
+        face = self._faces[i]
+        if face is None:
+            face = self._faces[i] = self.atlas.subsurface(self.slot_rect(i))
+        return face
+
+    def faces(self, count):
+        return AtlasFaces(self, min(count, self.capacity))
+
+
+class AtlasFaces:
+    """The first `count` faces of a GeneratedTheme, indexed like a list.
+
+    Each face is a subsurface of the atlas, created the first time it is asked
+    for, so a board of 5,000 pairs costs nothing until its cards are drawn.
+    """
+
+    def __init__(self, theme, count):
+        self.theme = theme
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.theme.face(j) for j in range(*i.indices(self.count))]
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return self.theme.face(i)
+
+    def __iter__(self):
+        return (self.theme.face(i) for i in range(self.count))
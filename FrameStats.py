@@ -0,0 +1,38 @@
+from collections import deque
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class FrameStats:
+    """Rolling frame-time and input-latency samples, in milliseconds."""
+
+    def __init__(self, max_samples=10000):
+        self.frame_times = deque(maxlen=max_samples)
+        self.input_latencies = deque(maxlen=max_samples)
+
+    def add_frame(self, frame_ms):
+        self.frame_times.append(frame_ms)
+
+    def add_input_latency(self, latency_ms):
+        self.input_latencies.append(latency_ms)
+
+    def summary(self, samples):
+        return {
+            'count': len(samples),
+            'p50_ms': percentile(samples, 0.50),
+            'p95_ms': percentile(samples, 0.95),
+            'p99_ms': percentile(samples, 0.99),
+            'max_ms': max(samples, default=0.0),
+        }
+
+    def report(self):
+        return {
+            'frame': self.summary(self.frame_times),
+            'input_latency': self.summary(self.input_latencies),
+        }
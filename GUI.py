@@ -1,12 +1,27 @@
 import pygame
 
+from Card import Card, CardDeck
+from TextCache import text_cache
+
+
+
+class SilentSound:
+    """Stands in for a pygame Sound when the mixer could not be opened."""
+
+    def play(self, *args, **kwargs):
+        return None
 
 
 class GUI:
+    # The layout below is drawn for an 800x700 window; layout() scales it to the actual window.
     SCREEN_WIDTH, SCREEN_HEIGHT = 800, 700
+    DESIGN_WIDTH, DESIGN_HEIGHT = SCREEN_WIDTH, SCREEN_HEIGHT
+    FONT_SIZE, BIG_FONT_SIZE = 24, 48
     BACKGROUND_COLOR = (30, 30, 30)
     CARD_GAP = 20
     BOARD_ROWS, BOARD_COLS = 4, 4
+    # Where the cards go: below the timer, left of the buttons, above the tries counter.
+    BOARD_AREA = pygame.Rect(0, 60, SCREEN_WIDTH - 180, SCREEN_HEIGHT - 100)
     MATCH_SOUND_PATH = "applepay.mp3"
     UNMATCH_SOUND_PATH = "engineer_no01.mp3"
     RESET_BUTTON_COLOR = (50, 205, 50)
@@ -16,30 +31,187 @@ class GUI:
     ONE_PLAYER_BUTTON_RECT = pygame.Rect(150, 250, 250, 50)
     TWO_PLAYER_BUTTON_RECT = pygame.Rect(150, 320, 250, 50)
     TIME_ATTACK_BUTTON_RECT = pygame.Rect(150, 390, 250, 50)
+    VS_CPU_BUTTON_RECT = pygame.Rect(150, 460, 250, 50)
+    CPU_LEVEL_BUTTON_RECT = pygame.Rect(420, 460, 150, 50)
+    LEADERBOARD_BUTTON_RECT = pygame.Rect(150, 530, 250, 50)
+    RESUME_BUTTON_RECT = pygame.Rect(420, 250, 150, 50)
+    LEADERBOARD_MODE_BUTTON_RECT = pygame.Rect(SCREEN_WIDTH//2 - 210, SCREEN_HEIGHT - 90, 200, 40)
+    BACK_BUTTON_RECT = pygame.Rect(SCREEN_WIDTH//2 + 10, SCREEN_HEIGHT - 90, 200, 40)
     SPEAK_BUTTON_COLOR = (113, 77, 198)
     SPEAK_BUTTON_RECT = pygame.Rect(SCREEN_WIDTH - 170, SCREEN_HEIGHT//2 - 150, 150, 40)
-    
-    player_selection_buttons = [VOICE_CONTROL_BUTTON_RECT, ONE_PLAYER_BUTTON_RECT, TWO_PLAYER_BUTTON_RECT, TIME_ATTACK_BUTTON_RECT]
-    game_over_buttons = [PLAY_AGAIN_BUTTON_RECT]
-    voice_control_buttons = [SPEAK_BUTTON_RECT]
+    HANDS_FREE_BUTTON_RECT = pygame.Rect(SCREEN_WIDTH - 170, SCREEN_HEIGHT//2 - 105, 150, 40)
 
-    def __init__(self, mem_game) -> None:
+    player_selection_buttons = [VOICE_CONTROL_BUTTON_RECT, ONE_PLAYER_BUTTON_RECT, TWO_PLAYER_BUTTON_RECT, TIME_ATTACK_BUTTON_RECT,
+                                VS_CPU_BUTTON_RECT, CPU_LEVEL_BUTTON_RECT, LEADERBOARD_BUTTON_RECT, RESUME_BUTTON_RECT]
+    game_over_buttons = [PLAY_AGAIN_BUTTON_RECT]
+    leaderboard_buttons = [LEADERBOARD_MODE_BUTTON_RECT, BACK_BUTTON_RECT]
+    voice_control_buttons = [SPEAK_BUTTON_RECT, HANDS_FREE_BUTTON_RECT]
+    sounds = {}
+    fonts = {}
 
-        self.screen = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
-        self.font = pygame.font.SysFont("Arial", 24)
-        self.big_font = pygame.font.SysFont("Arial", 48)
-        self.match_sound = pygame.mixer.Sound(self.MATCH_SOUND_PATH)
-        self.unmatch_sound = pygame.mixer.Sound(self.UNMATCH_SOUND_PATH)
+    def __init__(self, mem_game, size=None, fullscreen=False) -> None:
+        self.fullscreen = fullscreen
+        self.window_size = size or self.initial_size()
+        self.screen = pygame.display.set_mode(*self.window_mode())
         self.well_done_surf = None
         self.player_turn_text_surf = None
-        self.reset_button_surf = self.font.render('Reset', True, (255, 255, 255))
-        self.play_again_button_surf = self.font.render('Play Again', True, (255, 255, 255))
         self.game = mem_game
-        
+        # Retained-mode state: what each HUD slot currently shows on screen, and
+        # the screen regions touched since the last present().
+        self.slots = {}
+        self.dirty_rects = []
+        self.full_redraw = True
+        # Fonts do not survive pygame.quit(), which benchmarks and tests call between games
+        GUI.fonts.clear()
+        text_cache.clear()
+        self.layout(*self.screen.get_size())
+
+    @classmethod
+    def initial_size(cls):
+        """The design size, scaled up on big (HiDPI) desktops so the window covers about as much of the screen."""
+        try:
+            desktop_width, desktop_height = pygame.display.get_desktop_sizes()[0]
+        except (pygame.error, IndexError):
+            return cls.DESIGN_WIDTH, cls.DESIGN_HEIGHT
+        scale = max(1.0, min(desktop_width / (2 * cls.DESIGN_WIDTH), desktop_height / (2 * cls.DESIGN_HEIGHT)))
+        return int(cls.DESIGN_WIDTH * scale), int(cls.DESIGN_HEIGHT * scale)
+
+    def window_mode(self):
+        if self.fullscreen:
+            return (0, 0), pygame.FULLSCREEN
+        return self.window_size, pygame.RESIZABLE
+
+    def toggle_fullscreen(self):
+        """Switch between fullscreen and the last window size. Returns the new screen size."""
+        if not self.fullscreen:
+            self.window_size = self.screen.get_size()
+        self.fullscreen = not self.fullscreen
+        pygame.display.set_mode(*self.window_mode())
+        return self.screen.get_size()
+
+    @classmethod
+    def get_font(cls, size):
+        font = cls.fonts.get(size)
+        if font is None:
+            font = cls.fonts[size] = pygame.font.SysFont("Arial", size)
+        return font
+
+    def layout(self, width, height):
+        """Place the HUD and buttons for a width x height screen.
+
+        Everything is scaled by how much bigger the window is than the 800x700
+        design. Menus stay centered; in game the buttons keep to the right edge
+        and the board takes the rest. Fonts are kept per size, so the labels
+        rendered for a size stay in the text cache when the window goes back to it.
+        """
+        s = self.scale = min(width / self.DESIGN_WIDTH, height / self.DESIGN_HEIGHT)
+        left = (width - self.DESIGN_WIDTH * s) / 2
+        top = (height - self.DESIGN_HEIGHT * s) / 2
+
+        def rect(x, y, w, h):
+            return pygame.Rect(round(x), round(y), round(w * s), round(h * s))
+
+        def centered(design_rect):
+            x, y, w, h = design_rect
+            return rect(left + x * s, top + y * s, w, h)
+
+        self.SCREEN_WIDTH, self.SCREEN_HEIGHT = width, height
+        self.BOARD_AREA = pygame.Rect(0, round(60 * s), width - round(180 * s), height - round(100 * s))
+        self.RESET_BUTTON_RECT = rect(width - 170 * s, height // 2 - 60 * s, 150, 40)
+        self.SPEAK_BUTTON_RECT = rect(width - 170 * s, height // 2 - 150 * s, 150, 40)
+        self.HANDS_FREE_BUTTON_RECT = rect(width - 170 * s, height // 2 - 105 * s, 150, 40)
+        self.PLAY_AGAIN_BUTTON_RECT = rect(width // 2 - 75 * s, height // 2 - 30 * s, 150, 40)
+        self.LEADERBOARD_MODE_BUTTON_RECT = rect(width // 2 - 210 * s, height - 90 * s, 200, 40)
+        self.BACK_BUTTON_RECT = rect(width // 2 + 10 * s, height - 90 * s, 200, 40)
+        for name in ('VOICE_CONTROL_BUTTON_RECT', 'ONE_PLAYER_BUTTON_RECT', 'TWO_PLAYER_BUTTON_RECT',
+                     'TIME_ATTACK_BUTTON_RECT', 'VS_CPU_BUTTON_RECT', 'CPU_LEVEL_BUTTON_RECT', 'LEADERBOARD_BUTTON_RECT',
+                     'RESUME_BUTTON_RECT'):
+            setattr(self, name, centered(getattr(GUI, name)))
+
+        self.player_selection_buttons = [self.VOICE_CONTROL_BUTTON_RECT, self.ONE_PLAYER_BUTTON_RECT,
+                                         self.TWO_PLAYER_BUTTON_RECT, self.TIME_ATTACK_BUTTON_RECT,
+                                         self.VS_CPU_BUTTON_RECT, self.CPU_LEVEL_BUTTON_RECT,
+                                         self.LEADERBOARD_BUTTON_RECT, self.RESUME_BUTTON_RECT]
+        self.game_over_buttons = [self.PLAY_AGAIN_BUTTON_RECT]
+        self.leaderboard_buttons = [self.LEADERBOARD_MODE_BUTTON_RECT, self.BACK_BUTTON_RECT]
+        self.voice_control_buttons = [self.SPEAK_BUTTON_RECT, self.HANDS_FREE_BUTTON_RECT]
+
+        self.font = self.get_font(max(8, round(self.FONT_SIZE * s)))
+        self.big_font = self.get_font(max(8, round(self.BIG_FONT_SIZE * s)))
+        self.invalidate()
+
+    @classmethod
+    def get_sound(cls, path):
+        """Decode a sound effect once per process; silent when there is no audio device."""
+        sound = cls.sounds.get(path)
+        if sound is None:
+            if pygame.mixer.get_init():
+                sound = pygame.mixer.Sound(path)
+            else:
+                sound = SilentSound()
+            cls.sounds[path] = sound
+        return sound
+
+    def preload_sounds(self):
+        """Decode the effects now (after the first frame) so the first match plays without a hitch."""
+        for path in (self.MATCH_SOUND_PATH, self.UNMATCH_SOUND_PATH):
+            self.get_sound(path)
+
+    @property
+    def match_sound(self):
+        return self.get_sound(self.MATCH_SOUND_PATH)
+
+    @property
+    def unmatch_sound(self):
+        return self.get_sound(self.UNMATCH_SOUND_PATH)
+
+    def render_text(self, text, color=(255, 255, 255), font=None, background=None):
+        return text_cache.render(font or self.font, text, color, background)
+
+    def invalidate(self):
+        """Force the next frame to redraw and present the whole screen."""
+        self.full_redraw = True
+        self.slots.clear()
+
+    def clear_screen(self, color=BACKGROUND_COLOR):
+        self.screen.fill(color)
+        self.invalidate()
+
+    def present(self):
+        """Push the changed regions of this frame to the display."""
+        if self.full_redraw:
+            pygame.display.flip()
+        elif self.dirty_rects:
+            pygame.display.update(self.dirty_rects)
+        self.dirty_rects.clear()
+        self.full_redraw = False
+
+    def blit_slot(self, slot, surf, rect):
+        """Blit a HUD element, skipping it when the slot already shows this surface."""
+        previous = self.slots.get(slot)
+        if previous is not None:
+            if previous[0] is surf and previous[1] == rect:
+                return
+            self.screen.fill(self.BACKGROUND_COLOR, previous[1])
+            self.dirty_rects.append(previous[1])
+        self.screen.blit(surf, rect)
+        self.slots[slot] = (surf, rect)
+        self.dirty_rects.append(rect)
+
     def draw_board(self, cards):
-        self.screen.fill(self.BACKGROUND_COLOR)
-        for card in cards:
+        if self.full_redraw:
+            self.screen.fill(self.BACKGROUND_COLOR)
+            if isinstance(cards, CardDeck):
+                cards.draw(self.screen)  # without creating the cards nobody has touched
+            else:
+                for card in cards:
+                    card.draw(self.screen)
+            Card.dirty_cards.clear()
+            return
+        for card in Card.dirty_cards:
             card.draw(self.screen)
+            self.dirty_rects.append(card.rect)
+        Card.dirty_cards.clear()
 
     def format_time(self, seconds):
         """Format time in seconds to mm:ss format."""
@@ -49,67 +221,76 @@ class GUI:
 
     def render_time(self, time_str, position):
         """Render the formatted time string to the screen at the specified position."""
-        timer_surf = self.font.render(time_str, True, (255, 255, 255))
-        timer_rect = timer_surf.get_rect(center=(self.SCREEN_WIDTH // 2, position))
-        self.screen.blit(timer_surf, timer_rect)
+        timer_surf = self.render_text(time_str)
+        timer_rect = timer_surf.get_rect(center=(self.SCREEN_WIDTH // 2, round(position * self.scale)))
+        self.blit_slot(('time', position), timer_surf, timer_rect)
 
     def draw_timer(self):
         time_str = self.format_time(self.game.elapsed_time)
-        self.render_time(time_str, 10)  
+        self.render_time(time_str, 10)
 
     def draw_countdown_timer(self, elapsed_time, duration):
         seconds_left = max(duration - elapsed_time, 0)
         time_str = self.format_time(seconds_left)
-        self.render_time(time_str, 50)  
-        
+        self.render_time(time_str, 50)
+
         if seconds_left <= 0:
-            return False  
+            return False
         return True
 
     def draw_tries_counter(self):
         """Draws the tries counter on the screen."""
         tries_text = f"Tries: {self.game.match_tries_count}"
-        tries_surf = self.font.render(tries_text, True, (255, 255, 255))
+        tries_surf = self.render_text(tries_text)
         # Choose an appropriate position on the screen
-        self.screen.blit(tries_surf, (10, self.SCREEN_HEIGHT - 30))
+        self.blit_slot('tries', tries_surf,
+                       tries_surf.get_rect(topleft=(round(10 * self.scale), self.SCREEN_HEIGHT - round(30 * self.scale))))
 
     def draw_player_scores(self):
         for i, score in enumerate(self.game.player_scores):
             score_text = f"Player {i + 1} Score: {score}"
-            score_surf = self.font.render(score_text, True, (255, 255, 255))
-            self.screen.blit(score_surf, (10, 30 * i + 10))
+            score_surf = self.render_text(score_text)
+            topleft = (round(10 * self.scale), round((30 * i + 10) * self.scale))
+            self.blit_slot(('score', i), score_surf, score_surf.get_rect(topleft=topleft))
 
     def draw_turn_indication(self):
-        self.screen.blit(self.player_turn_text_surf, (self.SCREEN_WIDTH - 200, 10))
-            
+        surf = self.player_turn_text_surf
+        topleft = (self.SCREEN_WIDTH - round(200 * self.scale), round(10 * self.scale))
+        self.blit_slot('turn', surf, surf.get_rect(topleft=topleft))
+
     def draw_reset_button(self):
         self.draw_button(self.RESET_BUTTON_RECT, 'Reset', self.RESET_BUTTON_COLOR)
-        
-    def draw_speak_button(self):
-        self.draw_button(self.SPEAK_BUTTON_RECT, 'Speak', self.SPEAK_BUTTON_COLOR)
-        
+
+    def draw_speak_button(self, listening=False):
+        self.draw_button(self.SPEAK_BUTTON_RECT, 'Listening...' if listening else 'Speak', self.SPEAK_BUTTON_COLOR)
+
+    def draw_hands_free_button(self, on):
+        self.draw_button(self.HANDS_FREE_BUTTON_RECT, f"Hands-free: {'on' if on else 'off'}", self.SPEAK_BUTTON_COLOR)
+
     def draw_play_again_button(self):
         self.draw_button(self.PLAY_AGAIN_BUTTON_RECT, 'Play Again', self.RESET_BUTTON_COLOR)
-           
+
     def draw_well_done_message(self):
         """Draws the well done message."""
         well_done_text = f'Well done! You did it in {self.game.match_tries_count} tries, think you can do better?'
-        self.well_done_surf = self.font.render(well_done_text, True, (255, 215, 0), self.BACKGROUND_COLOR)
+        self.well_done_surf = self.render_text(well_done_text, (255, 215, 0), background=self.BACKGROUND_COLOR)
         text_rect = self.well_done_surf.get_rect(center=(self.SCREEN_WIDTH//2, self.SCREEN_HEIGHT//2 - 50))
-        self.screen.blit(self.well_done_surf, text_rect)
-        
+        self.blit_slot('message', self.well_done_surf, text_rect)
+
     def draw_winner_message(self, winner):
-        
+
         winner_text = f'AND THE WINNER IS ........ PLAYER NUMBER {winner} !!!'
-        self.winner_msg_surf = self.font.render(winner_text, True, (255, 215, 0), self.BACKGROUND_COLOR)
+        self.winner_msg_surf = self.render_text(winner_text, (255, 215, 0), background=self.BACKGROUND_COLOR)
         text_rect = self.winner_msg_surf.get_rect(center=(self.SCREEN_WIDTH//2, self.SCREEN_HEIGHT//2 - 50))
-        self.screen.blit(self.winner_msg_surf, text_rect)
-             
+        self.blit_slot('message', self.winner_msg_surf, text_rect)
+
     def draw_game_over_screen(self):
         """Draws the game over screen with a message."""
-        self.screen.fill(self.BACKGROUND_COLOR)  # Optional: Change to a darker shade if desired
+        if not self.full_redraw:
+            return
+        self.clear_screen()  # Optional: Change to a darker shade if desired
         game_over_text = "Game over, you lost."
-        game_over_surf = self.font.render(game_over_text, True, (255, 0, 0))  # Red color for the text
+        game_over_surf = self.render_text(game_over_text, (255, 0, 0))  # Red color for the text
         # Calculate the position to center the text
         text_rect = game_over_surf.get_rect(center=(self.SCREEN_WIDTH // 2, self.SCREEN_HEIGHT // 2 - 50))
         self.screen.blit(game_over_surf, text_rect)
@@ -117,18 +298,18 @@ class GUI:
         # Optionally, you can also add a button or instruction to go back to the main menu or exit.
         self.draw_play_again_button()
 
-        pygame.display.flip()  # Update the display   
-        
     def draw_amazing_screen(self):
-        self.screen.fill((129, 205, 253))
-        
+        if not self.full_redraw:
+            return
+        self.clear_screen((129, 205, 253))
+
         headline_text = "AMAZING"
-        headline_surf = self.big_font.render(headline_text, True, (0,0,128))
+        headline_surf = self.render_text(headline_text, (0,0,128), self.big_font)
         headline_rect = headline_surf.get_rect(center=(self.SCREEN_WIDTH // 2, self.SCREEN_HEIGHT // 3))
 
         # Render the subtext
         subtext = "You did it! you won attack mode"
-        subtext_surf = self.font.render(subtext, True, (0,0,128))
+        subtext_surf = self.render_text(subtext, (0,0,128))
         subtext_rect = subtext_surf.get_rect(center=(self.SCREEN_WIDTH // 2, self.SCREEN_HEIGHT // 3 + 40))
 
         # Blit the texts onto the screen
@@ -136,18 +317,42 @@ class GUI:
         self.screen.blit(subtext_surf, subtext_rect)
 
         self.draw_play_again_button()
-        pygame.display.flip()  # Update the display
-              
+
+    def draw_leaderboard(self, title, lines, footer, mode):
+        if not self.full_redraw:
+            return
+        self.clear_screen()
+        title_surf = self.render_text(title, (255, 215, 0))
+        s = self.scale
+        self.screen.blit(title_surf, title_surf.get_rect(center=(self.SCREEN_WIDTH // 2, round(60 * s))))
+        left = (self.SCREEN_WIDTH - self.DESIGN_WIDTH * s) / 2
+        for i, line in enumerate(lines):
+            self.screen.blit(self.render_text(line), (round(left + 120 * s), round((120 + 40 * i) * s)))
+        footer_surf = self.render_text(footer, (128, 128, 128))
+        self.screen.blit(footer_surf, footer_surf.get_rect(center=(self.SCREEN_WIDTH // 2, self.SCREEN_HEIGHT - round(120 * s))))
+        self.draw_button(self.LEADERBOARD_MODE_BUTTON_RECT, f'Mode: {mode}')
+        self.draw_button(self.BACK_BUTTON_RECT, 'Back')
+
     def draw_button(self, rect, text, color=(255, 255, 255)):
-        pygame.draw.rect(self.screen, color, rect)
-        text_surface = self.font.render(text, True, (0, 0, 0))
+        slot = ('button', tuple(rect))
+        if self.slots.get(slot) == (text, color):
+            return
+        self.screen.fill(color, rect)
+        text_surface = self.render_text(text, (0, 0, 0))
         text_rect = text_surface.get_rect(center=rect.center)
         self.screen.blit(text_surface, text_rect)
+        self.slots[slot] = (text, color)
+        self.dirty_rects.append(rect)
 
-    def draw_main_menu(self):
-        self.screen.fill(self.BACKGROUND_COLOR)
+    def draw_main_menu(self, cpu_level, can_resume=False):
+        if self.full_redraw:
+            self.screen.fill(self.BACKGROUND_COLOR)
         self.draw_button(self.VOICE_CONTROL_BUTTON_RECT, 'Voice Control')
         self.draw_button(self.ONE_PLAYER_BUTTON_RECT, '1 Player')
         self.draw_button(self.TWO_PLAYER_BUTTON_RECT, '2 Players')
-        self.draw_button(self.TIME_ATTACK_BUTTON_RECT, 'Time Attack')  
-        pygame.display.flip()
\ No newline at end of file
+        self.draw_button(self.TIME_ATTACK_BUTTON_RECT, 'Time Attack')
+        self.draw_button(self.VS_CPU_BUTTON_RECT, 'Vs Computer')
+        self.draw_button(self.CPU_LEVEL_BUTTON_RECT, f'Level: {cpu_level}')
+        self.draw_button(self.LEADERBOARD_BUTTON_RECT, 'Leaderboard')
+        if can_resume:
+            self.draw_button(self.RESUME_BUTTON_RECT, 'Resume')
\ No newline at end of file
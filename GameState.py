@@ -7,4 +7,5 @@ class GameState(enum.Enum):
     TIME_ATTACK_MODE = 4
     TWO_PLAYERS = 5
     GAME_OVER = 6
-    
\ No newline at end of file
+    VS_CPU = 7
+    LEADERBOARD = 8
@@ -0,0 +1,37 @@
+import pygame
+
+
+class BoardLayout:
+    """Grid geometry of the board: card size, gap and position of every card.
+
+    The card size is the largest that fits `rows` x `cols` cards into `area`,
+    capped at `max_card_size`. Gaps are a fifth of the card size, as in the
+    original 100px cards with 20px gaps.
+    """
+
+    def __init__(self, rows, cols, area, max_card_size):
+        self.rows = rows
+        self.cols = cols
+        self.area = pygame.Rect(area)
+        cell = min(self.area.width / cols, self.area.height / rows)
+        self.card_size = max(1, min(max_card_size, int(cell * 5 / 6)))
+        self.gap = max(1, self.card_size // 5)
+        self.step = self.card_size + self.gap
+        self.origin = (self.area.x + self.gap, self.area.y + self.gap)
+        self.rect = pygame.Rect(self.origin, (cols * self.step - self.gap, rows * self.step - self.gap))
+
+    def card_position(self, index):
+        row, col = divmod(index, self.cols)
+        return (self.origin[0] + col * self.step, self.origin[1] + row * self.step)
+
+    def index_at(self, position):
+        """Card index under `position`, or None when it is on a gap or off the board."""
+        dx = position[0] - self.origin[0]
+        dy = position[1] - self.origin[1]
+        if dx < 0 or dy < 0:
+            return None
+        col, x_in_cell = divmod(dx, self.step)
+        row, y_in_cell = divmod(dy, self.step)
+        if col >= self.cols or row >= self.rows or x_in_cell >= self.card_size or y_in_cell >= self.card_size:
+            return None
+        return row * self.cols + col
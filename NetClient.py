@@ -0,0 +1,244 @@
+import argparse
+import socket
+import sys
+
+import pygame
+
+import NetProtocol as proto
+from Card import Card
+from Engine import VISIBLE, MATCHED
+from GUI import GUI
+from Layout import BoardLayout
+from Theme import ThemeCache
+
+
+class NetGame:
+    """Two-player game against someone else through a NetServer room.
+
+    The server owns the board; this only mirrors it from the delta messages
+    and sends FLIPs for clicks. The socket is non-blocking and drained once a
+    frame, so the client stays single-threaded like the local game. Outgoing
+    bytes the socket does not take at once wait in `outgoing` for the next
+    frame, so a message is never cut short.
+    """
+
+    FPS = 60
+    RECV_SIZE = 65536
+
+    def __init__(self, host, port, room_id, rows, cols):
+        pygame.init()
+        pygame.display.set_caption(f"Memory Game - room {room_id}")
+        self.gui = GUI(self)
+        self.clock = pygame.time.Clock()
+        self.theme_cache = ThemeCache()
+        self.cards = []
+        self.card_images = []
+        self.layout = None
+        self.player = None
+        self.players = 0
+        self.current_player = 0
+        self.match_tries_count = 0
+        self.player_scores = [0, 0]
+        self.winner = None
+        self.start_ticks = pygame.time.get_ticks()
+        self.elapsed_time = 0
+        self.status = None
+
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setblocking(False)
+        self.buffer = proto.MessageBuffer()
+        self.outgoing = bytearray()
+        self.send(proto.encode(proto.JOIN, room_id, rows, cols))
+
+    def send(self, data):
+        self.outgoing += data
+        self.flush()
+
+    def flush(self):
+        """Send as much of `outgoing` as the socket takes without blocking. False once the server hung up."""
+        while self.outgoing:
+            try:
+                sent = self.sock.send(self.outgoing)
+            except BlockingIOError:
+                return True
+            except ConnectionError:
+                return False
+            del self.outgoing[:sent]
+        return True
+
+    def receive(self):
+        """Apply everything the server sent since the last frame. False once it hung up."""
+        while True:
+            try:
+                data = self.sock.recv(self.RECV_SIZE)
+            except BlockingIOError:
+                return True
+            except ConnectionError:
+                return False
+            if not data:
+                return False
+            for kind, payload in self.buffer.feed(data):
+                self.apply(kind, payload)
+
+    def apply(self, kind, payload):
+        if kind == proto.WELCOME:
+            self.start_game(proto.decode_welcome(payload))
+            return
+        fields = proto.decode(kind, payload)
+        if kind == proto.REVEAL:
+            index, pair = fields
+            self.cards[index].image = self.card_images[pair]
+            self.cards[index].visible = True
+        elif kind == proto.MATCH:
+            first, second, player = fields
+            self.cards[first].matched = self.cards[second].matched = True
+            self.player_scores[player] += 1
+            self.match_tries_count += 1
+            self.gui.match_sound.play()
+        elif kind == proto.MISMATCH:
+            self.match_tries_count += 1
+            self.gui.unmatch_sound.play()
+        elif kind == proto.CONCEAL:
+            for index in fields:
+                self.cards[index].visible = False
+        elif kind == proto.TURN:
+            self.current_player = fields[0]
+            self.update_player_turn_text()
+        elif kind in (proto.PLAYER_JOINED, proto.PLAYER_LEFT):
+            self.players = fields[1]
+            self.update_player_turn_text()
+        elif kind == proto.GAME_OVER:
+            self.winner = fields[0]
+        elif kind == proto.ERROR:
+            if fields[0] == proto.ROOM_FULL:
+                self.status = "That room is full"
+            elif fields[0] == proto.BAD_BOARD:
+                self.status = "The server refused that board size"
+
+    def start_game(self, state):
+        self.player = state['player']
+        self.players = state['players']
+        self.current_player = state['current_player']
+        self.match_tries_count = state['tries']
+        self.player_scores = list(state['scores'])
+        self.winner = None
+        self.start_ticks = pygame.time.get_ticks()
+
+        rows, cols = state['rows'], state['cols']
+        self.layout = self.board_layout(rows, cols)
+        card_size = self.layout.card_size
+        self.card_images = self.load_faces(rows * cols // 2, card_size)
+        # Faces are only known once the server reveals them
+        self.cards = []
+        Card.dirty_cards.clear()
+        for i, flags in enumerate(state['flags']):
+            card = Card(None, self.layout.card_position(i), i + 1, card_size)
+            if flags:
+                card.image = self.card_images[state['pairs'][i]]
+                card.visible = bool(flags & VISIBLE)
+                card.matched = bool(flags & MATCHED)
+            self.cards.append(card)
+        self.update_player_turn_text()
+        self.gui.invalidate()
+
+    def board_layout(self, rows, cols):
+        return BoardLayout(rows, cols, self.gui.BOARD_AREA, round(Card.CARD_SIZE * self.gui.scale))
+
+    def load_faces(self, count, card_size):
+        return self.theme_cache.plain_theme(card_size, count).faces(count)
+
+    def resize(self, width, height):
+        """Lay the board out again for a new window size; faces and backs are cached per size."""
+        self.gui.layout(width, height)
+        if self.layout is not None:
+            self.layout = self.board_layout(self.layout.rows, self.layout.cols)
+            pair_of = {id(face): pair for pair, face in enumerate(self.card_images)}
+            self.card_images = self.load_faces(len(self.card_images), self.layout.card_size)
+            for i, card in enumerate(self.cards):
+                if card.image is not None:
+                    card.image = self.card_images[pair_of[id(card.image)]]
+                card.place(self.layout.card_position(i), self.layout.card_size)
+            self.update_player_turn_text()
+
+    def update_player_turn_text(self):
+        if self.players < 2:
+            turn_text = "Waiting for a player"
+        elif self.current_player == self.player:
+            turn_text = "Your Turn"
+        else:
+            turn_text = f"Player {self.current_player + 1}'s Turn"
+        self.gui.player_turn_text_surf = self.gui.render_text(turn_text)
+
+    def handle_events(self):
+        new_size = None
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+            if event.type == pygame.VIDEORESIZE:
+                new_size = event.size
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.layout is not None:
+                index = self.layout.index_at(event.pos)
+                if index is not None and self.current_player == self.player and self.players == 2:
+                    card = self.cards[index]
+                    if not card.visible and not card.matched:
+                        self.send(proto.encode(proto.FLIP, index))
+        if new_size is not None:
+            self.resize(*new_size)
+        return True
+
+    def draw(self):
+        if self.layout is None:
+            self.gui.clear_screen()
+            text = self.status or "Connecting..."
+            surf = self.gui.render_text(text)
+            self.gui.screen.blit(surf, surf.get_rect(center=self.gui.screen.get_rect().center))
+        else:
+            if self.winner is None:
+                self.elapsed_time = (pygame.time.get_ticks() - self.start_ticks) // 1000
+            self.gui.draw_board(self.cards)
+            self.gui.draw_timer()
+            self.gui.draw_tries_counter()
+            self.gui.draw_player_scores()
+            self.gui.draw_turn_indication()
+            if self.winner is not None:
+                self.gui.draw_winner_message(self.winner)
+            elif 'message' in self.gui.slots:
+                self.gui.invalidate()  # the next board has been dealt; wipe the winner line
+        self.gui.present()
+
+    def run(self):
+        running = True
+        try:
+            while running:
+                running = self.handle_events() and self.flush() and self.receive()
+                self.draw()
+                self.clock.tick(self.FPS)
+        finally:
+            try:
+                self.sock.settimeout(1.0)
+                self.sock.sendall(bytes(self.outgoing) + proto.encode(proto.LEAVE))
+            except OSError:
+                pass
+            self.sock.close()
+            pygame.quit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a two-player memory game on a NetServer.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=proto.DEFAULT_PORT)
+    parser.add_argument('--room', type=int, default=1, help="room id; both players pick the same one")
+    parser.add_argument('--rows', type=int, default=GUI.BOARD_ROWS, help="board size, if this creates the room")
+    parser.add_argument('--cols', type=int, default=GUI.BOARD_COLS)
+    args = parser.parse_args(argv)
+
+    try:
+        game = NetGame(args.host, args.port, args.room, args.rows, args.cols)
+    except OSError as e:
+        sys.exit(f"could not connect to {args.host}:{args.port}: {e}")
+    game.run()
+
+
+if __name__ == "__main__":
+    main()
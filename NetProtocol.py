@@ -0,0 +1,126 @@
+import struct
+
+
+# Every message is a little-endian header (payload length, type) and a payload.
+HEADER = struct.Struct('<HB')
+DEFAULT_PORT = 8765
+
+# Client -> server
+JOIN = 1       # room id, rows, cols (the size only matters to whoever creates the room)
+FLIP = 2       # card index
+LEAVE = 3
+STATS = 4
+
+# Server -> client. Boards are sent whole only on WELCOME; after that only deltas.
+WELCOME = 16        # see encode_welcome
+PLAYER_JOINED = 17  # player, players in room
+PLAYER_LEFT = 18    # player, players in room
+REVEAL = 19         # card index, pair id
+MATCH = 20          # first, second, player
+MISMATCH = 21       # first, second
+CONCEAL = 22        # first, second
+TURN = 23           # current player
+GAME_OVER = 24      # winner (1-based), score of each player
+STATS_REPLY = 25    # rooms, connections, resident memory in bytes
+ERROR = 26          # error code
+
+# Error codes
+BAD_MESSAGE = 1
+NOT_IN_ROOM = 2
+ROOM_FULL = 3
+NOT_YOUR_TURN = 4
+BAD_MOVE = 5
+BAD_BOARD = 6
+
+BODIES = {
+    JOIN: struct.Struct('<IBB'),
+    FLIP: struct.Struct('<H'),
+    LEAVE: struct.Struct(''),
+    STATS: struct.Struct(''),
+    PLAYER_JOINED: struct.Struct('<BB'),
+    PLAYER_LEFT: struct.Struct('<BB'),
+    REVEAL: struct.Struct('<HH'),
+    MATCH: struct.Struct('<HHB'),
+    MISMATCH: struct.Struct('<HH'),
+    CONCEAL: struct.Struct('<HH'),
+    TURN: struct.Struct('<B'),
+    GAME_OVER: struct.Struct('<BII'),
+    STATS_REPLY: struct.Struct('<IIQ'),
+    ERROR: struct.Struct('<B'),
+}
+
+# room, rows, cols, your player number, players in room, current player, tries, score of each player;
+# then one flag byte per card and the pair id (uint16) of every card whose flags are set
+WELCOME_HEAD = struct.Struct('<IBBBBBIII')
+PAIR_ID = struct.Struct('<H')
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode(kind, *fields):
+    payload = BODIES[kind].pack(*fields)
+    return HEADER.pack(len(payload), kind) + payload
+
+
+def decode(kind, payload):
+    body = BODIES.get(kind)
+    if body is None or len(payload) != body.size:
+        raise ProtocolError(f"bad message type {kind} with {len(payload)} bytes")
+    return body.unpack(payload)
+
+
+def encode_welcome(room_id, board, player, players):
+    """Full room state for a player who just joined or a new game that just started."""
+    payload = bytearray(WELCOME_HEAD.pack(room_id, board.rows, board.cols, player, players,
+                                          board.current_player, board.tries, *board.scores))
+    payload += board.flags
+    for index, flags in enumerate(board.flags):
+        if flags:
+            payload += PAIR_ID.pack(board.pairs[index])
+    return HEADER.pack(len(payload), WELCOME) + bytes(payload)
+
+
+def decode_welcome(payload):
+    room_id, rows, cols, player, players, current_player, tries, *scores = WELCOME_HEAD.unpack_from(payload)
+    size = rows * cols
+    flags = bytearray(payload[WELCOME_HEAD.size:WELCOME_HEAD.size + size])
+    offset = WELCOME_HEAD.size + size
+    pairs = {}
+    for index, card_flags in enumerate(flags):
+        if card_flags:
+            pairs[index] = PAIR_ID.unpack_from(payload, offset)[0]
+            offset += PAIR_ID.size
+    return {
+        'room': room_id, 'rows': rows, 'cols': cols, 'player': player, 'players': players,
+        'current_player': current_player, 'tries': tries, 'scores': scores,
+        'flags': flags, 'pairs': pairs,
+    }
+
+
+async def read_message(reader):
+    """Next (type, payload) from an asyncio StreamReader; raises IncompleteReadError on EOF."""
+    length, kind = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return kind, await reader.readexactly(length)
+
+
+class MessageBuffer:
+    """Splits bytes from a non-blocking socket into (type, payload) messages."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def feed(self, data):
+        self.data += data
+        messages = []
+        offset = 0
+        while len(self.data) - offset >= HEADER.size:
+            length, kind = HEADER.unpack_from(self.data, offset)
+            end = offset + HEADER.size + length
+            if end > len(self.data):
+                break
+            messages.append((kind, bytes(self.data[offset + HEADER.size:end])))
+            offset = end
+        del self.data[:offset]
+        return messages
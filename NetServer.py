@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import os
+import random
+
+import NetProtocol as proto
+from Engine import Board, INVALID, MATCH, MISMATCH
+
+
+def resident_memory():
+    """Resident set size of this process in bytes (0 if the platform won't say)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        try:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except ImportError:
+            return 0
+
+
+class Player:
+    def __init__(self, writer):
+        self.writer = writer
+        self.room = None
+        self.number = None
+
+
+class Room:
+    """One two-player game. All rooms share the server's event loop; a room is just a Board and two writers."""
+
+    MAX_PLAYERS = 2
+    MISMATCH_REVEAL_S = 0.5
+    # A client this far behind on reading is dropped rather than buffered forever
+    MAX_WRITE_BUFFER = 256 * 1024
+
+    def __init__(self, server, room_id, rows, cols):
+        self.server = server
+        self.room_id = room_id
+        self.board = Board(rows, cols, self.MAX_PLAYERS, seed=random.getrandbits(64))
+        self.players = [None] * self.MAX_PLAYERS
+        self.conceal_handle = None
+
+    @property
+    def player_count(self):
+        return sum(p is not None for p in self.players)
+
+    def broadcast(self, data):
+        for player in self.players:
+            if player is not None:
+                self.server.send(player, data)
+
+    def join(self, player):
+        if None not in self.players:
+            return False
+        player.number = self.players.index(None)
+        player.room = self
+        self.players[player.number] = player
+        self.server.send(player, proto.encode_welcome(self.room_id, self.board, player.number, self.player_count))
+        self.broadcast(proto.encode(proto.PLAYER_JOINED, player.number, self.player_count))
+        return True
+
+    def leave(self, player):
+        self.players[player.number] = None
+        player.room = None
+        self.broadcast(proto.encode(proto.PLAYER_LEFT, player.number, self.player_count))
+        if self.player_count == 0:
+            self.cancel_conceal()
+            self.server.close_room(self)
+
+    def flip(self, player, index):
+        board = self.board
+        if self.player_count < self.MAX_PLAYERS or board.current_player != player.number:
+            return proto.encode(proto.ERROR, proto.NOT_YOUR_TURN)
+        if not 0 <= index < board.size:
+            return proto.encode(proto.ERROR, proto.BAD_MOVE)
+
+        concealed = list(board.pending)
+        first = board.selected[0] if board.selected else None
+        result = board.step(index)
+        if result == INVALID:
+            if concealed:
+                # step() turned the revealed pair face down before it looked at the card
+                self.cancel_conceal()
+                self.broadcast(proto.encode(proto.CONCEAL, *concealed))
+            return proto.encode(proto.ERROR, proto.BAD_MOVE)
+
+        # One write per client per move: the deltas of this flip, in order
+        messages = []
+        if concealed:
+            self.cancel_conceal()
+            messages.append(proto.encode(proto.CONCEAL, *concealed))
+        messages.append(proto.encode(proto.REVEAL, index, board.pairs[index]))
+        if result == MATCH:
+            messages.append(proto.encode(proto.MATCH, first, index, player.number))
+            if board.is_complete():
+                messages.append(proto.encode(proto.GAME_OVER, board.winner(), *board.scores))
+        elif result == MISMATCH:
+            messages.append(proto.encode(proto.MISMATCH, first, index))
+            messages.append(proto.encode(proto.TURN, board.current_player))
+            self.conceal_handle = asyncio.get_running_loop().call_later(self.MISMATCH_REVEAL_S, self.conceal)
+        self.broadcast(b''.join(messages))
+
+        if result == MATCH and board.is_complete():
+            # Leave the finished board up for a moment before dealing again
+            asyncio.get_running_loop().call_later(self.server.new_game_delay, self.new_game)
+        return None
+
+    def conceal(self):
+        self.conceal_handle = None
+        if self.board.pending:
+            pending = list(self.board.pending)
+            self.board.conceal()
+            self.broadcast(proto.encode(proto.CONCEAL, *pending))
+
+    def cancel_conceal(self):
+        if self.conceal_handle is not None:
+            self.conceal_handle.cancel()
+            self.conceal_handle = None
+
+    def new_game(self):
+        if self.server.rooms.get(self.room_id) is not self:
+            return  # everyone left in the meantime
+        self.cancel_conceal()
+        self.board.reset()
+        for player in self.players:
+            if player is not None:
+                self.server.send(player, proto.encode_welcome(self.room_id, self.board, player.number,
+                                                              self.player_count))
+
+
+class NetServer:
+    """Hosts any number of independent rooms on one asyncio event loop.
+
+    Clients JOIN a room by id; the first one in creates it with the board size
+    it asked for. Moves are validated by the room's Engine.Board and every
+    change is broadcast as a small delta message (see NetProtocol).
+    """
+
+    MAX_BOARD_CARDS = 100 * 100
+
+    def __init__(self, new_game_delay=3.0):
+        self.rooms = {}
+        self.connections = 0
+        self.new_game_delay = new_game_delay
+
+    def send(self, player, data):
+        transport = player.writer.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > Room.MAX_WRITE_BUFFER:
+            transport.abort()
+            return
+        player.writer.write(data)
+
+    def close_room(self, room):
+        self.rooms.pop(room.room_id, None)
+
+    def handle_message(self, player, kind, payload):
+        """Apply one client message; returns a reply for that client only, or None."""
+        fields = proto.decode(kind, payload)
+        if kind == proto.FLIP:
+            if player.room is None:
+                return proto.encode(proto.ERROR, proto.NOT_IN_ROOM)
+            return player.room.flip(player, fields[0])
+        if kind == proto.JOIN:
+            room_id, rows, cols = fields
+            if player.room is not None:
+                player.room.leave(player)
+            room = self.rooms.get(room_id)
+            if room is None:
+                if rows * cols % 2 or not 0 < rows * cols <= self.MAX_BOARD_CARDS:
+                    return proto.encode(proto.ERROR, proto.BAD_BOARD)
+                room = self.rooms[room_id] = Room(self, room_id, rows, cols)
+            if not room.join(player):
+                return proto.encode(proto.ERROR, proto.ROOM_FULL)
+            return None
+        if kind == proto.LEAVE:
+            if player.room is not None:
+                player.room.leave(player)
+            return None
+        if kind == proto.STATS:
+            return proto.encode(proto.STATS_REPLY, len(self.rooms), self.connections, resident_memory())
+        return proto.encode(proto.ERROR, proto.BAD_MESSAGE)
+
+    async def handle_client(self, reader, writer):
+        player = Player(writer)
+        self.connections += 1
+        try:
+            while True:
+                kind, payload = await proto.read_message(reader)
+                try:
+                    reply = self.handle_message(player, kind, payload)
+                except proto.ProtocolError:
+                    reply = proto.encode(proto.ERROR, proto.BAD_MESSAGE)
+                if reply is not None:
+                    self.send(player, reply)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            if player.room is not None:
+                player.room.leave(player)
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=proto.DEFAULT_PORT, ready=None):
+        server = await asyncio.start_server(self.handle_client, host, port, backlog=1024)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory game server for networked two-player rooms.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=proto.DEFAULT_PORT)
+    parser.add_argument('--new-game-delay', type=float, default=3.0,
+                        help="seconds a finished board stays up before the room deals a new one")
+    args = parser.parse_args()
+
+    print(f"serving on {args.host}:{args.port}")
+    try:
+        asyncio.run(NetServer(args.new_game_delay).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import json
+import os
+import time
+from collections import deque
+
+import pygame
+
+from TextCache import text_cache
+
+
+class CountingSurface:
+    """Stands in for the screen while profiling and counts what is drawn on it."""
+
+    def __init__(self, surface):
+        self.surface = surface
+        self.blit_count = 0
+        self.fill_count = 0
+
+    def blit(self, *args, **kwargs):
+        self.blit_count += 1
+        return self.surface.blit(*args, **kwargs)
+
+    def blits(self, sequence, doreturn=True):
+        sequence = list(sequence)
+        self.blit_count += len(sequence)
+        return self.surface.blits(sequence, doreturn)
+
+    def fill(self, *args, **kwargs):
+        self.fill_count += 1
+        return self.surface.fill(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.surface, name)
+
+
+class Profiler:
+    """Frame phase timings, draw counters, an on-screen overlay and Chrome trace export.
+
+    Switched on at runtime with F3 or from the start with --profile. Enabling
+    it wraps the loop phases of the game and the GUI draw methods on the
+    instances themselves; disabling deletes the wrappers again, so while it is
+    off the loop runs the plain methods and pays nothing for it.
+
+    The trace is written in the Chrome trace event format; open it in
+    chrome://tracing or https://ui.perfetto.dev.
+    """
+
+    TRACE_PATH = 'profile_trace.json'
+    MAX_TRACE_EVENTS = 500000
+    OVERLAY_REFRESH_MS = 250
+    OVERLAY_COLOR = (0, 0, 0)
+    OVERLAY_TEXT_COLOR = (0, 255, 0)
+
+    # MemGame method -> phase name
+    GAME_PHASES = {
+        'handle_events': 'events',
+        'update_cursor': 'update_cursor',
+        'handle_voice_result': 'voice',
+        'update': 'update',
+        'draw': 'draw',
+        'wait_for_next_frame': 'wait',
+    }
+    # Phases shown on the overlay, in loop order
+    OVERLAY_PHASES = ('events', 'voice', 'update', 'draw', 'draw_board', 'present', 'wait')
+
+    def __init__(self, game, trace_path=TRACE_PATH):
+        self.game = game
+        self.gui = game.gui
+        self.trace_path = trace_path
+        self.enabled = False
+        self.patched = []
+        self.screen = None
+        self.font = None
+        self.trace_events = deque(maxlen=self.MAX_TRACE_EVENTS)
+        self.origin_ns = time.perf_counter_ns()
+        self.place_overlay()
+        self.overlay_surf = None
+        self.overlay_refreshed = 0
+        self.reset_window()
+
+    def place_overlay(self):
+        """Keep the stats box in the bottom right corner of the window."""
+        self.overlay_rect = pygame.Rect(self.gui.SCREEN_WIDTH - 175, self.gui.SCREEN_HEIGHT - 175, 170, 170)
+
+    def reset_window(self):
+        # Totals since the overlay last refreshed
+        self.window_frames = 0
+        self.window_frame_ns = 0
+        self.window_phases = {}
+        self.window_blits = 0
+        self.window_renders = 0
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        if self.font is None:
+            self.font = pygame.font.Font(None, 18)
+        self.screen = CountingSurface(self.gui.screen)
+        self.gui.screen = self.screen
+
+        self.patch(self.game, 'run_frame', self.timed_frame(self.game.run_frame))
+        for name, phase in self.GAME_PHASES.items():
+            self.patch(self.game, name, self.timed(getattr(self.game, name), phase))
+        for name in dir(type(self.gui)):
+            if name.startswith('draw_') or name == 'render_text':
+                self.patch(self.gui, name, self.timed(getattr(self.gui, name), name))
+        self.patch(self.gui, 'present', self.timed_present(self.gui.present))
+        self.reset_window()
+        self.overlay_surf = None
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        for owner, name in self.patched:
+            delattr(owner, name)
+        self.patched.clear()
+        self.gui.screen = self.screen.surface
+        self.screen = None
+        self.gui.invalidate()  # paint over the overlay
+
+    def patch(self, owner, name, wrapper):
+        setattr(owner, name, wrapper)
+        self.patched.append((owner, name))
+
+    def record(self, name, start_ns, end_ns):
+        self.window_phases[name] = self.window_phases.get(name, 0) + end_ns - start_ns
+        self.trace_events.append({
+            'name': name, 'ph': 'X', 'pid': 0, 'tid': 0,
+            'ts': (start_ns - self.origin_ns) / 1000, 'dur': (end_ns - start_ns) / 1000,
+        })
+
+    def timed(self, method, name):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(name, start, time.perf_counter_ns())
+        return wrapper
+
+    def timed_frame(self, run_frame):
+        def wrapper():
+            blits = self.screen.blit_count
+            renders = text_cache.renders
+            start = time.perf_counter_ns()
+            running = run_frame()
+            end = time.perf_counter_ns()
+            if not self.enabled:
+                return running  # switched off during this frame
+            self.record('frame', start, end)
+            self.end_frame(end - start, self.screen.blit_count - blits, text_cache.renders - renders, end)
+            return running
+        return wrapper
+
+    def timed_present(self, present):
+        def wrapper():
+            start = time.perf_counter_ns()
+            self.draw_overlay()
+            middle = time.perf_counter_ns()
+            present()
+            self.record('overlay', start, middle)
+            self.record('present', middle, time.perf_counter_ns())
+        return wrapper
+
+    def end_frame(self, frame_ns, blits, renders, end_ns):
+        self.window_frames += 1
+        self.window_frame_ns += frame_ns
+        self.window_blits += blits
+        self.window_renders += renders
+        self.trace_events.append({
+            'name': 'counters', 'ph': 'C', 'pid': 0,
+            'ts': (end_ns - self.origin_ns) / 1000, 'args': {'blits': blits, 'renders': renders},
+        })
+        now = pygame.time.get_ticks()
+        if self.overlay_surf is None or now - self.overlay_refreshed >= self.OVERLAY_REFRESH_MS:
+            self.refresh_overlay()
+            self.overlay_refreshed = now
+
+    def overlay_lines(self):
+        frames = max(self.window_frames, 1)
+        frame_ms = self.window_frame_ns / frames / 1e6
+        lines = [f"FPS {1000 / frame_ms:.0f}  frame {frame_ms:.2f} ms" if frame_ms else "FPS -"]
+        for phase in self.OVERLAY_PHASES:
+            lines.append(f"{phase:14} {self.window_phases.get(phase, 0) / frames / 1e6:6.2f} ms")
+        lines.append(f"blits/frame   {self.window_blits / frames:6.1f}")
+        lines.append(f"renders/frame {self.window_renders / frames:6.1f}")
+        return lines
+
+    def refresh_overlay(self):
+        """Re-render the stats box from the frames since the last refresh, a few times a second."""
+        self.overlay_surf = pygame.Surface(self.overlay_rect.size)
+        self.overlay_surf.fill(self.OVERLAY_COLOR)
+        for i, line in enumerate(self.overlay_lines()):
+            # Rendered straight from the font so the overlay neither shows up in
+            # the render counter nor evicts the game's cached labels.
+            self.overlay_surf.blit(self.font.render(line, True, self.OVERLAY_TEXT_COLOR), (5, 5 + 16 * i))
+        self.reset_window()
+
+    def draw_overlay(self):
+        if self.overlay_surf is not None:
+            self.screen.surface.blit(self.overlay_surf, self.overlay_rect)
+            self.gui.dirty_rects.append(self.overlay_rect)
+
+    def save_trace(self, path=None):
+        """Write the recorded events as a Chrome trace JSON file and return its path."""
+        path = path or self.trace_path
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': list(self.trace_events), 'displayTimeUnit': 'ms'}, f)
+        return os.path.abspath(path)
@@ -0,0 +1,264 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+
+from Engine import Board, INVALID, FIRST, MATCH, MISMATCH
+from GameState import GameState
+
+
+# File header: magic, version, rows, cols, board seed, wall-clock start (Unix time)
+HEADER = struct.Struct('<4sBHHQd')
+MAGIC = b'MGRP'
+VERSION = 2
+# Then fixed-size events: ms since the start of the recording, event type, argument
+EVENT = struct.Struct('<IBI')
+# Version 1 logs had a 16-bit argument, too small for card indices on boards over 65536 cards
+EVENTS = {1: struct.Struct('<IBH'), VERSION: EVENT}
+
+# Event types
+MODE = 1    # a game mode was started; GameState value
+SELECT = 2  # a card was flipped, by click, voice or the computer; card index
+VOICE = 3   # a card number was heard (it is followed by its SELECT if it was on the board)
+RESET = 4   # Reset or Play Again: new board, back to the menu
+ROUND = 5   # Time Attack dealt its next round; seconds in that round
+
+EVENT_NAMES = {MODE: 'mode', SELECT: 'select', VOICE: 'voice', RESET: 'reset', ROUND: 'round'}
+REPLAY_DIR = 'replays'
+
+
+class ReplayRecorder:
+    """Appends a game's events to a log file as they happen.
+
+    Nine bytes an event and one write per event, so a crash loses at most
+    the event being written. The board seed in the header plus the events is
+    everything needed to rebuild every board of the session.
+    """
+
+    def __init__(self, path, rows, cols, seed, origin_ms=0):
+        self.path = path
+        self.origin_ms = origin_ms
+        self.file = open(path, 'wb', buffering=0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, rows, cols, seed, time.time()))
+
+    @classmethod
+    def create(cls, directory, rows, cols, seed, origin_ms=0):
+        """A new log in `directory`, named after the time and the seed."""
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{seed:016x}.replay"
+        return cls(os.path.join(directory, name), rows, cols, seed, origin_ms)
+
+    def record(self, ms, kind, arg=0):
+        self.file.write(EVENT.pack(max(0, ms - self.origin_ms), kind, arg))
+
+    def close(self):
+        self.file.close()
+
+
+class ReplayLog:
+    """A recorded log, memory-mapped. Iterating it yields (ms, type, argument)."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mm) < HEADER.size:
+            self.mm.close()
+            raise ValueError(f"{path}: not a replay log")
+        magic, version, self.rows, self.cols, self.seed, self.started = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version not in EVENTS:
+            self.mm.close()
+            raise ValueError(f"{path}: not a version {VERSION} replay log")
+        self.event = EVENTS[version]
+        # A torn last event (the game died mid-write) is ignored
+        self.count = (len(self.mm) - HEADER.size) // self.event.size
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        with memoryview(self.mm) as view:
+            with view[HEADER.size:HEADER.size + self.count * self.event.size] as events:
+                yield from self.event.iter_unpack(events)
+
+    @property
+    def duration_ms(self):
+        if not self.count:
+            return 0
+        return self.event.unpack_from(self.mm, HEADER.size + (self.count - 1) * self.event.size)[0]
+
+    def close(self):
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def board_digest(board):
+    """Checksum of the deal and the state of every card, to compare two replays."""
+    return zlib.crc32(board.flags, zlib.crc32(board.pairs.tobytes()))
+
+
+def replay_headless(log):
+    """Re-run a log on the bare engine as fast as possible. Returns counts and the final board digest."""
+    board = Board(log.rows, log.cols, seed=log.seed)
+    results = {INVALID: 0, FIRST: 0, MATCH: 0, MISMATCH: 0}
+    counts = dict.fromkeys(EVENT_NAMES.values(), 0)
+    games = 0
+    start = time.perf_counter()
+    for _, kind, arg in log:
+        if kind == SELECT:
+            result = board.step(arg) if arg < board.size else INVALID
+            results[result] += 1
+            if result == MATCH and board.is_complete():
+                games += 1
+        elif kind == MODE:
+            two_players = arg in (GameState.TWO_PLAYERS.value, GameState.VS_CPU.value)
+            board.set_num_players(2 if two_players else 1)
+        elif kind in (RESET, ROUND):
+            board.reset()
+        name = EVENT_NAMES.get(kind, 'unknown')
+        counts[name] = counts.get(name, 0) + 1
+    # The game turns a mismatched pair back shortly after; do the same so digests compare
+    if board.pending:
+        board.conceal()
+    seconds = time.perf_counter() - start
+    return {
+        'events': len(log),
+        'recorded_seconds': log.duration_ms / 1000,
+        'seconds': seconds,
+        'events_per_second': len(log) / seconds if seconds else 0.0,
+        'counts': counts,
+        'flips': results[FIRST] + results[MATCH] + results[MISMATCH],
+        'matches': results[MATCH],
+        'mismatches': results[MISMATCH],
+        'invalid': results[INVALID],
+        'games_completed': games,
+        'scores': list(board.scores),
+        'digest': board_digest(board),
+    }
+
+
+class ReplayClock:
+    """Stands in for MemGame.ticks during a replay.
+
+    At speed > 0 it runs `speed` times faster than the wall clock; at speed 0
+    it jumps straight to the next event each frame.
+    """
+
+    def __init__(self, speed, step_ms):
+        self.speed = speed
+        self.step_ms = step_ms
+        self.ms = 0
+        self.started = time.perf_counter()
+
+    def __call__(self):
+        return int(self.ms)
+
+    def advance(self, next_event_ms):
+        """Move the clock on for the next frame; next_event_ms is None when no event may run yet."""
+        if self.speed:
+            self.ms = (time.perf_counter() - self.started) * 1000 * self.speed
+        elif next_event_ms is not None:
+            self.ms = max(self.ms, next_event_ms)
+        else:
+            self.ms += self.step_ms
+
+
+def apply_event(game, kind, arg):
+    """Do to a MemGame what the recorded input did. Time Attack rounds follow by themselves."""
+    if kind == SELECT:
+        if arg < len(game.cards_deck):
+            game.select_card(game.cards_deck[arg])
+    elif kind == MODE:
+        game.start_mode(GameState(arg))
+    elif kind == RESET:
+        game.back_to_menu()
+
+
+def replay_gui(log, speed=1.0, theme=None, tail_ms=1000):
+    """Play a log back through the game window at `speed` (0 = as fast as frames allow)."""
+    import pygame
+    from memorygame import MemGame
+
+    game = MemGame(log.rows, log.cols, theme, seed=log.seed)
+    game.replaying = True
+    clock = ReplayClock(speed, game.UPDATE_STEP_MS)
+    game.ticks = clock
+    if speed == 0:
+        game.FPS = 0
+    pygame.display.set_caption(f"Memory Game - replay of {os.path.basename(log.path)}")
+
+    events = iter(log)
+    pending = next(events, None)
+    end_ms = log.duration_ms + tail_ms
+    frames = 0
+    start = time.perf_counter()
+    game.last_update_ticks = game.ticks()
+    while True:
+        # A finished board is ended or redealt by the game's own update step;
+        # later events wait for that, as they did when they were recorded.
+        waiting = game.all_matched() and game.game_state not in (GameState.GAME_OVER, GameState.PLAYER_SELECTION)
+        clock.advance(pending[0] if pending is not None and not waiting else None)
+        while pending is not None and not waiting and pending[0] <= clock():
+            apply_event(game, pending[1], pending[2])
+            pending = next(events, None)
+            waiting = game.all_matched()
+        if not game.run_frame():
+            break
+        frames += 1
+        if pending is None and clock() >= end_ms:
+            break
+    seconds = time.perf_counter() - start
+
+    pygame.quit()
+    return {
+        'events': len(log),
+        'recorded_seconds': log.duration_ms / 1000,
+        'seconds': seconds,
+        'frames': frames,
+        'frame_ms': game.frame_stats.report()['frame'],
+        'digest': board_digest(game.board),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play back recorded games.")
+    parser.add_argument('logs', nargs='+', help="replay logs (see --record in memorygame.py)")
+    parser.add_argument('--speed', type=float, default=1.0, help="playback speed; 0 for as fast as possible")
+    parser.add_argument('--headless', action='store_true', help="replay on the engine only, no window, at full speed")
+    parser.add_argument('--theme', help="folder or .zip of card images")
+    parser.add_argument('--events', action='store_true', help="list the events instead of playing them")
+    args = parser.parse_args()
+
+    for path in args.logs:
+        try:
+            log = ReplayLog(path)
+        except (OSError, ValueError) as e:
+            print(e, file=sys.stderr)
+            continue
+        with log:
+            print(f"{path}: {log.rows}x{log.cols}, seed {log.seed:#x}, {len(log)} events, "
+                  f"{log.duration_ms / 1000:.1f} s, recorded {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(log.started))}")
+            if args.events:
+                for ms, kind, arg in log:
+                    print(f"{ms / 1000:9.3f}  {EVENT_NAMES.get(kind, kind):6}  {arg}")
+            elif args.headless:
+                result = replay_headless(log)
+                print(f"  {result['flips']} flips, {result['matches']} matches, {result['games_completed']} games "
+                      f"in {result['seconds'] * 1000:.2f} ms ({result['events_per_second']:.0f} events/s), "
+                      f"digest {result['digest']:08x}")
+            else:
+                result = replay_gui(log, args.speed, args.theme)
+                print(f"  {result['frames']} frames in {result['seconds']:.2f} s, "
+                      f"frame p50 {result['frame_ms']['p50_ms']:.2f} ms, digest {result['digest']:08x}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import heapq
+import itertools
+
+
+class Scheduler:
+    """Runs callbacks at a given pygame tick time from the main loop.
+
+    Nothing here blocks: the game calls run_due() once per update step and any
+    callback whose time has come is executed on the main thread.
+    """
+
+    def __init__(self):
+        self._queue = []
+        self._active = set()
+        self._counter = itertools.count()
+
+    def call_at(self, when_ms, callback, *args):
+        handle = next(self._counter)
+        heapq.heappush(self._queue, (when_ms, handle, callback, args))
+        self._active.add(handle)
+        return handle
+
+    def call_later(self, now_ms, delay_ms, callback, *args):
+        return self.call_at(now_ms + delay_ms, callback, *args)
+
+    def cancel(self, handle):
+        self._active.discard(handle)
+
+    def clear(self):
+        self._queue.clear()
+        self._active.clear()
+
+    def next_due(self):
+        """Tick time of the next pending callback, or None."""
+        while self._queue and self._queue[0][1] not in self._active:
+            heapq.heappop(self._queue)
+        return self._queue[0][0] if self._queue else None
+
+    def run_due(self, now_ms):
+        while self._queue and self._queue[0][0] <= now_ms:
+            _, handle, callback, args = heapq.heappop(self._queue)
+            if handle not in self._active:
+                continue
+            self._active.discard(handle)
+            callback(*args)
@@ -0,0 +1,72 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from BatchEngine import BatchBoards, POLICIES
+
+
+def simulate_chunk(games, rows, cols, policy, seed):
+    """Play `games` boards in one vectorized batch and return a histogram of tries."""
+    boards = BatchBoards(games, rows, cols, seed)
+    tries = boards.run(POLICIES[policy])
+    return np.bincount(tries)
+
+
+def run_simulations(games, rows=4, cols=4, policy='memory', workers=None, chunk_size=10000, seed=None):
+    """Spread `games` simulated games over a process pool and summarize the tries."""
+    workers = workers or os.cpu_count() or 1
+    chunks = [chunk_size] * (games // chunk_size)
+    if games % chunk_size:
+        chunks.append(games % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+
+    start = time.perf_counter()
+    histogram = np.zeros(1, dtype=np.int64)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(simulate_chunk, n, rows, cols, policy, s) for n, s in zip(chunks, seeds)]
+        for future in futures:
+            counts = future.result()
+            if len(counts) > len(histogram):
+                histogram = np.pad(histogram, (0, len(counts) - len(histogram)))
+            histogram[:len(counts)] += counts
+    elapsed = time.perf_counter() - start
+
+    values = np.nonzero(histogram)[0]
+    return {
+        'games': games,
+        'board': f"{rows}x{cols}",
+        'policy': policy,
+        'workers': workers,
+        'mean_tries': float((histogram * np.arange(len(histogram))).sum() / max(games, 1)),
+        'min_tries': int(values[0]) if len(values) else 0,
+        'max_tries': int(values[-1]) if len(values) else 0,
+        'seconds': elapsed,
+        'games_per_second': games / elapsed if elapsed else 0.0,
+        'histogram': histogram.tolist(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate memory games without a display.")
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--rows', type=int, default=4)
+    parser.add_argument('--cols', type=int, default=4)
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='memory')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    result = run_simulations(args.games, args.rows, args.cols, args.policy,
+                             args.workers, args.chunk_size, args.seed)
+    print(f"{result['games']} games on {result['board']} ({result['policy']} policy, "
+          f"{result['workers']} workers) in {result['seconds']:.2f}s "
+          f"= {result['games_per_second']:.0f} games/s")
+    print(f"tries: mean {result['mean_tries']:.2f}, min {result['min_tries']}, max {result['max_tries']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+
+
+# File header: magic, version, crc32 of everything after the header
+HEADER = struct.Struct('<4sBI')
+MAGIC = b'MGSV'
+VERSION = 1
+# Then the game: rows, cols, GameState value, players, current player, bytes per pair id,
+# Time Attack round seconds, tries, ms played, board seed
+GAME = struct.Struct('<HHBBBBHIIQ')
+SCORE = struct.Struct('<I')
+# Then one score per player, one flag byte per card (Engine.VISIBLE/MATCHED)
+# and the little-endian pair id of every card: 3 bytes a card up to 65535 pairs.
+DEFAULT_PATH = 'memorygame.save'
+
+
+class Snapshot:
+    """A game in progress, as read back from a snapshot file."""
+
+    def __init__(self, rows, cols, state, current_player, round_duration, tries, elapsed_ms, seed,
+                 scores, flags, pairs):
+        self.rows = rows
+        self.cols = cols
+        self.state = state
+        self.current_player = current_player
+        self.round_duration = round_duration
+        self.tries = tries
+        self.elapsed_ms = elapsed_ms
+        self.seed = seed
+        self.scores = scores
+        self.flags = flags
+        self.pairs = pairs
+
+
+def encode(board, state, round_duration, elapsed_ms, seed):
+    """The bytes of a snapshot of `board` in GameState `state`."""
+    pairs = board.pairs
+    if sys.byteorder == 'big':
+        pairs = array(pairs.typecode, pairs)
+        pairs.byteswap()
+    body = (GAME.pack(board.rows, board.cols, state, board.num_players, board.current_player, pairs.itemsize,
+                      round_duration, board.tries, max(0, elapsed_ms), seed)
+            + b''.join(SCORE.pack(score) for score in board.scores)
+            + bytes(board.flags) + pairs.tobytes())
+    return HEADER.pack(MAGIC, VERSION, zlib.crc32(body)) + body
+
+
+def decode(data):
+    """A Snapshot from the bytes of a file. Raises ValueError if they are not a whole, current snapshot."""
+    if len(data) < HEADER.size + GAME.size:
+        raise ValueError("not a snapshot")
+    magic, version, crc = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} snapshot")
+    with memoryview(data)[HEADER.size:] as body:
+        if zlib.crc32(body) != crc:
+            raise ValueError("snapshot is damaged (checksum mismatch)")
+        rows, cols, state, players, current_player, width, round_duration, tries, elapsed_ms, seed = \
+            GAME.unpack_from(body)
+        size = rows * cols
+        offset = GAME.size + players * SCORE.size
+        if width not in (2, 4) or len(body) != offset + size + size * width:
+            raise ValueError("snapshot has the wrong length for its board")
+        scores = [score for (score,) in SCORE.iter_unpack(body[GAME.size:offset])]
+        flags = bytearray(body[offset:offset + size])
+        pairs = array('H' if width == 2 else 'I')
+        pairs.frombytes(body[offset + size:])
+    if sys.byteorder == 'big':
+        pairs.byteswap()
+    return Snapshot(rows, cols, state, current_player, round_duration, tries, elapsed_ms, seed,
+                    scores, flags, pairs)
+
+
+class SnapshotStore:
+    """The saved game on disk, written from a background thread.
+
+    save() hands over the bytes and returns at once. If several snapshots
+    arrive while one is being written, only the newest is written next. Each
+    write goes to a temporary file that then replaces the old one, so a crash
+    mid-write leaves the previous snapshot intact. discard() removes the file
+    once the game is over, in order with any pending save.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.pending = None  # bytes to write, or False to remove the file
+        self.busy = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._writer, name='SnapshotStore', daemon=True)
+        self.thread.start()
+
+    def save(self, data):
+        with self.condition:
+            self.pending = data
+            self.condition.notify_all()
+
+    def discard(self):
+        with self.condition:
+            self.pending = False
+            self.condition.notify_all()
+
+    def exists(self):
+        """Whether there is a saved game to resume (counting one still being written)."""
+        with self.condition:
+            if self.pending is not None:
+                return self.pending is not False
+        return os.path.exists(self.path)
+
+    def load(self):
+        """The saved game, or None if there is none. Raises ValueError if the file is damaged."""
+        self.flush()
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        return decode(data)
+
+    def _writer(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                data, self.pending = self.pending, None
+                self.busy = True
+            try:
+                if data is False:
+                    if os.path.exists(self.path):
+                        os.remove(self.path)
+                else:
+                    tmp_path = f"{self.path}.tmp"
+                    with open(tmp_path, 'wb') as f:
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"game not saved: {e}")
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+
+    def flush(self):
+        """Block until the newest snapshot is on disk."""
+        with self.condition:
+            while self.pending is not None or self.busy:
+                self.condition.wait()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
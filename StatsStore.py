@@ -0,0 +1,142 @@
+import queue
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_PATH = 'memorygame_stats.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,
+    mode TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL,
+    tries INTEGER NOT NULL,
+    elapsed_ms INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    winner INTEGER,
+    score1 INTEGER,
+    score2 INTEGER
+);
+CREATE TABLE IF NOT EXISTS rounds (
+    id INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,
+    rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL,
+    round_duration INTEGER NOT NULL,
+    tries INTEGER NOT NULL,
+    elapsed_ms INTEGER NOT NULL,
+    cleared INTEGER NOT NULL
+);
+-- Leaderboards read the first rows of these in order, so a query never
+-- touches more than `limit` index entries however big the tables get.
+CREATE INDEX IF NOT EXISTS games_leaderboard
+    ON games (mode, rows, cols, tries, elapsed_ms) WHERE result != 'lost';
+CREATE INDEX IF NOT EXISTS rounds_leaderboard
+    ON rounds (rows, cols, elapsed_ms, tries) WHERE cleared;
+CREATE INDEX IF NOT EXISTS games_recent ON games (played_at);
+"""
+
+INSERT_GAME = ("INSERT INTO games (played_at, mode, rows, cols, tries, elapsed_ms, result, winner, score1, score2) "
+               "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+INSERT_ROUND = ("INSERT INTO rounds (played_at, rows, cols, round_duration, tries, elapsed_ms, cleared) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+
+class StatsStore:
+    """Game and Time Attack round results in SQLite.
+
+    record_game() and record_round() only queue the row. A writer thread
+    commits everything that queued up since its last commit in one
+    transaction, so the frame that ends a game never waits on the disk.
+    Queries run on the caller's thread with their own connection (WAL mode
+    lets them read while the writer commits).
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        conn = self.connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+        self.reader = None
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._writer, name='StatsStore', daemon=True)
+        self.thread.start()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def record_game(self, mode, rows, cols, tries, elapsed_ms, result, winner=None, scores=()):
+        scores = list(scores) + [None, None]
+        self.queue.put((INSERT_GAME, (time.time(), mode, rows, cols, tries, elapsed_ms, result, winner,
+                                      scores[0], scores[1])))
+
+    def record_round(self, rows, cols, round_duration, tries, elapsed_ms, cleared):
+        self.queue.put((INSERT_ROUND, (time.time(), rows, cols, round_duration, tries, elapsed_ms, int(cleared))))
+
+    def _writer(self):
+        conn = self.connect()
+        running = True
+        while running:
+            # Whatever queued up while the last batch was committing goes in the next one
+            batch = [self.queue.get()]
+            while len(batch) < self.BATCH_SIZE and batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                running = False
+            rows = [item for item in batch if item is not None]
+            try:
+                with conn:
+                    for sql in (INSERT_GAME, INSERT_ROUND):
+                        params = [p for s, p in rows if s == sql]
+                        if params:
+                            conn.executemany(sql, params)
+            except sqlite3.Error as e:
+                print(f"stats not saved: {e}")
+            for _ in batch:
+                self.queue.task_done()
+        conn.close()
+
+    def flush(self):
+        """Block until everything recorded so far is committed."""
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def query(self, sql, params=()):
+        if self.reader is None:
+            self.reader = self.connect()
+        return self.reader.execute(sql, params).fetchall()
+
+    def leaderboard(self, mode, rows, cols, limit=10):
+        """Best finished games: fewest tries, then fastest. Rows of (tries, elapsed_ms, result, winner, played_at)."""
+        return self.query(
+            "SELECT tries, elapsed_ms, result, winner, played_at FROM games INDEXED BY games_leaderboard "
+            "WHERE mode = ? AND rows = ? AND cols = ? AND result != 'lost' "
+            "ORDER BY tries, elapsed_ms LIMIT ?", (mode, rows, cols, limit))
+
+    def round_leaderboard(self, rows, cols, limit=10):
+        """Fastest cleared Time Attack rounds. Rows of (elapsed_ms, tries, round_duration, played_at)."""
+        return self.query(
+            "SELECT elapsed_ms, tries, round_duration, played_at FROM rounds INDEXED BY rounds_leaderboard "
+            "WHERE rows = ? AND cols = ? AND cleared ORDER BY elapsed_ms, tries LIMIT ?", (rows, cols, limit))
+
+    def recent_games(self, limit=10):
+        return self.query(
+            "SELECT played_at, mode, rows, cols, tries, elapsed_ms, result, winner FROM games "
+            "ORDER BY played_at DESC LIMIT ?", (limit,))
@@ -0,0 +1,173 @@
+import argparse
+import os
+import threading
+
+import numpy as np
+
+import UserCache
+
+
+TABLE_NAME = 'strategy_table.npy'  # in the user cache directory
+MIN_TABLE_CARDS = 1024
+
+# Bits of a table entry
+FIRST_KNOWN = 1   # open the turn with a known single instead of an unknown card
+SECOND_KNOWN = 2  # after a new unknown first card, waste the second flip on a known single
+
+
+def build_table(max_cards):
+    """Optimal two-player policy for every (unknown cards n, known singles k) state.
+
+    n counts the unmatched cards nobody has seen yet; k counts seen unmatched
+    cards whose partner is still unknown. Both players are assumed to remember
+    everything and take a known pair as soon as they have one. The value of a
+    state is the expected score difference for the player to move; the returned
+    uint8 array holds the FIRST_KNOWN / SECOND_KNOWN choices that achieve it
+    (look them up with action()).
+    Every move reveals at least one unknown card, so rows only depend on the
+    two rows below them and the table is filled bottom-up, one row per n.
+    """
+    width = max_cards // 2 + 1
+    actions = np.zeros((max_cards + 1, columns(max_cards)), dtype=np.uint8)
+    # Rolling value rows for n-1 and n-2, padded so k-1 and k+2 never go out of range.
+    k = np.arange(width)
+    prev1 = np.zeros(width + 3)
+    prev2 = np.zeros(width + 3)
+
+    def at(row, offset):
+        # row[k + offset] with the padding shifted by one so offset -1 is legal
+        return row[1 + offset:1 + offset + width]
+
+    for n in range(1, max_cards + 1):
+        nm1 = max(n - 1, 1)
+        hit = 1 + at(prev1, -1)
+        p_hit = k / n
+        p_new = (n - k) / n
+
+        # first card was new: flip another unknown, or a known single
+        unknown_second = (1 / nm1) * (1 + at(prev2, 0)) \
+            - (k / nm1) * (1 + at(prev2, 0)) \
+            - ((n - 2 - k).clip(0) / nm1) * at(prev2, 2)
+        known_second = -at(prev1, 1)
+        second_known = (k >= 1) & (n > k) & (known_second > unknown_second)
+        new_value = np.where(second_known, known_second, unknown_second)
+        first_unknown = p_hit * hit + p_new * new_value
+
+        first_known = (1 / n) * hit - ((k - 1).clip(0) / n) * hit - p_new * at(prev1, 1)
+        use_known = (k >= 1) & (first_known > first_unknown)
+        value = np.where(use_known, first_known, first_unknown)
+
+        valid = (k <= n) & ((n - k) % 2 == 0)
+        value = np.where(valid, value, 0.0)
+        row = np.where(valid, use_known * FIRST_KNOWN + second_known * SECOND_KNOWN, 0)
+        stored = row[n % 2::2]
+        actions[n, :len(stored)] = stored
+
+        prev2 = prev1
+        prev1 = np.zeros(width + 3)
+        prev1[1:1 + width] = value
+    return actions
+
+
+def columns(max_cards):
+    # n - k is always even (the unmatched cards are n + k plus whole known pairs),
+    # so a row only stores the k of its own parity, at column k // 2
+    return (max_cards // 2 + 2) // 2
+
+
+def action(table, n, k):
+    """The FIRST_KNOWN / SECOND_KNOWN bits for n unknown cards and k known singles."""
+    return table[n, k // 2]
+
+
+def load_table(max_cards, path=None):
+    """Memory-map the saved table, rebuilding it first if it is missing or too small."""
+    path = path or UserCache.cache_path(TABLE_NAME)
+    try:
+        table = np.load(path, mmap_mode='r')
+        if table.shape[0] > max_cards and table.shape[1:] == (columns(table.shape[0] - 1),):
+            return table
+    except (OSError, ValueError):
+        pass  # missing, unreadable or too small: build it again
+    table = build_table(max(max_cards, MIN_TABLE_CARDS))
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, table)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"strategy table not cached: {e}")
+        return table
+    return np.load(path, mmap_mode='r')
+
+
+class TableLoader:
+    """Loads (or builds) the table on a background thread, so the game never waits for it.
+
+    Building the table for a 100x100 board takes a couple of seconds the first
+    time; get() returns None until it is ready.
+    """
+
+    def __init__(self):
+        self.table = None
+        self.wanted = 0
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def covers(self, max_cards):
+        return self.table is not None and self.table.shape[0] > max_cards
+
+    def request(self, max_cards):
+        with self.lock:
+            if self.covers(max_cards) or max_cards <= self.wanted:
+                return
+            self.wanted = max(max_cards, MIN_TABLE_CARDS)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._load, name='StrategyTable', daemon=True)
+                self.thread.start()
+
+    def _load(self):
+        while True:
+            with self.lock:
+                wanted = self.wanted
+            table = load_table(wanted)
+            with self.lock:
+                self.table = table
+                if self.wanted <= wanted:
+                    self.thread = None
+                    return
+
+    def get(self, max_cards):
+        """The table if it covers boards of `max_cards` cards, else None (and start loading one)."""
+        table = self.table
+        if table is not None and table.shape[0] > max_cards:
+            return table
+        self.request(max_cards)
+        return None
+
+
+loader = TableLoader()
+
+
+def warm_up(max_cards):
+    """Start loading the table for boards of up to `max_cards` cards in the background."""
+    loader.request(max_cards)
+
+
+def ready_table(max_cards):
+    return loader.get(max_cards)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the hard CPU's strategy table ahead of time.")
+    parser.add_argument('--cards', type=int, default=10000, help="largest board to cover, in cards")
+    parser.add_argument('--output', default=None, help="table file (default: in the user cache directory)")
+    args = parser.parse_args()
+    path = args.output or UserCache.cache_path(TABLE_NAME)
+    table = load_table(args.cards, path)
+    print(f"{path}: boards up to {table.shape[0] - 1} cards, {table.nbytes / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+from collections import OrderedDict
+
+
+class TextCache:
+    """Shared cache of rendered text surfaces keyed by string, font and colors.
+
+    Rendering the same string twice returns the same Surface object, so callers
+    can also use identity to tell whether a label changed since the last frame.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.renders = 0
+        self._surfaces = OrderedDict()
+
+    def render(self, font, text, color, background=None):
+        key = (id(font), text, color, background)
+        surf = self._surfaces.get(key)
+        if surf is not None:
+            self._surfaces.move_to_end(key)
+            return surf
+
+        surf = font.render(text, True, color, background)
+        self.renders += 1
+        self._surfaces[key] = surf
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self._surfaces.clear()
+
+
+text_cache = TextCache()
@@ -0,0 +1,131 @@
+import io
+import math
+import os
+import zipfile
+from collections import OrderedDict
+
+import pygame
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp', '.tga')
+
+
+class Theme:
+    """A set of card faces packed into one atlas surface.
+
+    Faces are decoded the first time they are asked for, converted to the
+    display format once, scaled to the card size and copied into their atlas
+    slot. faces() hands out subsurfaces of the atlas, so cards share its pixels.
+    """
+
+    BACKGROUND = (255, 255, 255)
+
+    def __init__(self, card_size, capacity):
+        self.card_size = card_size
+        self.capacity = capacity
+        self.columns = max(1, math.ceil(math.sqrt(capacity)))
+        rows = max(1, math.ceil(capacity / self.columns))
+        self.atlas = pygame.Surface((self.columns * card_size, rows * card_size)).convert()
+        self.atlas.fill(self.BACKGROUND)
+        self._faces = []
+
+    @property
+    def nbytes(self):
+        return self.atlas.get_bytesize() * self.atlas.get_width() * self.atlas.get_height()
+
+    def slot_rect(self, i):
+        row, col = divmod(i, self.columns)
+        return pygame.Rect(col * self.card_size, row * self.card_size, self.card_size, self.card_size)
+
+    def faces(self, count):
+        """The first `count` faces (fewer if the theme is smaller), decoding only new ones."""
+        count = min(count, self.capacity)
+        for i in range(len(self._faces), count):
+            rect = self.slot_rect(i)
+            self.paint_face(i, self.atlas.subsurface(rect))
+            self._faces.append(self.atlas.subsurface(rect))
+        return self._faces[:count]
+
+    def paint_face(self, i, target):
+        raise NotImplementedError
+
+
+class ColorTheme(Theme):
+    """The eight classic solid colors. Larger boards get generated faces (see ThemeCache.plain_theme)."""
+
+    CLASSIC_COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0),
+                      (255, 165, 0), (255, 20, 147), (0, 255, 255), (128, 0, 128)]
+
+    def __init__(self, card_size, capacity):
+        super().__init__(card_size, min(capacity, len(self.CLASSIC_COLORS)))
+
+    def paint_face(self, i, target):
+        target.fill(self.CLASSIC_COLORS[i])
+
+
+class ImageTheme(Theme):
+    """Card art from a folder or a .zip archive of images, in file-name order."""
+
+    def __init__(self, source, card_size):
+        self.source = source
+        self.archive = zipfile.ZipFile(source) if zipfile.is_zipfile(source) else None
+        if self.archive is not None:
+            names = self.archive.namelist()
+        else:
+            names = os.listdir(source)
+        self.names = sorted(n for n in names if n.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.names:
+            raise ValueError(f"no images found in theme {source!r}")
+        super().__init__(card_size, len(self.names))
+
+    def load_image(self, name):
+        if self.archive is not None:
+            return pygame.image.load(io.BytesIO(self.archive.read(name)), name)
+        return pygame.image.load(os.path.join(self.source, name))
+
+    def paint_face(self, i, target):
+        image = self.load_image(self.names[i])
+        image = image.convert_alpha() if image.get_alpha() is not None else image.convert()
+        target.blit(pygame.transform.smoothscale(image, target.get_size()), (0, 0))
+
+
+class ThemeCache:
+    """LRU cache of decoded themes, bounded by the total size of their atlases."""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._themes = OrderedDict()
+
+    def get(self, key, factory):
+        theme = self._themes.get(key)
+        if theme is not None:
+            self._themes.move_to_end(key)
+            return theme
+
+        theme = factory()
+        self._themes[key] = theme
+        self.nbytes += theme.nbytes
+        while self.nbytes > self.max_bytes and len(self._themes) > 1:
+            _, evicted = self._themes.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+        return theme
+
+    def color_theme(self, card_size, count):
+        return self.get(('colors', card_size, count), lambda: ColorTheme(card_size, count))
+
+    def generated_theme(self, card_size, count, seed=None):
+        # Imported here: FaceGenerator builds on Theme and pulls in numpy
+        import FaceGenerator
+        seed = FaceGenerator.FACE_SEED if seed is None else seed
+        return self.get(('generated', seed, card_size, count),
+                        lambda: FaceGenerator.GeneratedTheme(card_size, count, seed))
+
+    def plain_theme(self, card_size, count):
+        """Faces for boards without card art: the classic colors while they last, generated faces beyond that."""
+        if count <= len(ColorTheme.CLASSIC_COLORS):
+            return self.color_theme(card_size, count)
+        return self.generated_theme(card_size, count)
+
+    def image_theme(self, source, card_size):
+        return self.get((os.path.abspath(source), card_size), lambda: ImageTheme(source, card_size))
@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import VoiceControl
+from AudioSource import SAMPLE_RATE, SAMPLE_WIDTH, CHANNEL_COUNT, open_source
+
+
+AUDIO_EXTENSIONS = ('.wav', '.pcm', '.raw')
+CHUNK_FRAMES = SAMPLE_RATE // 2  # offline, so bigger chunks than the live 100 ms
+
+# Set up once per worker process by init_worker and reused for every file it decodes
+worker_model = None
+worker_grammar = None
+
+
+def init_worker(model_path, grammar):
+    global worker_model, worker_grammar
+    from vosk import SetLogLevel
+    SetLogLevel(-1)
+    worker_model = VoiceControl.init_vosk_model(model_path)
+    worker_grammar = grammar
+
+
+def expected_numbers(path):
+    """Card numbers leading the file name: "12_twelve.wav" -> [12], "3_11_pair.wav" -> [3, 11]."""
+    match = re.match(r'\d+(?:[_-]\d+)*', os.path.basename(path))
+    return [int(n) for n in re.split(r'[_-]', match.group(0))] if match else []
+
+
+def find_recordings(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, n) for n in names if n.lower().endswith(AUDIO_EXTENSIONS))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def transcribe_file(path):
+    """Decode one recording in a worker; errors are reported per file instead of stopping the batch."""
+    start = time.perf_counter()
+    recognizer = VoiceControl.create_recognizer(worker_model, worker_grammar)
+    texts = []
+    audio_bytes = 0
+    try:
+        with open_source(path) as source:
+            for data in source.chunks(CHUNK_FRAMES):
+                audio_bytes += len(data)
+                if recognizer.AcceptWaveform(data):
+                    texts.append(VoiceControl.result_text(recognizer))
+        texts.append(VoiceControl.final_result_text(recognizer))
+    except (OSError, ValueError, EOFError) as e:
+        return {'path': path, 'error': str(e)}
+
+    text = ' '.join(t for t in texts if t)
+    numbers = VoiceControl.parse_numbers_from_text(text)
+    expected = expected_numbers(path)
+    return {
+        'path': path,
+        'text': text,
+        'numbers': numbers,
+        'expected': expected,
+        'correct': numbers == expected if expected else None,
+        'audio_s': audio_bytes / (SAMPLE_WIDTH * CHANNEL_COUNT * SAMPLE_RATE),
+        'decode_s': time.perf_counter() - start,
+    }
+
+
+def transcribe(files, model_path=None, max_number=None, workers=None, chunksize=8):
+    """Decode `files` across a process pool, one model per worker. Yields results in file order.
+
+    With max_number the recognizer is limited to the game's number grammar, as
+    in voice mode; without it the full vocabulary is decoded.
+    """
+    grammar = VoiceControl.number_grammar(max_number) if max_number else None
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(model_path, grammar)) as pool:
+        yield from pool.map(transcribe_file, files, chunksize=chunksize)
+
+
+def summarize(results, seconds, workers):
+    decoded = [r for r in results if 'error' not in r]
+    labelled = [r for r in decoded if r['correct'] is not None]
+    audio_s = sum(r['audio_s'] for r in decoded)
+    decode_s = sum(r['decode_s'] for r in decoded)
+    return {
+        'files': len(results),
+        'errors': len(results) - len(decoded),
+        'workers': workers,
+        'seconds': seconds,
+        'files_per_second': len(decoded) / seconds if seconds else 0.0,
+        'audio_seconds': audio_s,
+        'times_real_time': audio_s / seconds if seconds else 0.0,
+        'real_time_factor': decode_s / audio_s if audio_s else 0.0,
+        'labelled': len(labelled),
+        'accuracy': sum(r['correct'] for r in labelled) / len(labelled) if labelled else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe recorded utterances offline and score them.")
+    parser.add_argument('paths', nargs='+', help="audio files or directories (.wav, or raw 16 kHz PCM)")
+    parser.add_argument('--model', default=None, help="VOSK model directory")
+    parser.add_argument('--max-number', type=int, default=None,
+                        help="decode with the voice-mode grammar for cards 1..N")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=8, help="files handed to a worker at a time")
+    parser.add_argument('--output', help="write one JSON line per file here")
+    parser.add_argument('--min-accuracy', type=float, default=None,
+                        help="exit with status 1 if accuracy on labelled files falls below this")
+    args = parser.parse_args()
+
+    files = find_recordings(args.paths)
+    workers = args.workers or os.cpu_count() or 1
+    out = open(args.output, 'w') if args.output else None
+    results = []
+    start = time.perf_counter()
+    try:
+        for result in transcribe(files, args.model, args.max_number, workers, args.chunksize):
+            results.append(result)
+            if out is not None:
+                out.write(json.dumps(result) + '\n')
+            if 'error' in result:
+                print(f"{result['path']}: {result['error']}", file=sys.stderr)
+            elif result['correct'] is False:
+                print(f"{result['path']}: heard {result['text']!r} -> {result['numbers']}, "
+                      f"expected {result['expected']}", file=sys.stderr)
+    finally:
+        if out is not None:
+            out.close()
+
+    summary = summarize(results, time.perf_counter() - start, workers)
+    accuracy = summary['accuracy']
+    print(f"{summary['files']} files ({summary['errors']} errors), {summary['audio_seconds']:.0f} s of audio "
+          f"in {summary['seconds']:.1f} s on {workers} workers = {summary['times_real_time']:.1f}x real time, "
+          f"{summary['files_per_second']:.1f} files/s")
+    if accuracy is not None:
+        print(f"accuracy {accuracy:.1%} on {summary['labelled']} labelled files")
+    if args.min_accuracy is not None and (accuracy is None or accuracy < args.min_accuracy):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+
+def cache_dir():
+    """Per-user directory for data the game builds once and reuses (strategy table, card faces).
+
+    MEMORYGAME_CACHE overrides it; otherwise it is the platform's cache directory.
+    """
+    path = os.environ.get('MEMORYGAME_CACHE')
+    if path:
+        return path
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'memorygame')
+
+
+def cache_path(*names):
+    return os.path.join(cache_dir(), *names)
@@ -0,0 +1,121 @@
+from collections import deque
+
+import numpy as np
+
+from AudioSource import SAMPLE_RATE, SAMPLE_WIDTH, CHANNEL_COUNT
+
+
+class VoiceActivityDetector:
+    """Energy gate in front of the recognizer for continuous listening.
+
+    Audio is cut into 10 ms frames. A frame is loud when its RMS is `ratio`
+    times the background noise level (tracked while nobody speaks) and at
+    least `min_rms`. Speech starts after `onset_ms` of loud frames and ends
+    after `hangover_ms` of quiet ones. process() returns the audio the
+    recognizer should see: nothing during silence, the last `pre_roll_ms`
+    before the onset (so the first syllable is not cut) followed by the speech
+    itself, and the hangover, which gives the recognizer the trailing silence
+    it needs to finish a word.
+    """
+
+    FRAME_MS = 10
+    PRE_ROLL_MS = 300
+    ONSET_MS = 30
+    # Longer than NumberListener.STABLE_PARTIAL_MS, so a stable partial can still commit
+    HANGOVER_MS = 500
+    # Nobody names two cards for this long; it is a new, louder background
+    MAX_SEGMENT_MS = 8000
+    RATIO = 2.5
+    MIN_RMS = 300.0
+    # Per 10 ms frame: the noise estimate falls fast but rises slowly, so the
+    # quieter start of a word does not drag it up to the speech level
+    NOISE_FALL = 0.05
+    NOISE_RISE = 0.002
+
+    def __init__(self, pre_roll_ms=PRE_ROLL_MS, onset_ms=ONSET_MS, hangover_ms=HANGOVER_MS,
+                 ratio=RATIO, min_rms=MIN_RMS):
+        self.frame_bytes = SAMPLE_RATE * self.FRAME_MS // 1000 * SAMPLE_WIDTH * CHANNEL_COUNT
+        self.onset_frames = max(1, onset_ms // self.FRAME_MS)
+        self.hangover_frames = max(1, hangover_ms // self.FRAME_MS)
+        self.max_segment_frames = self.MAX_SEGMENT_MS // self.FRAME_MS
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.noise_rms = min_rms / ratio
+        self.pre_roll = deque(maxlen=max(self.onset_frames, pre_roll_ms // self.FRAME_MS))
+        self.speaking = False
+        self.loud_run = 0
+        self.quiet_run = 0
+        self.segment_frames = 0
+        self.remainder = b''
+        self.frames_seen = 0
+        self.frames_passed = 0
+
+    @property
+    def threshold(self):
+        return max(self.noise_rms * self.ratio, self.min_rms)
+
+    def frame_levels(self, data):
+        """RMS of every whole 10 ms frame in data, computed in one go."""
+        count = len(data) // self.frame_bytes
+        samples = np.frombuffer(data, dtype='<i2', count=count * self.frame_bytes // SAMPLE_WIDTH)
+        samples = samples.reshape(count, -1).astype(np.float32)
+        return np.sqrt(np.mean(samples * samples, axis=1))
+
+    def process(self, data):
+        """Feed the next chunk of audio. Returns (audio for the recognizer, whether a speech segment just ended)."""
+        data = self.remainder + data
+        levels = self.frame_levels(data)
+        if not self.frames_seen and len(levels):
+            self.noise_rms = float(np.median(levels))
+        used = len(levels) * self.frame_bytes
+        self.remainder = data[used:]
+        threshold = self.threshold
+        out = []
+        ended = False
+        for i, level in enumerate(levels):
+            frame = data[i * self.frame_bytes:(i + 1) * self.frame_bytes]
+            loud = level >= threshold
+            self.frames_seen += 1
+            if self.speaking:
+                out.append(frame)
+                self.segment_frames += 1
+                self.quiet_run = 0 if loud else self.quiet_run + 1
+                if self.segment_frames >= self.max_segment_frames:
+                    self.noise_rms = float(level)
+                    threshold = self.threshold
+                    self.quiet_run = self.hangover_frames
+                if self.quiet_run >= self.hangover_frames:
+                    self.speaking = False
+                    self.loud_run = 0
+                    ended = True
+                continue
+
+            self.pre_roll.append(frame)
+            if loud:
+                self.loud_run += 1
+                if self.loud_run >= self.onset_frames:
+                    self.speaking = True
+                    self.quiet_run = 0
+                    self.segment_frames = 0
+                    out.extend(self.pre_roll)
+                    self.pre_roll.clear()
+            else:
+                self.loud_run = 0
+                rate = self.NOISE_RISE if level > self.noise_rms else self.NOISE_FALL
+                self.noise_rms += (float(level) - self.noise_rms) * rate
+                threshold = self.threshold
+        self.frames_passed += sum(len(frame) for frame in out) // self.frame_bytes
+        return b''.join(out), ended
+
+    def reset(self):
+        """Forget the current segment (the noise level is kept)."""
+        self.speaking = False
+        self.loud_run = 0
+        self.quiet_run = 0
+        self.pre_roll.clear()
+        self.remainder = b''
+
+    @property
+    def pass_ratio(self):
+        """Fraction of the audio seen so far that was passed on to the recognizer."""
+        return self.frames_passed / self.frames_seen if self.frames_seen else 0.0
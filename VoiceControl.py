@@ -1,86 +1,277 @@
 from vosk import Model, KaldiRecognizer
-from word2number import w2n
-import pyaudio
 import json
 import os
+import re
+
+from AudioSource import SAMPLE_RATE, CHANNEL_COUNT, FRAMES_PER_BUFFER, open_microphone, open_source
+
+
+# Next to this file unless VOSK_MODEL_PATH says otherwise
+MODEL_PATH = os.environ.get('VOSK_MODEL_PATH',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vosk-model-small-en-us-0.15'))
 
 
 # Initialize the VOSK model
-def init_vosk_model():
-    MODEL_PATH = '.\\vosk-model-small-en-us-0.15'
-    if not os.path.exists(MODEL_PATH):
-        print("VOSK model directory not found.")
-        exit(1)
+def init_vosk_model(path=None):
+    path = path or MODEL_PATH
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"VOSK model directory not found: {path}")
     
-    return Model(MODEL_PATH)
+    return Model(path)
+
+def create_recognizer(model, grammar=None):
+    if grammar is None:
+        return KaldiRecognizer(model, SAMPLE_RATE)
+    return KaldiRecognizer(model, SAMPLE_RATE, grammar)
+
+def result_text(recognizer):
+    return json.loads(recognizer.Result()).get("text", "")
+
+def final_result_text(recognizer):
+    return json.loads(recognizer.FinalResult()).get("text", "")
 
 # Recognize speech and print numbers
-def recognize_numbers_from_mic(model):
-    sample_rate = 16000
-    channel_count = 1
-    format = pyaudio.paInt16
-    
-    recognizer = KaldiRecognizer(model, sample_rate)
-    
-    p = pyaudio.PyAudio()
-    stream = p.open(format=format, channels=channel_count, rate=sample_rate, input=True, frames_per_buffer=4096)
-    stream.start_stream()
-    
-    
+def recognize_numbers(model, source, max_number=16, count=2):
+    """Listen to an AudioSource until up to `count` card numbers are said. [] if the audio runs out first."""
+    listener = NumberListener(model, max_number, count=count)
+    for data in source.chunks(FRAMES_PER_BUFFER):
+        committed = listener.accept(data)
+        if committed is not None:
+            parsed_numbers, lag_ms = committed
+            print(f"parsed numbers are: {parsed_numbers} ({lag_ms:.0f} ms after you stopped speaking)")
+            return parsed_numbers
+    return listener.card_numbers(final_result_text(listener.recognizer), final=True) or []
 
+# Recognize speech and print numbers
+def recognize_numbers_from_mic(model, max_number=16, count=2):
     print("Listening... Speak numbers into the microphone.")
-    
     try:
-        
-        while True:
-            data = stream.read(4096, exception_on_overflow=False)
-            if recognizer.AcceptWaveform(data):
-                results = json.loads(recognizer.Result())
-                text = results.get("text")
-                print(f"you said :{text}")
-                parsed_number = parse_number_from_text(text)
-                print(f"parsed number is: {parse_number_from_text(text)}")
-                if parsed_number != None: 
-                    break
-                    
-                
+        with open_microphone() as source:
+            return recognize_numbers(model, source, max_number, count)
     except KeyboardInterrupt:
         print("\nStopped listening.")
-    finally:
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-        return parsed_number
+        return []
         
+UNITS = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9}
+TEENS = {'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15,
+         'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19}
+TENS = {'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90}
+SCALES = {'hundred': 100, 'thousand': 1000}
+
+# Words the small model tends to hear instead of a number word
+HOMOPHONES = {
+    'won': 'one', 'to': 'two', 'too': 'two', 'tree': 'three', 'free': 'three', 'for': 'four',
+    'fore': 'four', 'hive': 'five', 'sicks': 'six', 'ate': 'eight', 'nein': 'nine', 'tin': 'ten',
+    'elven': 'eleven',
+}
+
+# token -> (kind, value), with the homophones folded in
+NUMBER_WORDS = {}
+for kind, words in (('unit', UNITS), ('teen', TEENS), ('tens', TENS)):
+    for word, value in words.items():
+        NUMBER_WORDS[word] = (kind, value)
+for word, value in SCALES.items():
+    NUMBER_WORDS[word] = (word, value)
+for alias, word in HOMOPHONES.items():
+    NUMBER_WORDS[alias] = NUMBER_WORDS[word]
+
+# kind of a number word -> kinds of the previous word it extends ("twenty" + "one")
+EXTENDS = {
+    'unit': ('tens', 'hundred', 'thousand'),
+    'teen': ('hundred', 'thousand'),
+    'tens': ('hundred', 'thousand'),
+    'hundred': ('unit', 'teen', 'tens'),
+    'thousand': ('unit', 'teen', 'tens', 'hundred'),
+    'digits': (),
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z]+|[0-9]+")
+
+
+def spell_number(number):
+    """English words for 1..9999, the way the recognizer writes them out."""
+    names = {value: word for words in (UNITS, TEENS, TENS) for word, value in words.items()}
+    words = []
+    thousands, rest = divmod(number, 1000)
+    hundreds, rest = divmod(rest, 100)
+    if thousands:
+        words += spell_number(thousands).split() + ['thousand']
+    if hundreds:
+        words += [names[hundreds], 'hundred']
+    if rest >= 20:
+        words.append(names[rest - rest % 10])
+        rest %= 10
+    if rest:
+        words.append(names[rest])
+    return ' '.join(words)
+
+
+def number_grammar(max_number):
+    """Vosk grammar (a JSON list of words) covering the card numbers 1..max_number.
+
+    Restricting the decoder to these words and their homophones is far cheaper
+    and more accurate than decoding the model's full vocabulary; anything else
+    comes out as [unk].
+    """
+    words = set()
+    for number in range(1, max_number + 1):
+        words.update(spell_number(number).split())
+    words.update(alias for alias, word in HOMOPHONES.items() if word in words)
+    return json.dumps(sorted(words) + ['[unk]'])
+
+
+def parse_numbers(text):
+    """Yield (number, kind of its last word) for each number spoken in text."""
+    total = group = 0
+    last = None
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token.isdigit():
+            kind, value = 'digits', int(token)
+        else:
+            kind, value = NUMBER_WORDS.get(token, (None, 0))
+        if kind is None:
+            if last is not None and not (token == 'and' and last in SCALES):
+                yield total + group, last
+                total = group = 0
+                last = None
+            continue
+
+        extends = last in EXTENDS[kind]
+        if kind == 'hundred':
+            extends = extends and group < 100
+        elif kind == 'thousand':
+            extends = extends and total == 0
+        if last is not None and not extends:
+            yield total + group, last
+            total = group = 0
+
+        if kind == 'hundred':
+            group = (group or 1) * 100
+        elif kind == 'thousand':
+            total, group = (group or 1) * 1000, 0
+        else:
+            group += value
+        last = kind
+    if last is not None:
+        yield total + group, last
+
+
+def parse_numbers_from_text(text):
+    """Every number spoken in text, in order: "three and eleven" -> [3, 11]."""
+    return [number for number, _ in parse_numbers(text)]
+
+
 def parse_number_from_text(text):
-    text = text.lower()
-    
-    number_map = {
-        'one': 1, 'won': 1, 'what': 1,
-        'two': 2, 'to': 2, 'too': 2, 'tu': 2,
-        'three': 3, 'tree': 3, 'free': 3,
-        'four': 4, 'for': 4, 'fore': 4,
-        'five': 5, 'hive': 5,
-        'six': 6, 'sicks': 6, 'sex': 6,
-        'seven': 7, 'heaven': 7,
-        'eight': 8, 'ate': 8, 'hate': 8,
-        'nine': 9, 'nein': 9, 'mine': 9,
-        'ten': 10, 'tin': 10, 'then': 10, 'tan': 10,
-        'eleven': 11, 'elven': 11, 'elfin': 11,
-        'twelve': 12, 'twelf': 12, 'delve': 12,
-        'thirteen': 13, 'thirteenth': 13, 'thirtine': 13,
-        'fourteen': 14, 'forteen': 14, 'fortin': 14, 'forty': 14,
-        'fifteen': 15, 'fifty': 15, 'fitten': 15,
-        'sixteen': 16, 'sixtin': 16, 'sicksteen': 16, 'sixty': 16,
-    }
-    
-    
-    for word, number in number_map.items():
-        if word in text:
-            return number
-    
+    """The first number spoken in text, or None."""
+    for number, _ in parse_numbers(text):
+        return number
     return None
-    
+
+
+def may_continue(number, kind, max_number):
+    """Whether more words could still turn this number into a bigger card number."""
+    if kind in ('tens', 'hundred', 'thousand'):
+        return number + 1 <= max_number
+    if kind in ('unit', 'teen'):
+        return number * 100 <= max_number
+    return False
+
+
+class NumberListener:
+    """Feeds microphone audio to a recognizer and decides when card numbers have been said.
+
+    One utterance can name up to `count` cards ("three and eleven"). They are
+    committed on the recognizer's final result or, sooner, once the partial
+    result has shown the same `count` complete numbers for STABLE_PARTIAL_MS of
+    audio. accept() returns (numbers, lag_ms), where lag_ms is how much audio
+    after the end of the last number it took to commit.
+    """
+
+    STABLE_PARTIAL_MS = 300
+
+    def __init__(self, model, max_number, stable_partial_ms=STABLE_PARTIAL_MS, count=2):
+        self.max_number = max_number
+        self.count = count
+        self.stable_partial_ms = stable_partial_ms
+        self.recognizer = create_recognizer(model, number_grammar(max_number))
+        self.recognizer.SetWords(True)
+        self.recognizer.SetPartialWords(True)
+        self.reset()
+
+    def listen_for(self, count):
+        """Start a new utterance that may name up to `count` cards."""
+        self.count = count
+        self.reset()
+
+    def reset(self):
+        self.recognizer.Reset()
+        self.audio_ms = 0.0
+        self.candidate = None
+        self.candidate_since = 0.0
+
+    def commit(self, numbers, speech_end_ms):
+        lag_ms = max(self.audio_ms - speech_end_ms, 0.0)
+        self.reset()
+        return numbers, lag_ms
+
+    def accept(self, data):
+        self.audio_ms += len(data) * 1000 / (2 * CHANNEL_COUNT * SAMPLE_RATE)
+        if self.recognizer.AcceptWaveform(data):
+            result = json.loads(self.recognizer.Result())
+            self.candidate = None
+            numbers = self.card_numbers(result.get('text', ''), final=True)
+            if numbers:
+                return self.commit(numbers, self.speech_end_ms(result.get('result'), self.audio_ms))
+            return None
+
+        if self.stable_partial_ms is None:
+            return None
+        partial = json.loads(self.recognizer.PartialResult())
+        numbers = self.card_numbers(partial.get('partial', ''), final=False)
+        if numbers != self.candidate:
+            self.candidate = numbers
+            self.candidate_since = self.audio_ms
+        elif numbers is not None and self.audio_ms - self.candidate_since >= self.stable_partial_ms:
+            return self.commit(numbers, self.speech_end_ms(partial.get('partial_result'), self.candidate_since))
+        return None
+
+    def finish(self):
+        """The speech segment is over (see VoiceActivity): commit what the recognizer settles on, or None."""
+        result = json.loads(self.recognizer.FinalResult())
+        numbers = self.card_numbers(result.get('text', ''), final=True)
+        if numbers:
+            return self.commit(numbers, self.speech_end_ms(result.get('result'), self.audio_ms))
+        self.reset()
+        return None
+
+    def card_numbers(self, text, final):
+        """The first `count` card numbers in text, or None.
+
+        A partial result only counts once it names all `count` cards and the last
+        one cannot grow any more; with fewer the player may still be talking, so
+        those wait for the final result.
+        """
+        parsed = list(parse_numbers(text))
+        if not final and (not parsed or may_continue(*parsed[-1], self.max_number)):
+            return None
+        numbers = [number for number, _ in parsed if 1 <= number <= self.max_number][:self.count]
+        if not numbers or (not final and len(numbers) < self.count):
+            return None
+        return numbers
+
+    def speech_end_ms(self, words, default):
+        # Word timings are in seconds since the last reset
+        if words:
+            return words[-1]['end'] * 1000
+        return default
+
+
 if __name__ == "__main__":    
+    import sys
     model = init_vosk_model()
-    recognize_numbers_from_mic(model)
+    if len(sys.argv) > 1:
+        # python VoiceControl.py recording.wav (or - for raw PCM on stdin)
+        with open_source(sys.argv[1]) as source:
+            print(recognize_numbers(model, source))
+    else:
+        recognize_numbers_from_mic(model)
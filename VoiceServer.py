@@ -0,0 +1,349 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import struct
+import tempfile
+import threading
+
+import NetProtocol as proto
+
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'memorygame-voice.sock')
+
+# Messages use NetProtocol's framing (payload length, type). A stream is one
+# utterance: START, any number of AUDIO messages, then END. The server answers
+# every START with exactly one RESULT, as soon as the numbers are understood
+# (often before END) or at END with no numbers; later audio for that stream
+# is ignored. A connection carries one stream at a time.
+
+# Client -> server
+START = 1    # stream number, highest card number on the board, cards to listen for
+AUDIO = 2    # 16 kHz mono 16-bit PCM, at most 64 KiB per message
+END = 3      # no more audio in this stream
+
+# Server -> client
+RESULT = 16  # stream number, lag in ms (see NumberListener.accept), then one uint16 per card number
+ERROR = 17   # error code
+
+# Error codes
+BAD_MESSAGE = 1
+
+START_BODY = struct.Struct('<HHB')
+RESULT_HEAD = struct.Struct('<HI')
+NUMBER = struct.Struct('<H')
+ERROR_BODY = struct.Struct('<B')
+
+# Worker commands, besides START, AUDIO and END
+CANCEL = 4
+
+
+def encode_start(stream, max_number, count):
+    return proto.HEADER.pack(START_BODY.size, START) + START_BODY.pack(stream, max_number, count)
+
+
+def encode_audio(data):
+    return proto.HEADER.pack(len(data), AUDIO) + data
+
+
+def encode_end():
+    return proto.HEADER.pack(0, END)
+
+
+def encode_result(stream, numbers, lag_ms):
+    payload = RESULT_HEAD.pack(stream, min(round(lag_ms), 0xFFFFFFFF)) + b''.join(NUMBER.pack(n) for n in numbers)
+    return proto.HEADER.pack(len(payload), RESULT) + payload
+
+
+def decode_result(payload):
+    """(stream number, card numbers, lag in ms) of a RESULT payload."""
+    stream, lag_ms = RESULT_HEAD.unpack_from(payload)
+    numbers = [n for (n,) in NUMBER.iter_unpack(payload[RESULT_HEAD.size:])]
+    return stream, numbers, lag_ms
+
+
+def worker_main(model_path, commands, results, max_idle=8):
+    """One decoding process: loads the model once and keeps recognizers for reuse.
+
+    Creating a recognizer compiles the number grammar, so finished ones are
+    kept per board size and handed to the next stream.
+    """
+    try:
+        from vosk import SetLogLevel
+        SetLogLevel(-1)
+        import VoiceControl
+        model = VoiceControl.init_vosk_model(model_path)
+    except Exception as e:
+        results.put((None, 'error', str(e)))
+        return
+    results.put((None, 'ready', None))
+
+    idle = {}     # max number -> finished NumberListeners
+    streams = {}  # stream id -> NumberListener
+
+    def release(stream_id):
+        listener = streams.pop(stream_id, None)
+        if listener is not None and len(idle.setdefault(listener.max_number, [])) < max_idle:
+            idle[listener.max_number].append(listener)
+
+    while True:
+        command = commands.get()
+        if command is None:
+            return
+        stream_id, kind, data = command
+        if kind == START:
+            max_number, count = data
+            free = idle.get(max_number)
+            listener = free.pop() if free else VoiceControl.NumberListener(model, max_number, count=count)
+            listener.listen_for(count)
+            streams[stream_id] = listener
+            continue
+        listener = streams.get(stream_id)
+        if listener is None:
+            continue  # already answered or cancelled
+        if kind == AUDIO:
+            committed = listener.accept(data)
+        elif kind == END:
+            committed = listener.finish() or ([], 0.0)
+        else:
+            committed = None
+            release(stream_id)
+        if committed is not None:
+            results.put((stream_id, committed[0], committed[1]))
+            release(stream_id)
+
+
+class Stream:
+    def __init__(self, writer, number, worker):
+        self.writer = writer
+        self.number = number
+        self.worker = worker
+
+
+class VoiceServer:
+    """Decodes card numbers for many players at once on a pool of worker processes.
+
+    Each worker loads the Vosk model once. A new stream goes to the worker
+    with the fewest open streams and stays there, since the recognizer keeps
+    state between chunks. Clients connect over a Unix socket (see
+    RemoteListener); the event loop only moves bytes between sockets and
+    worker queues.
+    """
+
+    def __init__(self, workers=None, model_path=None):
+        self.worker_count = workers or os.cpu_count() or 1
+        self.model_path = model_path
+        self.processes = []
+        self.commands = []
+        self.open_streams = []
+        self.results = None
+        self.streams = {}  # stream id -> Stream
+        self.next_stream = 0
+        self.decoded = 0
+        self.loop = None
+        self.stopped = None
+
+    def start_workers(self, timeout=60):
+        """Start the workers and wait until each has loaded the model. Raises RuntimeError if one cannot."""
+        context = multiprocessing.get_context('spawn')
+        self.results = context.Queue()
+        for _ in range(self.worker_count):
+            commands = context.Queue()
+            process = context.Process(target=worker_main, args=(self.model_path, commands, self.results),
+                                      daemon=True)
+            process.start()
+            self.processes.append(process)
+            self.commands.append(commands)
+            self.open_streams.append(0)
+        for _ in range(self.worker_count):
+            try:
+                _, status, error = self.results.get(timeout=timeout)
+            except queue.Empty:
+                status, error = 'error', "timed out loading the model"
+            if status == 'error':
+                self.stop_workers()
+                raise RuntimeError(f"voice worker failed: {error}")
+
+    def stop_workers(self):
+        for commands in self.commands:
+            commands.put(None)
+        for process in self.processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.kill()
+        if self.results is not None:
+            self.results.put(None)  # ends pump_results
+        self.processes, self.commands, self.open_streams = [], [], []
+
+    def pump_results(self):
+        # Runs on its own thread: hands results from the workers to the event loop
+        while True:
+            result = self.results.get()
+            if result is None:
+                return
+            self.loop.call_soon_threadsafe(self.deliver, *result)
+
+    def deliver(self, stream_id, numbers, lag_ms):
+        stream = self.streams.pop(stream_id, None)
+        if stream is None:
+            return  # the client went away
+        self.open_streams[stream.worker] -= 1
+        self.decoded += 1
+        if not stream.writer.transport.is_closing():
+            stream.writer.write(encode_result(stream.number, numbers, lag_ms))
+
+    def open_stream(self, writer, number, max_number, count):
+        worker = min(range(self.worker_count), key=self.open_streams.__getitem__)
+        stream_id = self.next_stream
+        self.next_stream += 1
+        self.streams[stream_id] = Stream(writer, number, worker)
+        self.open_streams[worker] += 1
+        self.commands[worker].put((stream_id, START, (max_number, count)))
+        return stream_id
+
+    def close_stream(self, stream_id):
+        stream = self.streams.pop(stream_id, None)
+        if stream is not None:
+            self.open_streams[stream.worker] -= 1
+            self.commands[stream.worker].put((stream_id, CANCEL, None))
+
+    def forward(self, stream_id, kind, data):
+        stream = self.streams.get(stream_id)
+        if stream is not None:
+            self.commands[stream.worker].put((stream_id, kind, data))
+
+    async def handle_client(self, reader, writer):
+        stream_id = None
+        try:
+            while True:
+                kind, payload = await proto.read_message(reader)
+                if kind == AUDIO:
+                    self.forward(stream_id, AUDIO, payload)
+                elif kind == END:
+                    self.forward(stream_id, END, None)
+                elif kind == START and len(payload) == START_BODY.size:
+                    number, max_number, count = START_BODY.unpack(payload)
+                    if stream_id is not None:
+                        self.close_stream(stream_id)
+                    stream_id = self.open_stream(writer, number, max_number, count)
+                else:
+                    writer.write(proto.HEADER.pack(ERROR_BODY.size, ERROR) + ERROR_BODY.pack(BAD_MESSAGE))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if stream_id is not None:
+                self.close_stream(stream_id)
+            writer.close()
+
+    async def serve(self, path=DEFAULT_SOCKET, ready=None):
+        """Accept clients until SIGTERM (or stop())."""
+        self.loop = asyncio.get_running_loop()
+        self.stopped = self.loop.create_future()
+        # Stopped like any service, so the caller can shut the workers down
+        self.loop.add_signal_handler(signal.SIGTERM, self.stop)
+        threading.Thread(target=self.pump_results, name='VoiceResults', daemon=True).start()
+        server = await asyncio.start_unix_server(self.handle_client, path, backlog=1024)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await self.stopped
+
+    def stop(self):
+        if not self.stopped.done():
+            self.stopped.set_result(None)
+
+
+class RemoteListener:
+    """A NumberListener that decodes on a VoiceServer instead of in this process.
+
+    Same interface: listen_for() starts an utterance, accept() sends audio and
+    returns (numbers, lag_ms) once the server has them, finish() ends the
+    utterance and waits for its result. An utterance without numbers starts
+    the next one.
+    """
+
+    def __init__(self, max_number, path=DEFAULT_SOCKET, timeout=5.0):
+        self.max_number = max_number
+        self.count = 2
+        self.timeout = timeout
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.buffer = proto.MessageBuffer()
+        self.stream = 0
+        self.answered = True
+
+    def listen_for(self, count):
+        self.count = count
+        self.stream = (self.stream + 1) & 0xFFFF
+        self.answered = False
+        self.sock.sendall(encode_start(self.stream, self.max_number, count))
+
+    def accept(self, data):
+        if self.answered:
+            return None
+        self.sock.sendall(encode_audio(data))
+        return self.receive(block=False)
+
+    def finish(self):
+        if self.answered:
+            return None
+        self.sock.sendall(encode_end())
+        return self.receive(block=True)
+
+    def receive(self, block):
+        self.sock.settimeout(self.timeout if block else 0.0)
+        try:
+            while True:
+                try:
+                    data = self.sock.recv(65536)
+                except (BlockingIOError, socket.timeout):
+                    return None
+                if not data:
+                    raise ConnectionError("voice server closed the connection")
+                for kind, payload in self.buffer.feed(data):
+                    if kind == ERROR:
+                        raise ConnectionError(f"voice server error {ERROR_BODY.unpack(payload)[0]}")
+                    if kind != RESULT:
+                        continue
+                    stream, numbers, lag_ms = decode_result(payload)
+                    if stream != self.stream:
+                        continue
+                    if not numbers:
+                        # Nothing understood (noise, another word): keep listening, like NumberListener
+                        self.listen_for(self.count)
+                        return None
+                    self.answered = True
+                    return numbers, float(lag_ms)
+        finally:
+            self.sock.settimeout(None)
+
+    def close(self):
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speech decoding service for several voice players on one machine.")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help="Unix socket path to listen on")
+    parser.add_argument('--workers', type=int, default=None, help="decoding processes (default: one per CPU)")
+    parser.add_argument('--model', default=None, help="VOSK model directory")
+    args = parser.parse_args()
+
+    server = VoiceServer(args.workers, args.model)
+    server.start_workers()
+    print(f"{server.worker_count} workers serving on {args.socket}")
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop_workers()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
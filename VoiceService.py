@@ -0,0 +1,242 @@
+import queue
+import threading
+import time
+
+from AudioSource import SAMPLE_RATE, SAMPLE_WIDTH, CHANNEL_COUNT, FRAMES_PER_BUFFER, open_microphone
+
+
+BYTES_PER_SECOND = SAMPLE_RATE * SAMPLE_WIDTH * CHANNEL_COUNT
+
+
+class VoiceService:
+    """Background speech recognizer shared by every Speak press.
+
+    The VOSK model is loaded once on a worker thread; VoiceControl (and with it
+    vosk) is only imported there, so players who never use voice mode never pay
+    for it. The microphone is open while voice mode is: pause() closes it and
+    the next start() opens it again. warm_up() loads the model ahead of time
+    without opening the microphone. The game asks for card numbers with request_numbers() and picks up the result
+    with poll(), so the pygame loop keeps running while the player speaks. One
+    utterance can name a whole pair ("three and eleven"). Recognition is limited
+    to the numbers on the current board (see set_max_number()).
+
+    With hands_free set, the game keeps a request open all the time and a
+    VoiceActivityDetector gates the audio: the recognizer only decodes speech
+    (with a short pre-roll), not the silence between turns.
+
+    With server_path set, decoding happens on a VoiceServer (see VoiceServer.py)
+    instead of in this process, so several players on one machine share its
+    workers and no model is loaded here.
+    """
+
+    def __init__(self, max_number=16, open_source=None, server_path=None):
+        self.results = queue.Queue()
+        self.error = None
+        self.max_number = max_number
+        self.count = 2
+        # Where the audio comes from; the microphone unless told otherwise
+        self.open_source = open_source
+        self.server_path = server_path
+        # click -> result (cold includes loading the model), and end of speech -> card flipped
+        self.latencies = {'cold': [], 'warm': [], 'speech_end': []}
+        # Called from the worker thread when a result arrives or listening stops,
+        # e.g. to wake a game loop that is blocked waiting for input
+        self.on_change = None
+        self.hands_free = False
+        # Milliseconds of audio heard while a request was open, and how much of it was decoded
+        self.audio_ms = {'heard': 0.0, 'decoded': 0.0}
+        self._thread = None
+        self._model = None
+        self._model_error = None
+        self._model_lock = threading.Lock()
+        self._model_thread = None
+        self._ready = threading.Event()
+        self._listen = threading.Event()
+        self._active = threading.Event()  # voice mode is on: keep the audio source open
+        self._stop = threading.Event()
+        self._request_time = None
+        self._request_is_cold = False
+
+    def start(self):
+        """Start the worker thread, or reopen the audio source after pause(). The model loads there, not here."""
+        self._active.set()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name='VoiceService', daemon=True)
+            self._thread.start()
+
+    def warm_up(self):
+        """Import the voice stack and load the model in the background, e.g. while the menu is up."""
+        if self._model_thread is None and self._model is None and self.server_path is None:
+            self._model_thread = threading.Thread(target=self._load_model, name='VoiceWarmUp', daemon=True)
+            self._model_thread.start()
+
+    def _load_model(self):
+        # Shared by warm_up() and the worker, so the model is loaded only once.
+        # A failure is kept and reported when voice mode is actually used.
+        with self._model_lock:
+            if self._model is None and self._model_error is None:
+                try:
+                    import VoiceControl
+                    self._model = VoiceControl.init_vosk_model()
+                except Exception as e:
+                    self._model_error = e
+        return self._model
+
+    def stop(self):
+        self._stop.set()
+        self._active.set()  # wakes a paused worker so it can exit
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def set_max_number(self, max_number):
+        """Highest card number on the board; the grammar is rebuilt on the next request."""
+        self.max_number = max_number
+
+    @property
+    def listening(self):
+        return self._listen.is_set()
+
+    def request_numbers(self, count=2):
+        """Listen for an utterance naming up to `count` cards."""
+        if self.error is not None:
+            return
+        if not self._listen.is_set():
+            self._request_time = time.perf_counter()
+            self._request_is_cold = not self._ready.is_set()
+        self.count = count
+        self._listen.set()
+        self.start()
+
+    def cancel(self):
+        self._listen.clear()
+        self._request_time = None
+
+    def pause(self):
+        """Voice mode ended: stop listening and close the audio source until the next start()."""
+        self._active.clear()
+        self.cancel()
+
+    def poll(self):
+        """Return the card numbers of the next utterance, in spoken order, or None if nothing is ready."""
+        try:
+            numbers, speech_end = self.results.get_nowait()
+        except queue.Empty:
+            return None
+        # The caller acts on the number this frame
+        self.latencies['speech_end'].append((time.perf_counter() - speech_end) * 1000)
+        return numbers
+
+    def latency_report(self):
+        """Latency in milliseconds: click to result (cold and warm) and end of speech to action."""
+        report = {}
+        for kind, samples in self.latencies.items():
+            if samples:
+                report[kind] = {
+                    'count': len(samples),
+                    'mean_ms': sum(samples) / len(samples),
+                    'max_ms': max(samples),
+                }
+        return report
+
+    def _worker(self):
+        try:
+            if self.server_path is not None:
+                # Decoding happens on the server, so vosk is never imported here
+                from VoiceServer import RemoteListener, DEFAULT_SOCKET
+                model = None
+                listener = RemoteListener(self.max_number, self.server_path or DEFAULT_SOCKET)
+            else:
+                model = self._load_model()
+                if model is None:
+                    raise self._model_error
+                import VoiceControl
+                listener = VoiceControl.NumberListener(model, self.max_number, count=self.count)
+            source = (self.open_source or open_microphone)()
+        except Exception as e:
+            self.error = e
+            self._listen.clear()
+            self._notify()
+            print(f"Voice control unavailable: {e}")
+            return
+        self._ready.set()
+
+        vad = None
+        was_listening = False
+        try:
+            while not self._stop.is_set():
+                if not self._active.is_set():
+                    if source is not None:
+                        source.close()
+                        source = None
+                    self._active.wait()
+                    continue
+                if source is None:
+                    try:
+                        source = (self.open_source or open_microphone)()
+                    except Exception as e:
+                        self.error = e
+                        print(f"Voice control unavailable: {e}")
+                        break
+                    vad = None
+                    was_listening = False
+                # Keep draining the stream between requests so a new request
+                # starts from live audio instead of a stale buffer.
+                data = source.read(FRAMES_PER_BUFFER)
+                if not data:
+                    # A file or pipe ran out; later requests fail fast instead of hanging
+                    self.error = EOFError("audio input ended")
+                    break
+                read_time = time.perf_counter()
+                # The detector keeps running between requests, so its noise
+                # level and pre-roll are current when the next one starts.
+                if self.hands_free:
+                    if vad is None:
+                        from VoiceActivity import VoiceActivityDetector
+                        vad = VoiceActivityDetector()
+                    speech, ended = vad.process(data)
+                else:
+                    vad = None
+                    speech, ended = data, False
+                listening = self._listen.is_set()
+                if listening and not was_listening:
+                    if listener.max_number != self.max_number:
+                        if model is None:
+                            listener.max_number = self.max_number  # sent with the next request
+                        else:
+                            listener = VoiceControl.NumberListener(model, self.max_number)
+                    listener.listen_for(self.count)
+                was_listening = listening
+                if not listening:
+                    continue
+
+                self.audio_ms['heard'] += len(data) * 1000 / BYTES_PER_SECOND
+                self.audio_ms['decoded'] += len(speech) * 1000 / BYTES_PER_SECOND
+                committed = listener.accept(speech) if speech else None
+                if committed is None and ended:
+                    committed = listener.finish()
+                if committed is not None:
+                    numbers, lag_ms = committed
+                    self._deliver(numbers, read_time - lag_ms / 1000)
+        finally:
+            self._listen.clear()
+            self._notify()
+            if source is not None:
+                source.close()
+            if model is None:
+                listener.close()
+
+    def _deliver(self, numbers, speech_end):
+        if self._request_time is not None:
+            elapsed_ms = (time.perf_counter() - self._request_time) * 1000
+            self.latencies['cold' if self._request_is_cold else 'warm'].append(elapsed_ms)
+            self._request_time = None
+        # Queue the result before it stops listening: the game never sees a finished
+        # request without its answer, so hands-free cannot ask again ahead of it
+        self.results.put((numbers, speech_end))
+        self._listen.clear()
+        self._notify()
+
+    def _notify(self):
+        if self.on_change is not None:
+            self.on_change()
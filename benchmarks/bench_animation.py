@@ -0,0 +1,129 @@
+"""Card animation benchmark: many cards flipping at once on SDL's dummy drivers.
+
+    python -m benchmarks.bench_animation --sizes 10x10,30x30 --flips 50 --output anim.json
+
+Each wave turns `--flips` cards over together (face up, then face down) and
+times every frame until the animations finish. Also reports how long the
+frames took to pre-render at deal time, the size of the frame cache, and how
+many pygame.transform calls were made inside the frame loop (should be 0).
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import metadata, parse_board_sizes, save_results, summarize
+
+import pygame
+
+from GameState import GameState
+from memorygame import MemGame
+
+
+class TransformCounter:
+    """Counts calls to pygame.transform while installed."""
+
+    def __init__(self):
+        self.calls = 0
+        self.saved = {}
+
+    def install(self):
+        for name in dir(pygame.transform):
+            func = getattr(pygame.transform, name)
+            if callable(func) and not name.startswith('_'):
+                self.saved[name] = func
+                setattr(pygame.transform, name, self.wrap(func))
+
+    def wrap(self, func):
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return func(*args, **kwargs)
+        return counted
+
+    def uninstall(self):
+        for name, func in self.saved.items():
+            setattr(pygame.transform, name, func)
+        self.saved.clear()
+
+
+def run_size(rows, cols, flips, waves, seed=0):
+    game = MemGame(rows, cols, seed=seed)
+    now = [0]
+    game.ticks = lambda: now[0]
+    game.animator.clear()
+    game.animator.cache.clear()
+    start = time.perf_counter()
+    game.prepare_animations()
+    prepare_ms = (time.perf_counter() - start) * 1000
+
+    game.start_mode(GameState.SINGLE_PLAYER)
+    game.draw()
+    flips = min(flips, len(game.cards_deck))
+    rng = random.Random(seed)
+
+    def frame():
+        now[0] += game.UPDATE_STEP_MS
+        start = time.perf_counter()
+        game.draw()
+        return (time.perf_counter() - start) * 1000
+
+    still_ms = [frame() for _ in range(60)]
+
+    counter = TransformCounter()
+    counter.install()
+    frame_ms = []
+    concurrent = 0
+    try:
+        for _ in range(waves):
+            cards = rng.sample(game.cards_deck, flips)
+            for face_up in (True, False):
+                for card in cards:
+                    game.animator.flip(card, face_up, game.ticks())
+                    card.visible = face_up
+                concurrent = max(concurrent, len(game.animator.active))
+                while game.animator.active:
+                    frame_ms.append(frame())
+    finally:
+        counter.uninstall()
+
+    result = {
+        'board': f"{rows}x{cols}",
+        'card_size': game.layout.card_size,
+        'concurrent_flips': concurrent,
+        'prepare_ms': prepare_ms,
+        'cache_bytes': game.animator.cache.nbytes,
+        'cache_misses': game.animator.cache.misses,
+        'transform_calls_in_frames': counter.calls,
+        'animated_frames': len(frame_ms),
+        'frame_ms': summarize(frame_ms),
+        'still_frame_ms': summarize(still_ms),
+    }
+    pygame.quit()
+    return result
+
+
+def run(sizes, flips=50, waves=20):
+    return [run_size(rows, cols, flips, waves) for rows, cols in sizes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10x10,30x30')
+    parser.add_argument('--flips', type=int, default=50, help="cards turned over together in each wave")
+    parser.add_argument('--waves', type=int, default=20)
+    parser.add_argument('--output', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(parse_board_sizes(args.sizes), args.flips, args.waves)
+    for result in results:
+        frame, still = result['frame_ms'], result['still_frame_ms']
+        print(f"{result['board']} ({result['card_size']}px cards), {result['concurrent_flips']} concurrent flips: "
+              f"frame p50 {frame['p50_ms']:.3f} ms p99 {frame['p99_ms']:.3f} ms "
+              f"(idle board p50 {still['p50_ms']:.3f} ms), "
+              f"prepared in {result['prepare_ms']:.0f} ms, cache {result['cache_bytes'] / 2**20:.1f} MiB, "
+              f"{result['transform_calls_in_frames']} transform calls in frames")
+    if args.output:
+        save_results({'meta': metadata(), 'animation': results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Procedural card face benchmark: generating, caching and reloading thousands of faces.
+
+    python -m benchmarks.bench_faces --counts 1000,5000 --sizes 16,64 --output faces.json
+
+For every face count and size, times one vectorized generation, the same
+faces rendered one at a time (the per-surface loop it replaces), the first
+load (generate and write the cache file), a later load (one read of that
+file) and building the atlas from the loaded pixels. Also checks that every
+face is distinct.
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import metadata, save_results
+
+import numpy as np
+import pygame
+
+import FaceGenerator
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run_case(count, size, directory, loop_sample=200):
+    faces, generate_ms = timed(lambda: FaceGenerator.generate_faces(0, count, size))
+    sample = min(loop_sample, count)
+    _, loop_ms = timed(lambda: [FaceGenerator.generate_faces(i, 1, size) for i in range(sample)])
+    _, cold_ms = timed(lambda: FaceGenerator.load_faces(count, size, directory=directory))
+    _, warm_ms = timed(lambda: FaceGenerator.load_faces(count, size, directory=directory))
+    _, atlas_ms = timed(lambda: FaceGenerator.GeneratedTheme(size, count, directory=directory).faces(count))
+    distinct = len(np.unique(faces.reshape(count, -1), axis=0))
+    return {
+        'count': count,
+        'size': size,
+        'generate_ms': generate_ms,
+        'per_face_loop_ms': loop_ms * count / sample,  # extrapolated from `sample` faces
+        'cold_load_ms': cold_ms,
+        'cached_load_ms': warm_ms,
+        'atlas_ms': atlas_ms,
+        'cache_file_bytes': faces.nbytes,
+        'distinct_faces': distinct,
+    }
+
+
+def run(counts, sizes):
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    directory = tempfile.mkdtemp(prefix='face_cache_')
+    try:
+        return [run_case(count, size, directory) for size in sizes for count in counts]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--counts', default='1000,5000')
+    parser.add_argument('--sizes', default='16,64')
+    parser.add_argument('--output', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run([int(c) for c in args.counts.split(',')], [int(s) for s in args.sizes.split(',')])
+    for r in results:
+        print(f"{r['count']} faces at {r['size']}px: generated in {r['generate_ms']:.0f} ms "
+              f"(one at a time ~{r['per_face_loop_ms']:.0f} ms), first load {r['cold_load_ms']:.0f} ms, "
+              f"cached load {r['cached_load_ms']:.1f} ms, atlas {r['atlas_ms']:.1f} ms, "
+              f"{r['distinct_faces']}/{r['count']} distinct")
+    if args.output:
+        save_results({'meta': metadata(), 'faces': results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Frame-loop benchmark: drives MemGame with scripted clicks on SDL's dummy drivers.
+
+    python -m benchmarks.bench_game --sizes 4x4,10x10 --output game.json
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+from benchmarks.common import metadata, parse_board_sizes, save_results, summarize
+
+import pygame
+
+from GameState import GameState
+from memorygame import MemGame
+
+
+MODES = {
+    'single': 'ONE_PLAYER_BUTTON_RECT',
+    'two_players': 'TWO_PLAYER_BUTTON_RECT',
+    'time_attack': 'TIME_ATTACK_BUTTON_RECT',
+    'vs_cpu': 'VS_CPU_BUTTON_RECT',
+    'voice': 'VOICE_CONTROL_BUTTON_RECT',
+}
+
+
+class ScriptedVoice:
+    """Stands in for VoiceService: utterances (lists of card numbers) come from the script."""
+
+    def __init__(self):
+        self.utterances = deque()
+        self.listening = False
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def set_max_number(self, max_number):
+        pass
+
+    def cancel(self):
+        self.listening = False
+
+    def request_numbers(self, count=2):
+        self.listening = True
+
+    def poll(self):
+        if self.listening and self.utterances:
+            self.listening = False
+            return self.utterances.popleft()
+        return None
+
+    def latency_report(self):
+        return {}
+
+
+class Player:
+    """Picks the next card to flip: a few deliberate misses, then solves the board."""
+
+    def __init__(self, misses=2):
+        self.misses = misses
+        self.pairs = None
+        self.partner = {}
+        self.cursor = 0
+
+    def next_index(self, board, first=None):
+        """Next card to flip; `first` is a card already chosen for this turn but not flipped yet."""
+        if self.pairs is not board.pairs:
+            # new board (first call, or a Time Attack round started)
+            self.pairs = board.pairs
+            first_seen = {}
+            self.partner = {}
+            for i, pair in enumerate(board.pairs):
+                if pair in first_seen:
+                    self.partner[i] = first_seen[pair]
+                    self.partner[first_seen[pair]] = i
+                else:
+                    first_seen[pair] = i
+            self.cursor = 0
+
+        if first is None and board.selected:
+            first = board.selected[0]
+        if first is not None:
+            if self.misses > 0:
+                for i in range(board.size):
+                    if i != first and i != self.partner[first] and board.is_selectable(i):
+                        self.misses -= 1
+                        return i
+            return self.partner[first]
+
+        while self.cursor < board.size and board.is_matched(self.cursor):
+            self.cursor += 1
+        return self.cursor if self.cursor < board.size else None
+
+
+def card_center(game, index):
+    x, y = game.layout.card_position(index)
+    half = game.layout.card_size // 2
+    return (x + half, y + half)
+
+
+def post_click(position):
+    pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos=position, rel=(0, 0), buttons=(0, 0, 0)))
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=position, button=1))
+
+
+def run_scenario(mode, rows, cols, max_frames, seed=0, profile=False):
+    """Play one scripted game and return per-frame timings plus CPU and memory counters."""
+    game = MemGame(rows, cols)
+    game.board.rng.seed(seed)
+    game.reset_game()
+    game.prepare_animations()    # run() does this while the menu is up
+    game.FPS = 0                 # no frame cap: measure work, not sleep
+    game.MISMATCH_REVEAL_MS = 0
+    game.CPU_MOVE_DELAY_MS = 0
+    voice = ScriptedVoice()
+    game.voice_service = voice
+    player = Player()
+    if profile:
+        game.profiler.enable()
+    pygame.event.clear()
+
+    post_click(getattr(game.gui, MODES[mode]).center)
+    frame_times = []
+    blocks_before = sys.getallocatedblocks()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    game.last_update_ticks = pygame.time.get_ticks()
+
+    for _ in range(max_frames):
+        if game.game_state == GameState.GAME_OVER:
+            break
+        human_turn = game.cpu is None or game.current_player != game.CPU_PLAYER
+        if game.game_state != GameState.PLAYER_SELECTION and human_turn:
+            index = player.next_index(game.board)
+            if index is not None:
+                if mode == 'voice':
+                    # Name the whole pair in one utterance, as a player would
+                    numbers = [index + 1]
+                    if not game.board.selected:
+                        numbers.append(player.next_index(game.board, index) + 1)
+                    voice.utterances.append(numbers)
+                    post_click(game.gui.SPEAK_BUTTON_RECT.center)
+                else:
+                    post_click(card_center(game, index))
+        # Frames run uncapped, so credit one fixed update step per frame as at 60 fps.
+        game.update_accumulator += game.UPDATE_STEP_MS
+        start = time.perf_counter()
+        game.run_frame()
+        frame_times.append((time.perf_counter() - start) * 1000)
+
+    cpu_seconds = time.process_time() - cpu_start
+    wall_seconds = time.perf_counter() - wall_start
+    blocks_after = sys.getallocatedblocks()
+    frames = len(frame_times)
+    result = {
+        'mode': mode,
+        'board': f"{rows}x{cols}",
+        'frames': frames,
+        'frame_ms': summarize(frame_times),
+        'mean_frame_ms': sum(frame_times) / frames if frames else 0.0,
+        'cpu_seconds': cpu_seconds,
+        'wall_seconds': wall_seconds,
+        'cpu_per_frame_ms': cpu_seconds * 1000 / frames if frames else 0.0,
+        'net_blocks_per_frame': (blocks_after - blocks_before) / frames if frames else 0.0,
+        'tries': game.match_tries_count,
+        'final_state': game.game_state.name,
+    }
+    if profile:
+        result['phases_ms'] = phase_breakdown(game.profiler, frames)
+    return result
+
+
+def phase_breakdown(profiler, frames):
+    """Mean milliseconds per frame spent in each profiled phase."""
+    totals = {}
+    for event in profiler.trace_events:
+        if event['ph'] == 'X':
+            totals[event['name']] = totals.get(event['name'], 0.0) + event['dur'] / 1000
+    return {name: total / max(frames, 1) for name, total in sorted(totals.items())}
+
+
+def measure_allocations(mode, rows, cols, max_frames, seed=0):
+    """Replay the scenario under tracemalloc; slower, so kept out of the timing pass."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_current, _ = tracemalloc.get_traced_memory()
+    run_scenario(mode, rows, cols, max_frames, seed)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'alloc_peak_kb': (peak - start_current) / 1024, 'alloc_net_kb': (current - start_current) / 1024}
+
+
+def run(modes, sizes, max_frames, allocations=True, profile=False):
+    results = {}
+    for rows, cols in sizes:
+        for mode in modes:
+            key = f"{mode}_{rows}x{cols}"
+            result = run_scenario(mode, rows, cols, max_frames, profile=profile)
+            if allocations:
+                result.update(measure_allocations(mode, rows, cols, max_frames))
+            results[key] = result
+            print(f"{key:24} {result['frames']:6} frames  p50 {result['frame_ms']['p50_ms']:.3f} ms  "
+                  f"p99 {result['frame_ms']['p99_ms']:.3f} ms  max {result['frame_ms']['max_ms']:.2f} ms  "
+                  f"cpu {result['cpu_seconds']:.2f} s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--sizes', default='4x4,10x10,30x30')
+    parser.add_argument('--max-frames', type=int, default=5000)
+    parser.add_argument('--no-alloc', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--profile', action='store_true', help="add a per-phase breakdown (slows frames down)")
+    parser.add_argument('--output', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    results = {'meta': metadata(),
+               'game': run(args.modes.split(','), parse_board_sizes(args.sizes),
+                           args.max_frames, not args.no_alloc, args.profile)}
+    if args.output:
+        save_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Network load generator: many rooms of two perfect-memory bots against a NetServer.
+
+    python -m benchmarks.bench_net --spawn --rooms 1000 --games 3 --output net.json
+    python -m benchmarks.bench_net --host 10.0.0.5 --rooms 200
+
+Reports messages per second through the server, FLIP -> REVEAL latency
+percentiles and the server's resident memory per room (from STATS).
+"""
+import argparse
+import asyncio
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.common import REPO_ROOT, metadata, save_results, summarize
+
+import NetProtocol as proto
+
+
+class Bot:
+    """One player. Remembers every revealed card and never forgets a pair."""
+
+    def __init__(self, stats, games, rng):
+        self.stats = stats
+        self.games = games
+        self.rng = rng
+        self.reader = None
+        self.writer = None
+        self.player = None
+        self.players = 0
+        self.current_player = 0
+        self.done = asyncio.Event()
+
+    def new_board(self, state):
+        self.player = state['player']
+        self.players = state['players']
+        self.current_player = state['current_player']
+        self.known = {}       # card index -> pair id
+        self.seen = {}        # pair id -> card indices seen so far
+        self.matched = set()
+        self.size = state['rows'] * state['cols']
+        self.unknown = set(range(self.size))
+        for index, pair in state['pairs'].items():
+            self.remember(index, pair)
+        self.matched.update(i for i, flags in enumerate(state['flags']) if flags & 2)
+        self.selected = []    # this turn's flips, until the MATCH or MISMATCH for them
+        self.flip_sent = None
+        self.game_over = False
+
+    def remember(self, index, pair):
+        if index not in self.known:
+            self.known[index] = pair
+            self.seen.setdefault(pair, []).append(index)
+            self.unknown.discard(index)
+
+    def choose(self):
+        if not self.selected:
+            for pair, indices in self.seen.items():
+                if len(indices) == 2 and indices[0] not in self.matched:
+                    return indices[0]
+            return self.rng.choice(tuple(self.unknown))
+        first = self.selected[0]
+        partners = [i for i in self.seen[self.known[first]] if i != first]
+        if partners:
+            return partners[0]
+        return self.rng.choice(tuple(self.unknown))
+
+    def act(self):
+        # The last MATCH arrives just before GAME_OVER
+        if self.game_over or len(self.matched) == self.size:
+            return
+        if self.flip_sent is not None or len(self.selected) == 2:
+            return
+        if self.players < 2 or self.current_player != self.player:
+            return
+        self.flip_sent = time.perf_counter()
+        self.writer.write(proto.encode(proto.FLIP, self.choose()))
+        self.stats['sent'] += 1
+
+    def handle(self, kind, payload):
+        self.stats['received'] += 1
+        if kind == proto.WELCOME:
+            self.new_board(proto.decode_welcome(payload))
+            self.act()
+            return
+        fields = proto.decode(kind, payload)
+        if kind == proto.REVEAL:
+            index, pair = fields
+            self.remember(index, pair)
+            if self.flip_sent is not None and self.current_player == self.player:
+                self.stats['latency_ms'].append((time.perf_counter() - self.flip_sent) * 1000)
+                self.flip_sent = None
+                self.selected.append(index)
+        elif kind == proto.MATCH:
+            self.matched.update(fields[:2])
+            self.selected = []
+        elif kind == proto.MISMATCH:
+            self.selected = []
+            return  # wait for the TURN that follows
+        elif kind == proto.TURN:
+            self.current_player = fields[0]
+        elif kind in (proto.PLAYER_JOINED, proto.PLAYER_LEFT):
+            self.players = fields[1]
+        elif kind == proto.GAME_OVER:
+            self.game_over = True
+            self.games -= 1
+            if self.games <= 0:
+                self.done.set()
+            return
+        elif kind == proto.ERROR:
+            self.stats['errors'] += 1
+            self.flip_sent = None
+        self.act()
+
+    async def connect(self, host, port, room_id, rows, cols):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.writer.transport.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.writer.write(proto.encode(proto.JOIN, room_id, rows, cols))
+        await self.writer.drain()
+        # Wait until this bot is seated, so joins are counted in the memory figure
+        kind, payload = await proto.read_message(self.reader)
+        self.handle(kind, payload)
+
+    async def play(self):
+        try:
+            while not self.done.is_set():
+                kind, payload = await proto.read_message(self.reader)
+                self.handle(kind, payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.stats['disconnects'] += 1
+        finally:
+            self.writer.close()
+
+
+async def server_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(proto.encode(proto.STATS))
+    kind, payload = await proto.read_message(reader)
+    writer.close()
+    return proto.decode(kind, payload)
+
+
+async def run_load(host, port, rooms, games, rows, cols, connect_concurrency=200, seed=0):
+    rng = random.Random(seed)
+    stats = {'sent': 0, 'received': 0, 'errors': 0, 'disconnects': 0, 'latency_ms': []}
+    _, _, rss_before = await server_stats(host, port)
+
+    bots = [Bot(stats, games, rng) for _ in range(rooms * 2)]
+    limit = asyncio.Semaphore(connect_concurrency)
+
+    async def connect(bot, room_id):
+        async with limit:
+            await bot.connect(host, port, room_id, rows, cols)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(connect(bot, i // 2 + 1) for i, bot in enumerate(bots)))
+    connect_s = time.perf_counter() - start
+    open_rooms, connections, rss_joined = await server_stats(host, port)
+
+    stats['received'] = stats['sent'] = 0
+    stats['latency_ms'].clear()
+    start = time.perf_counter()
+    for bot in bots:
+        bot.act()  # whoever's turn it is after both joined
+    await asyncio.gather(*(bot.play() for bot in bots))
+    seconds = time.perf_counter() - start
+
+    messages = stats['sent'] + stats['received']
+    return {
+        'rooms': rooms,
+        'games_per_room': games,
+        'board': f"{rows}x{cols}",
+        'connect_seconds': connect_s,
+        'play_seconds': seconds,
+        'messages': messages,
+        'messages_per_second': messages / seconds if seconds else 0.0,
+        'moves_per_second': stats['sent'] / seconds if seconds else 0.0,
+        'flip_latency_ms': summarize(stats['latency_ms']),
+        'errors': stats['errors'],
+        'disconnects': stats['disconnects'],
+        'server_rooms': open_rooms,
+        'server_connections': connections,
+        'server_rss_bytes': rss_joined,
+        'memory_per_room_bytes': (rss_joined - rss_before) / rooms if rooms else 0.0,
+    }
+
+
+def raise_file_limit(needed):
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+
+def spawn_server(host, port):
+    server = subprocess.Popen([sys.executable, 'NetServer.py', '--host', host, '--port', str(port),
+                               '--new-game-delay', '0'], cwd=REPO_ROOT, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return server
+        except OSError:
+            if server.poll() is not None or time.monotonic() > deadline:
+                server.kill()
+                raise RuntimeError("server did not start")
+            time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=proto.DEFAULT_PORT)
+    parser.add_argument('--spawn', action='store_true', help="start a NetServer on --port for the run")
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--games', type=int, default=3, help="games each room plays before the bots leave")
+    parser.add_argument('--rows', type=int, default=4)
+    parser.add_argument('--cols', type=int, default=4)
+    parser.add_argument('--output', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    # Two sockets per room here, and two more on the server if it runs on this machine
+    raise_file_limit(args.rooms * (4 if args.spawn else 2) + 256)
+    server = spawn_server(args.host, args.port) if args.spawn else None
+    try:
+        result = asyncio.run(run_load(args.host, args.port, args.rooms, args.games, args.rows, args.cols))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latency = result['flip_latency_ms']
+    print(f"{result['rooms']} rooms x {result['games_per_room']} games on {result['board']}: "
+          f"{result['messages_per_second']:.0f} msg/s, {result['moves_per_second']:.0f} moves/s, "
+          f"flip latency p50 {latency['p50_ms']:.2f} ms p99 {latency['p99_ms']:.2f} ms, "
+          f"{result['memory_per_room_bytes'] / 1024:.1f} KiB/room, "
+          f"{result['errors']} errors, {result['disconnects']} disconnects")
+    if args.output:
+        save_results({'meta': metadata(), 'net': result}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Save/resume benchmark: snapshot size and the cost of saving and restoring a game.
+
+    python -m benchmarks.bench_snapshot --sizes 4x4,30x30,100x100 --moves 200 --output snapshot.json
+
+Plays `--moves` card flips of a single player game and times the snapshot
+saved after each one (on the game thread; the write itself happens in the
+background). Then times decoding the file, rebuilding the Board from it, and
+a full resume in a fresh game up to its first drawn frame.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import metadata, parse_board_sizes, save_results, summarize
+
+import pygame
+
+import Snapshot
+from Engine import Board
+from GameState import GameState
+from memorygame import MemGame
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run_size(rows, cols, moves, directory, seed=0):
+    path = os.path.join(directory, f'{rows}x{cols}.save')
+    game = MemGame(rows, cols, seed=seed)
+    game.snapshots = Snapshot.SnapshotStore(path)
+    game.start_mode(GameState.SINGLE_PLAYER)
+    board = game.board
+    save_ms = []
+    for move in range(moves):
+        choices = [i for i in range(board.size) if board.is_selectable(i)]
+        if board.matched_count + 4 > board.size:
+            break  # keep the game going, or its snapshot is discarded
+        game.select_card(game.cards_deck[choices[move * 7 % len(choices)]])
+        _, ms = timed(game.save_snapshot)
+        save_ms.append(ms)
+    game.snapshots.flush()
+    game.snapshots.close()
+    pygame.quit()
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    snapshot, decode_ms = timed(lambda: Snapshot.decode(data))
+
+    def rebuild():
+        restored = Board(snapshot.rows, snapshot.cols, len(snapshot.scores), seed=snapshot.seed, deal=False)
+        restored.restore(snapshot.pairs, snapshot.flags, snapshot.scores, snapshot.current_player, snapshot.tries)
+        return restored
+    _, rebuild_ms = timed(rebuild)
+
+    game = MemGame(4, 4, seed=seed)
+    game.snapshots = Snapshot.SnapshotStore(path)
+    ok, resume_ms = timed(game.resume_game)
+    _, frame_ms = timed(game.draw)
+    game.snapshots.close()
+    pygame.quit()
+    if not ok:
+        raise RuntimeError(f"{rows}x{cols} snapshot did not resume")
+    return {
+        'board': f'{rows}x{cols}',
+        'moves': len(save_ms),
+        'file_bytes': len(data),
+        'bytes_per_card': len(data) / (rows * cols),
+        'save_ms': summarize(save_ms),
+        'decode_ms': decode_ms,
+        'rebuild_board_ms': rebuild_ms,
+        'resume_ms': resume_ms,
+        'first_frame_ms': frame_ms,
+    }
+
+
+def run(sizes, moves=200):
+    directory = tempfile.mkdtemp(prefix='snapshots_')
+    try:
+        return [run_size(rows, cols, moves, directory) for rows, cols in sizes]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='4x4,30x30,100x100')
+    parser.add_argument('--moves', type=int, default=200, help="card flips to play before resuming")
+    parser.add_argument('--output', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(parse_board_sizes(args.sizes), args.moves)
+    for r in results:
+        save = r['save_ms']
+        print(f"{r['board']}: {r['file_bytes']} bytes ({r['bytes_per_card']:.2f} per card), "
+              f"save p50 {save['p50_ms']:.3f} ms p99 {save['p99_ms']:.3f} ms, "
+              f"decode {r['decode_ms']:.2f} ms, board rebuilt in {r['rebuild_board_ms']:.2f} ms, "
+              f"resumed in {r['resume_ms']:.1f} ms + first frame {r['first_frame_ms']:.1f} ms")
+    if args.output:
+        save_results({'meta': metadata(), 'snapshot': results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
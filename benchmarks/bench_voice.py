@@ -0,0 +1,250 @@
+"""Voice pipeline benchmark: number parsing speed/accuracy and recognition over WAV fixtures.
+
+    python -m benchmarks.bench_voice --wav-dir recordings/ --output voice.json
+
+WAV fixtures must be 16 kHz, mono, 16-bit. A leading number in the file name
+(e.g. "12_twelve.wav", or "3_11_three_and_eleven.wav" for a pair) is taken
+as the expected card numbers. For large
+recording sets use Transcribe.py, which decodes across a process pool.
+
+The voice-activity gate used by hands-free mode is measured on synthetic
+audio (noise with short bursts of voiced sound) even without a model: how
+much of the audio it passes on to the recognizer and what it costs. With
+--wav-dir, each recording is also padded with background noise and decoded
+with and without the gate, to compare recognizer CPU.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+from benchmarks.common import metadata, save_results, summarize
+
+import numpy as np
+
+from AudioSource import SAMPLE_RATE, WavFile
+from VoiceActivity import VoiceActivityDetector
+
+
+# (utterance, expected card number)
+PARSE_CORPUS = [
+    ('one', 1), ('two', 2), ('three', 3), ('four', 4), ('five', 5), ('six', 6),
+    ('seven', 7), ('eight', 8), ('nine', 9), ('ten', 10), ('eleven', 11), ('twelve', 12),
+    ('thirteen', 13), ('fourteen', 14), ('fifteen', 15), ('sixteen', 16),
+    ('won', 1), ('too', 2), ('tree', 3), ('for', 4), ('ate', 8), ('nein', 9), ('tin', 10),
+    ('card number seven', 7), ('the sixteen', 16), ('number fourteen please', 14),
+    ('seventeen', 17), ('nineteen', 19), ('twenty', 20), ('twenty one', 21), ('twenty-five', 25),
+    ('forty', 40), ('fifty', 50), ('sixty', 60), ('thirty two', 32), ('sixty four', 64),
+    ('ninety nine', 99), ('one hundred', 100), ('a hundred and five', 105),
+    ('two hundred twelve', 212), ('one thousand', 1000), ('card 37', 37),
+    ('sixteen six', 16), ('six sixteen', 6),
+    ('hello', None), ('', None), ('then what', None), ('often', None), ('tonight', None),
+    ('heaven', None), ('[unk]', None),
+]
+
+
+def bench_parse(parse, repeat=2000):
+    correct = sum(1 for text, expected in PARSE_CORPUS if parse(text) == expected)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text, _ in PARSE_CORPUS:
+            parse(text)
+    elapsed = time.perf_counter() - start
+    calls = repeat * len(PARSE_CORPUS)
+    return {
+        'corpus_size': len(PARSE_CORPUS),
+        'accuracy': correct / len(PARSE_CORPUS),
+        'us_per_call': elapsed * 1e6 / calls,
+    }
+
+
+def decode_file(voice_control, model, frames, max_number, stable_partial_ms):
+    """Stream one recording through NumberListener the way the game does.
+
+    Returns (numbers, lag_ms): lag_ms is the audio that had to follow the end of
+    the last spoken number before it was committed.
+    """
+    listener = voice_control.NumberListener(model, max_number, stable_partial_ms)
+    chunk = voice_control.FRAMES_PER_BUFFER * 2
+    for offset in range(0, len(frames), chunk):
+        committed = listener.accept(frames[offset:offset + chunk])
+        if committed is not None:
+            return committed
+    # Out of audio: take whatever the recognizer settles on
+    result = json.loads(listener.recognizer.FinalResult())
+    numbers = listener.card_numbers(result.get('text', ''), final=True) or []
+    return numbers, listener.audio_ms - listener.speech_end_ms(result.get('result'), listener.audio_ms)
+
+
+def noise(seconds, rms, rng):
+    return rng.normal(0, rms, int(seconds * SAMPLE_RATE))
+
+
+def synthetic_session(seconds, noise_rms, every_s, length_s=0.6, speech_rms=2500, seed=0):
+    """Background noise with a voiced burst (a wandering 150-300 Hz tone) every `every_s` seconds."""
+    rng = np.random.default_rng(seed)
+    audio = noise(seconds, noise_rms, rng)
+    n = int(length_s * SAMPLE_RATE)
+    envelope = np.sqrt(np.sin(np.linspace(0, np.pi, n)))
+    bursts = 0
+    for start in np.arange(1.0, seconds - length_s, every_s) if every_s else ():
+        i = int(start * SAMPLE_RATE)
+        pitch = np.cumsum(rng.uniform(150, 300, n)) / SAMPLE_RATE
+        audio[i:i + n] += speech_rms * np.sqrt(2) * envelope * np.sin(2 * np.pi * pitch)
+        bursts += 1
+    return np.clip(audio, -32768, 32767).astype('<i2').tobytes(), bursts
+
+
+def gate(frames, chunk_bytes):
+    """Run audio through a fresh detector the way VoiceService does. Returns the detector and its segment count."""
+    vad = VoiceActivityDetector()
+    segments = 0
+    for offset in range(0, len(frames), chunk_bytes):
+        segments += vad.process(frames[offset:offset + chunk_bytes])[1]
+    return vad, segments
+
+
+def bench_vad(chunk_frames=1600, seconds=60):
+    results = {}
+    for noise_rms in (100, 400, 1000):
+        for name, every_s in (('silence', None), ('speech_every_5s', 5.0)):
+            frames, bursts = synthetic_session(seconds, noise_rms, every_s)
+            start = time.perf_counter()
+            vad, segments = gate(frames, chunk_frames * 2)
+            elapsed = time.perf_counter() - start
+            results[f"{name}_noise{noise_rms}"] = {
+                'passed': vad.pass_ratio,
+                'utterances': bursts,
+                'segments': segments,
+                'us_per_audio_second': elapsed * 1e6 / seconds,
+            }
+    return results
+
+
+def decode_gated(voice_control, model, frames, max_number):
+    """decode_file(), with the hands-free gate in front of the recognizer."""
+    vad = VoiceActivityDetector()
+    listener = voice_control.NumberListener(model, max_number)
+    chunk = voice_control.FRAMES_PER_BUFFER * 2
+    for offset in range(0, len(frames), chunk):
+        speech, ended = vad.process(frames[offset:offset + chunk])
+        committed = listener.accept(speech) if speech else None
+        if committed is None and ended:
+            committed = listener.finish()
+        if committed is not None:
+            return committed
+    return listener.finish() or ([], 0.0)
+
+
+def bench_gated_recognition(voice_control, model, recordings, max_number, pad_s=5.0, noise_rms=100):
+    """Each recording between `pad_s` of noise on both sides, decoded in full and through the gate."""
+    import Transcribe
+    rng = np.random.default_rng(0)
+    results = {}
+    for name in ('ungated', 'gated'):
+        decode_ms = []
+        labelled = correct = 0
+        audio_seconds = 0.0
+        for path, frames in recordings:
+            pad = np.clip(noise(pad_s, noise_rms, rng), -32768, 32767).astype('<i2').tobytes()
+            padded = pad + frames + pad
+            audio_seconds += len(padded) / 2 / SAMPLE_RATE
+            start = time.perf_counter()
+            if name == 'gated':
+                numbers, _ = decode_gated(voice_control, model, padded, max_number)
+            else:
+                numbers, _ = decode_file(voice_control, model, padded, max_number, None)
+            decode_ms.append((time.perf_counter() - start) * 1000)
+            expected = Transcribe.expected_numbers(path)
+            if expected:
+                labelled += 1
+                correct += numbers == expected
+        results[name] = {
+            'decode_ms': summarize(decode_ms),
+            'real_time_factor': sum(decode_ms) / 1000 / audio_seconds if audio_seconds else 0.0,
+            'accuracy': correct / labelled if labelled else None,
+        }
+    return results
+
+
+def bench_recognition(voice_control, wav_dir, max_number):
+    import Transcribe
+    start = time.perf_counter()
+    model = voice_control.init_vosk_model()
+    model_load_s = time.perf_counter() - start
+
+    recordings = []
+    audio_seconds = 0.0
+    for path in sorted(glob.glob(os.path.join(wav_dir, '*.wav'))):
+        try:
+            with WavFile(path) as wav:
+                recordings.append((path, wav.read_all()))
+                audio_seconds += wav.duration
+        except ValueError as e:
+            print(f"skipping {path}: {e}")
+
+    results = {'files': len(recordings), 'model_load_s': model_load_s}
+    # Commit on stable partials (what the game does) against waiting for the final result
+    for name, stable_partial_ms in (('partial', voice_control.NumberListener.STABLE_PARTIAL_MS), ('final', None)):
+        decode_ms = []
+        lag_ms = []
+        labelled = correct = 0
+        for path, frames in recordings:
+            start = time.perf_counter()
+            numbers, lag = decode_file(voice_control, model, frames, max_number, stable_partial_ms)
+            decode_ms.append((time.perf_counter() - start) * 1000)
+            lag_ms.append(lag)
+            expected = Transcribe.expected_numbers(path)
+            if expected:
+                labelled += 1
+                correct += numbers == expected
+        results[name] = {
+            'decode_ms': summarize(decode_ms),
+            'speech_end_to_commit_ms': summarize(lag_ms),
+            'real_time_factor': sum(decode_ms) / 1000 / audio_seconds if audio_seconds else 0.0,
+            'accuracy': correct / labelled if labelled else None,
+        }
+    results['hands_free'] = bench_gated_recognition(voice_control, model, recordings, max_number)
+    return results
+
+
+def run(wav_dir=None, max_number=16):
+    try:
+        import VoiceControl
+    except ImportError as e:
+        return {'skipped': f"voice stack not importable: {e}"}
+
+    results = {'parse': bench_parse(VoiceControl.parse_number_from_text)}
+    print(f"parse: {results['parse']['us_per_call']:.2f} us/call, accuracy {results['parse']['accuracy']:.0%}")
+    results['vad'] = bench_vad()
+    for name, vad in results['vad'].items():
+        print(f"vad ({name}): passed {vad['passed']:.1%} of the audio, {vad['segments']} segments for "
+              f"{vad['utterances']} utterances, {vad['us_per_audio_second']:.0f} us per second of audio")
+    if wav_dir:
+        results['recognition'] = bench_recognition(VoiceControl, wav_dir, max_number)
+        for name in ('partial', 'final'):
+            rec = results['recognition'][name]
+            print(f"recognition ({name}): {results['recognition']['files']} files, "
+                  f"speech end -> commit p50 {rec['speech_end_to_commit_ms']['p50_ms']:.0f} ms, "
+                  f"RTF {rec['real_time_factor']:.3f}, accuracy {rec['accuracy']}")
+        for name, rec in results['recognition']['hands_free'].items():
+            print(f"recognition ({name}, padded with silence): RTF {rec['real_time_factor']:.4f}, "
+                  f"accuracy {rec['accuracy']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--wav-dir', help="directory of 16 kHz mono WAV fixtures")
+    parser.add_argument('--max-number', type=int, default=16, help="highest card number in the grammar")
+    parser.add_argument('--output', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    results = {'meta': metadata(), 'voice': run(args.wav_dir, args.max_number)}
+    if args.output:
+        save_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
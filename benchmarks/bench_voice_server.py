@@ -0,0 +1,190 @@
+"""Voice server load test: WAV fixtures replayed as concurrent streams against a VoiceServer.
+
+    python -m benchmarks.bench_voice_server --wav-dir recordings/ --streams 32 --total 256 --workers 4
+
+Starts a VoiceServer on a temporary socket (or uses a running one with
+--socket) and keeps --streams clients busy until --total streams have been
+decoded. Each stream plays one fixture in 100 ms chunks at --speed times real
+time (0 for as fast as possible) and then sends END. Fixtures follow the
+bench_voice naming, so accuracy is reported for files named after their card
+numbers.
+
+Result latency is measured from the last audio the client sent before the
+result to the result itself: the time the server adds on top of the speech.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import REPO_ROOT, metadata, save_results, summarize
+
+import NetProtocol as proto
+import VoiceServer
+from AudioSource import SAMPLE_RATE, SAMPLE_WIDTH, CHANNEL_COUNT, WavFile
+from Transcribe import expected_numbers, find_recordings
+
+
+CHUNK_BYTES = SAMPLE_RATE // 10 * SAMPLE_WIDTH * CHANNEL_COUNT
+
+
+def load_fixtures(wav_dir):
+    fixtures = []
+    for path in find_recordings([wav_dir]):
+        if path.lower().endswith('.wav'):
+            with WavFile(path) as wav:
+                fixtures.append((path, wav.read_all(), expected_numbers(path)))
+    return fixtures
+
+
+async def read_result(reader):
+    """The next RESULT and when it arrived."""
+    while True:
+        kind, payload = await proto.read_message(reader)
+        if kind == VoiceServer.RESULT:
+            return VoiceServer.decode_result(payload), time.perf_counter()
+        if kind == VoiceServer.ERROR:
+            raise ConnectionError(f"voice server error {payload[0]}")
+
+
+async def play_stream(reader, writer, number, audio, max_number, speed, stats):
+    """One utterance: stream the audio until the server answers. Returns the card numbers heard."""
+    writer.write(VoiceServer.encode_start(number, max_number, 2))
+    result = asyncio.ensure_future(read_result(reader))
+    started = time.perf_counter()
+    sent = 0
+    last_send = started
+    for offset in range(0, len(audio), CHUNK_BYTES):
+        if result.done():
+            break
+        chunk = audio[offset:offset + CHUNK_BYTES]
+        writer.write(VoiceServer.encode_audio(chunk))
+        await writer.drain()
+        last_send = time.perf_counter()
+        sent += len(chunk)
+        if speed:
+            # Sleep until this much audio would have been spoken
+            delay = started + sent / (SAMPLE_RATE * SAMPLE_WIDTH * CHANNEL_COUNT) / speed - time.perf_counter()
+            await asyncio.sleep(max(delay, 0))
+        else:
+            await asyncio.sleep(0)
+    if not result.done():
+        writer.write(VoiceServer.encode_end())
+        await writer.drain()
+        last_send = time.perf_counter()
+    (stream, numbers, _), received = await result
+    stats['latency_ms'].append(max(received - last_send, 0.0) * 1000)
+    if stream != number:
+        stats['errors'] += 1
+    return numbers
+
+
+async def run_client(socket_path, fixtures, next_fixture, max_number, speed, stats):
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    number = 0
+    try:
+        while True:
+            index = next_fixture()
+            if index is None:
+                return
+            path, audio, expected = fixtures[index % len(fixtures)]
+            number = (number + 1) & 0xFFFF
+            numbers = await play_stream(reader, writer, number, audio, max_number, speed, stats)
+            stats['decoded'] += 1
+            if expected:
+                stats['labelled'] += 1
+                stats['correct'] += numbers == expected
+    finally:
+        writer.close()
+
+
+async def run_load(socket_path, fixtures, streams, total, max_number, speed):
+    stats = {'decoded': 0, 'labelled': 0, 'correct': 0, 'errors': 0, 'latency_ms': []}
+    counter = iter(range(total))
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(socket_path, fixtures, lambda: next(counter, None), max_number, speed, stats)
+                           for _ in range(streams)))
+    seconds = time.perf_counter() - start
+    audio_s = sum(len(fixtures[i % len(fixtures)][1]) for i in range(total)) / (SAMPLE_RATE * SAMPLE_WIDTH)
+    return {
+        'streams': streams,
+        'total': total,
+        'speed': speed,
+        'seconds': seconds,
+        'decoded': stats['decoded'],
+        'streams_per_second': stats['decoded'] / seconds if seconds else 0.0,
+        'audio_seconds': audio_s,
+        'times_real_time': audio_s / seconds if seconds else 0.0,
+        'result_latency_ms': summarize(stats['latency_ms']),
+        'accuracy': stats['correct'] / stats['labelled'] if stats['labelled'] else None,
+        'errors': stats['errors'],
+    }
+
+
+def spawn_server(socket_path, workers, model_path, timeout=120):
+    command = [sys.executable, 'VoiceServer.py', '--socket', socket_path]
+    if workers:
+        command += ['--workers', str(workers)]
+    if model_path:
+        command += ['--model', model_path]
+    server = subprocess.Popen(command, cwd=REPO_ROOT, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout  # every worker loads the model first
+    while not os.path.exists(socket_path):
+        if server.poll() is not None or time.monotonic() > deadline:
+            server.kill()
+            raise RuntimeError("voice server did not start")
+        time.sleep(0.05)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--wav-dir', required=True, help="16 kHz mono 16-bit WAV fixtures")
+    parser.add_argument('--socket', help="use the VoiceServer already listening here")
+    parser.add_argument('--workers', type=int, default=None, help="workers of the spawned server")
+    parser.add_argument('--model', default=None, help="VOSK model directory for the spawned server")
+    parser.add_argument('--streams', type=int, default=32, help="concurrent streams")
+    parser.add_argument('--total', type=int, default=256, help="streams to decode in all")
+    parser.add_argument('--speed', type=float, default=1.0, help="times real time to send audio at (0: no pacing)")
+    parser.add_argument('--max-number', type=int, default=16)
+    parser.add_argument('--output', help="write results to this JSON file")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.wav_dir)
+    if not fixtures:
+        parser.error(f"no WAV files in {args.wav_dir}")
+    socket_dir = None
+    server = None
+    socket_path = args.socket
+    if socket_path is None:
+        socket_dir = tempfile.mkdtemp(prefix='voice_server_')
+        socket_path = os.path.join(socket_dir, 'voice.sock')
+        server = spawn_server(socket_path, args.workers, args.model)
+    try:
+        result = asyncio.run(run_load(socket_path, fixtures, args.streams, args.total, args.max_number, args.speed))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if socket_dir is not None:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            os.rmdir(socket_dir)
+    result['workers'] = args.workers or os.cpu_count()
+    result['fixtures'] = len(fixtures)
+
+    latency = result['result_latency_ms']
+    accuracy = f", accuracy {result['accuracy']:.1%}" if result['accuracy'] is not None else ""
+    print(f"{result['decoded']} streams ({result['streams']} at a time, {result['fixtures']} fixtures) "
+          f"on {result['workers']} workers in {result['seconds']:.1f} s: "
+          f"{result['streams_per_second']:.1f} streams/s, {result['times_real_time']:.1f}x real time, "
+          f"result latency p50 {latency['p50_ms']:.0f} ms p99 {latency['p99_ms']:.0f} ms{accuracy}")
+    if args.output:
+        save_results({'meta': metadata(), 'voice_server': result}, args.output)
+
+
+if __name__ == "__main__":
+    main()
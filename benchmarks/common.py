@@ -0,0 +1,53 @@
+"""Shared helpers for the benchmark scripts.
+
+Importing this module points SDL at its dummy video and audio drivers, so it
+must be imported before anything that initializes pygame.
+"""
+import json
+import os
+import platform
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from FrameStats import FrameStats  # noqa: E402
+
+
+def summarize(samples_ms):
+    """p50/p95/p99/max of a list of millisecond samples."""
+    return FrameStats().summary(list(samples_ms))
+
+
+def metadata():
+    import pygame
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'video_driver': os.environ.get('SDL_VIDEODRIVER'),
+    }
+
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def parse_board_sizes(text):
+    sizes = []
+    for item in text.split(','):
+        rows, cols = item.lower().split('x')
+        sizes.append((int(rows), int(cols)))
+    return sizes
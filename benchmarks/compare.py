@@ -0,0 +1,46 @@
+"""Compare two benchmark JSON files metric by metric.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+
+from benchmarks.common import load_results
+
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(before, after, threshold=0.0):
+    """Rows of (metric, before, after, relative change) for metrics present in both runs."""
+    old = flatten({k: v for k, v in before.items() if k != 'meta'})
+    new = flatten({k: v for k, v in after.items() if k != 'meta'})
+    rows = []
+    for name in sorted(old.keys() & new.keys()):
+        change = (new[name] - old[name]) / old[name] if old[name] else 0.0
+        if abs(change) >= threshold:
+            rows.append((name, old[name], new[name], change))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=0.05,
+                        help="only show metrics that changed by at least this fraction")
+    args = parser.parse_args()
+
+    for name, old, new, change in compare(load_results(args.before), load_results(args.after), args.threshold):
+        print(f"{name:60} {old:12.4f} -> {new:12.4f}  {change:+.1%}")
+
+
+if __name__ == "__main__":
+    main()
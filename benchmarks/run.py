@@ -0,0 +1,33 @@
+"""Run the game and voice benchmarks and save one JSON file.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.compare old.json bench.json
+"""
+import argparse
+
+from benchmarks.common import metadata, parse_board_sizes, save_results
+from benchmarks import bench_game, bench_voice
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default=','.join(bench_game.MODES))
+    parser.add_argument('--sizes', default='4x4,10x10,30x30')
+    parser.add_argument('--max-frames', type=int, default=5000)
+    parser.add_argument('--no-alloc', action='store_true')
+    parser.add_argument('--wav-dir')
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    results = {
+        'meta': metadata(),
+        'game': bench_game.run(args.modes.split(','), parse_board_sizes(args.sizes),
+                               args.max_frames, not args.no_alloc),
+        'voice': bench_voice.run(args.wav_dir),
+    }
+    save_results(results, args.output)
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
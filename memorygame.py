@@ -1,32 +1,91 @@
 # Refactoring the memory game code into a class-based approach with improved structure and logic
 
-import pygame
+import time
+STARTED = time.perf_counter()  # for the time-to-first-frame report
 
-pygame.init()
+import pygame
 
+import argparse
+import math
+import os
 import random
 from GameState import GameState
 from GUI import GUI
-from Card import Card
-import VoiceControl
+from Card import Card, CardDeck
+from Engine import Board, INVALID, MATCH, MISMATCH
+from CpuOpponent import CpuOpponent
+from Layout import BoardLayout
+from Theme import ThemeCache
+from VoiceService import VoiceService
+from AudioSource import open_source
+from Scheduler import Scheduler
+from FrameStats import FrameStats
+from Profiler import Profiler
+from Animation import Animator
+from StatsStore import StatsStore, DEFAULT_PATH as STATS_PATH
+from Replay import ReplayRecorder, REPLAY_DIR, MODE, SELECT, VOICE, RESET, ROUND
+import Snapshot
+from Snapshot import SnapshotStore
+
+IMPORTED = time.perf_counter()
 
 
 
 class MemGame:
+    FPS = 60
+    UPDATE_STEP_MS = 1000 / 60
+    PREPARE_BUDGET_MS = 4  # time per update step spent rendering animation frames after resuming a game
+    MAX_UPDATE_STEPS = 5
+    MISMATCH_REVEAL_MS = 500
+    CPU_PLAYER = 1
+    CPU_MOVE_DELAY_MS = 700
+    # A small mixer buffer keeps the match sounds in step with the flip
+    MIXER_FREQUENCY = 44100
+    MIXER_BUFFER = 512
+    # --mode name -> state
+    MODES = {
+        'single': GameState.SINGLE_PLAYER,
+        'two-players': GameState.TWO_PLAYERS,
+        'time-attack': GameState.TIME_ATTACK_MODE,
+        'vs-cpu': GameState.VS_CPU,
+        'voice': GameState.VOICE_CONTROL,
+    }
+    MODE_NAMES = {state: name for name, state in MODES.items()}
+    # States that show a running clock, so the screen changes every second
+    TIMED_STATES = (GameState.SINGLE_PLAYER, GameState.TWO_PLAYERS, GameState.VS_CPU,
+                    GameState.VOICE_CONTROL, GameState.TIME_ATTACK_MODE)
+    # Longest an idle loop sleeps even when nothing is due
+    IDLE_MAX_MS = 1000
+    # Posted from the voice thread to wake an idle loop
+    VOICE_EVENT = pygame.event.custom_type()
+    LEADERBOARD_SIZE = 10
 
-    def __init__(self):   
+    def __init__(self, rows=GUI.BOARD_ROWS, cols=GUI.BOARD_COLS, theme=None, seed=None, window_size=None,
+                 fullscreen=False):
+        # Ask Windows for real pixels on scaled (HiDPI) displays instead of a blurry upscale
+        os.environ.setdefault('SDL_WINDOWS_DPI_AWARENESS', 'permonitorv2')
+        pygame.mixer.pre_init(self.MIXER_FREQUENCY, -16, 2, self.MIXER_BUFFER)
+        pygame.init()
         pygame.display.set_caption('Memory Game')
         self.game_state = GameState.PLAYER_SELECTION
-        self.player_scores = [0, 0]  # Scores for player 1 and player 2
-        self.current_player = 0  # Index of the current player
-        self.num_players = 1  # Default to single player game
         self.cards_deck = []
         self.card_images = []
-        self.selected_cards = []
-        self.gui = GUI(self)
+        self.gui = GUI(self, window_size, fullscreen)
+        self.voice_service = VoiceService()
+        # All rules, scores and tries live in the headless engine; the cards
+        # below only mirror its flags for drawing. Every deal comes from the
+        # seed, so a recorded game replays onto the same boards.
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.board = Board(rows, cols, seed=self.seed)
+        self.layout = self.board_layout()
+        self.cursor = None
+        self.cpu = None
+        self.cpu_level = 'hard'
+        self.cpu_handle = None
+        self.theme_cache = ThemeCache()
+        self.theme_source = theme
+        self.animator = Animator(GUI.BACKGROUND_COLOR)
         
-        self.matched_cards = 0
-        self.match_tries_count = 0
         self.load_card_images()
         self.fill_cards_deck()
         self.update_player_turn_text()
@@ -35,142 +94,301 @@ class MemGame:
         self.clock = pygame.time.Clock()
         self.start_ticks = 0
         self.elapsed_time = 0
+
+        self.scheduler = Scheduler()
+        self.hide_mismatch_handle = None
+        self.prepare_handle = None
+        self.game_over_result = None
+        self.drawn_state = None
+        self.update_accumulator = 0
+        self.last_update_ticks = 0
+        self.frame_stats = FrameStats()
+        self.idle_event = None
+        self.input_events = 0
+        self.last_poll_time = 0
+        self.profiler = Profiler(self)
+        self.warm_up_voice = True
+        # Voice mode listens all the time instead of on each Speak click
+        self.hands_free = False
+        self.last_present_time = 0
+        self.recorder = None
+        self.replaying = False
+        self.stats = None
+        self.leaderboard_mode = 'single'
+        self.leaderboard_lines = []
+        self.leaderboard_load_ms = 0
+        # The game in progress is saved after every move (see Snapshot)
+        self.snapshots = None
+        self.can_resume = False
+
+
+    @property
+    def num_players(self):
+        return self.board.num_players
+
+    @num_players.setter
+    def num_players(self, value):
+        self.board.set_num_players(value)
+
+    @property
+    def player_scores(self):
+        return self.board.scores
+
+    @property
+    def current_player(self):
+        return self.board.current_player
+
+    @property
+    def match_tries_count(self):
+        return self.board.tries
+
+    @property
+    def matched_cards(self):
+        return self.board.matched_count
             
+    def board_layout(self):
+        # Cards grow with the window, from 100px at the 800x700 design size
+        return BoardLayout(self.board.rows, self.board.cols, self.gui.BOARD_AREA, round(Card.CARD_SIZE * self.gui.scale))
+
+    def resize(self, width, height):
+        """Lay everything out again for a new screen size.
+
+        Faces, backs, animation frames and labels are cached per size, so this
+        is the only place that renders anything new for the size, and going
+        back to a recent size renders nothing.
+        """
+        self.gui.layout(width, height)
+        self.profiler.place_overlay()
+        self.layout = self.board_layout()
+        self.animator.clear()
+        self.load_card_images()
+        self.cards_deck.relayout(self.card_images, self.layout)
+        if self.game_state != GameState.PLAYER_SELECTION:
+            self.prepare_animations()
+        self.update_player_turn_text()
+
+    def toggle_fullscreen(self):
+        self.resize(*self.gui.toggle_fullscreen())
+
     def fill_cards_deck(self):
-        board_rows = self.gui.BOARD_ROWS
-        board_cols = self.gui.BOARD_COLS
-        card_size = Card.CARD_SIZE
-        card_gap = self.gui.CARD_GAP 
-        card_images = self.card_images * 2  # Create pairs
-        random.shuffle(card_images)
-        y_offset = 60
-        index = 1
-        for row in range(board_rows):
-            for col in range(board_cols):
-                position = (
-                    col * (card_size + card_gap) + card_gap,
-                    row * (card_size + card_gap) + card_gap + y_offset,)
-                card = Card(card_images.pop(), position, index)
-                index += 1
-                self.cards_deck.append(card)
+        # Cards are only created when first clicked, flipped or animated (see CardDeck)
+        self.cards_deck = CardDeck(self.board, self.card_images, self.layout)
+
+    def prepare_animations(self):
+        """Render the animation frames for the cards on the board. Cheap when they are already cached."""
+        self.scheduler.cancel(self.prepare_handle)
+        self.prepare_handle = None
+        self.animator.prepare(self.card_images, self.cards_deck, self.layout.card_size)
+
+    def prepare_animations_later(self):
+        """prepare_animations() a few milliseconds per update step, starting with the next one,
+        so a big board is on screen and playable at once. Until then cards just don't animate."""
+        self.scheduler.cancel(self.prepare_handle)
+        steps = self.animator.preparing(self.card_images, self.cards_deck, self.layout.card_size)
+        self.prepare_handle = self.scheduler.call_later(self.ticks(), math.ceil(self.UPDATE_STEP_MS),
+                                                        self.continue_preparing, steps)
+
+    def continue_preparing(self, steps):
+        deadline = time.perf_counter() + self.PREPARE_BUDGET_MS / 1000
+        for _ in steps:
+            if time.perf_counter() > deadline:
+                self.prepare_handle = self.scheduler.call_later(self.ticks(), math.ceil(self.UPDATE_STEP_MS),
+                                                                self.continue_preparing, steps)
+                return
+        self.prepare_handle = None
 
     def load_card_images(self):
-        """Load and return card images. For simplicity, using colored surfaces."""
-        colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0),
-                  (255, 165, 0), (255, 20, 147), (0, 255, 255), (128, 0, 128)]
-        self.card_images = [pygame.Surface((Card.CARD_SIZE, Card.CARD_SIZE)) for _ in range(8)]
-        for i, card_image in enumerate(self.card_images):
-            card_image.fill(colors[i])
+        """Load card faces from the current theme, topped up with plain ones (see ThemeCache.plain_theme).
+
+        Themes are cached, so resets and Time Attack rounds never decode twice.
+        """
+        card_size = self.layout.card_size
+        count = self.board.size // 2
+        faces = []
+        if self.theme_source:
+            faces = self.theme_cache.image_theme(self.theme_source, card_size).faces(count)
+        if len(faces) < count:
+            plain = self.theme_cache.plain_theme(card_size, count).faces(count)
+            faces = faces + plain[len(faces):] if faces else plain
+        self.card_images = faces
+
+    def set_theme(self, source):
+        """Switch card art (None for plain colors) without reshuffling the board."""
+        self.theme_source = source
+        self.load_card_images()
+        self.cards_deck.relayout(self.card_images, self.layout)
+        self.animator.clear()
+        self.prepare_animations()
+        self.gui.invalidate()
     
     def update_player_turn_text(self):
         """Updates the player turn text based on the current player."""   
         # Ensuring the player turn text updates correctly
         turn_text = f"Player {self.current_player + 1}'s Turn"
-        self.gui.player_turn_text_surf = self.gui.font.render(turn_text, True, (255, 255, 255))
+        if self.cpu is not None and self.current_player == self.CPU_PLAYER:
+            turn_text = "Computer's Turn"
+        self.gui.player_turn_text_surf = self.gui.render_text(turn_text)
+
+    def ticks(self):
+        """Game clock in ms. A replay swaps in its own clock here."""
+        return pygame.time.get_ticks()
+
+    def record(self, kind, arg=0):
+        if self.recorder is not None:
+            self.recorder.record(self.ticks(), kind, arg)
 
-    def toggle_player_turn(self):
-        self.current_player = (self.current_player + 1) % self.num_players
-        self.update_player_turn_text()
-        
     def all_matched(self):
-        return self.matched_cards == 16
+        return self.board.is_complete()
     
-    def update_cursor(self):
-        should_be_hand = any(self.is_hovering(button) for button in self.get_current_buttons())
+    def update_cursor(self, position):
+        """Called on mouse motion and clicks only; touches the OS cursor when it actually changes."""
+        should_be_hand = any(button.collidepoint(position) for button in self.get_current_buttons())
 
-        if self.game_state != GameState.VOICE_CONTROL and self.game_state != GameState.PLAYER_SELECTION:
+        if self.game_state not in (GameState.VOICE_CONTROL, GameState.PLAYER_SELECTION, GameState.LEADERBOARD):
             if not should_be_hand:
-                should_be_hand = any(self.is_hovering(card.rect) for card in self.cards_deck if not card.matched)
+                index = self.layout.index_at(position)
+                should_be_hand = index is not None and not self.board.is_matched(index)
 
-        pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_HAND if should_be_hand else pygame.SYSTEM_CURSOR_ARROW)
+        cursor = pygame.SYSTEM_CURSOR_HAND if should_be_hand else pygame.SYSTEM_CURSOR_ARROW
+        if cursor != self.cursor:
+            self.cursor = cursor
+            try:
+                pygame.mouse.set_cursor(cursor)
+            except pygame.error:
+                pass  # no system cursors, e.g. on the dummy video driver
 
     def get_current_buttons(self):
         buttons = []
         if self.game_state == GameState.PLAYER_SELECTION:
-            buttons.extend(self.gui.player_selection_buttons)
+            buttons.extend(button for button in self.gui.player_selection_buttons
+                           if self.can_resume or button is not self.gui.RESUME_BUTTON_RECT)
         if self.game_state == GameState.VOICE_CONTROL:
             buttons.extend(self.gui.voice_control_buttons)
         if self.game_state == GameState.GAME_OVER:
             buttons.extend(self.gui.game_over_buttons)
+        if self.game_state == GameState.LEADERBOARD:
+            buttons.extend(self.gui.leaderboard_buttons)
 
         buttons.append(self.gui.RESET_BUTTON_RECT)  # Always include the reset button
 
         return buttons
     
-    def is_hovering(self, rect):
-        """Checks if the mouse is hovering over the given rectangle."""
-        return rect.collidepoint(pygame.mouse.get_pos())
-
     def handle_card_selection(self, position):
-        for card in self.cards_deck:
-            if card.rect.collidepoint(position) and not card.matched and not card.visible:
-                self.make_card_visible(card)
-                if len(self.selected_cards) == 2:
-                    self.process_selected_cards()
+        if self.cpu is not None and self.current_player == self.CPU_PLAYER:
+            return
+        index = self.layout.index_at(position)
+        if index is not None:
+            self.select_card(self.cards_deck[index])
                     
     def handle_voice_selection(self):
-        model = VoiceControl.init_vosk_model()
-        number = VoiceControl.recognize_numbers_from_mic(model)
-        
-        for card in self.cards_deck:
-            if card.index == number and not card.matched and not card.visible:
-                self.make_card_visible(card)
-                if len(self.selected_cards) == 2:
-                    self.process_selected_cards()
-                   
-    def make_card_visible(self, card):
-        card.visible = True
-        self.selected_cards.append(card)
-
-    def process_selected_cards(self):
-        match_found = self.check_for_match()
-        if not match_found:
-            self.toggle_player_turn()
-        self.match_tries_count += 1
-        self.selected_cards.clear()
-
-    def check_for_match(self):
-        if self.selected_cards[0].image == self.selected_cards[1].image:
-            self.set_cards_as_matched()
-            return True
+        # With the first card of a pair already up, only its partner is left to name
+        self.voice_service.request_numbers(1 if self.board.selected else 2)
+
+    def toggle_hands_free(self):
+        self.hands_free = not self.hands_free
+        self.voice_service.hands_free = self.hands_free
+        if not self.hands_free:
+            self.voice_service.cancel()
+
+    def handle_voice_result(self):
+        numbers = self.voice_service.poll()
+        if numbers is None:
+            return
+
+        # "three and eleven" flips both cards of the turn in spoken order
+        for number in numbers:
+            self.record(VOICE, min(number, 0xFFFFFFFF))  # the event argument is a uint32
+            if 1 <= number <= len(self.cards_deck):
+                self.select_card(self.cards_deck[number - 1])
+
+    def select_card(self, card):
+        """Flip a card through the engine and react to the outcome."""
+        self.scheduler.cancel(self.hide_mismatch_handle)
+        index = card.index - 1
+        self.record(SELECT, index)
+        first = self.board.selected[0] if self.board.selected else None
+        result = self.board.step(index)
+        self.sync_cards()
+        if self.cpu is not None and result != INVALID:
+            self.cpu.observe(index)
+            if result == MATCH:
+                self.cpu.matched(first, index)
+        if result in (MATCH, MISMATCH):
+            self.process_selected_cards(result)
+        self.schedule_cpu_move()
+        self.save_snapshot()
+
+    def schedule_cpu_move(self):
+        # A replay has the computer's moves in the log already
+        if self.cpu is None or self.cpu_handle is not None or self.all_matched() or self.replaying:
+            return
+        if self.current_player == self.CPU_PLAYER:
+            self.cpu_handle = self.scheduler.call_later(
+                self.ticks(), self.CPU_MOVE_DELAY_MS, self.cpu_move)
+
+    def cpu_move(self):
+        self.cpu_handle = None
+        if self.board.selected:
+            index = self.cpu.choose_second(self.board.selected[0])
         else:
-            self.handle_no_match_found()
-            return False
+            index = self.cpu.choose_first()
+        self.select_card(self.cards_deck[index])
 
-    def set_cards_as_matched(self):
-        for card in self.selected_cards:
-            card.matched = True
-        self.player_scores[self.current_player] += 1
-        self.gui.match_sound.play()
-        self.matched_cards += 2
+    def sync_cards(self):
+        """Copy the engine flags of the cards touched by the last step onto the sprites, animating the changes."""
+        now = self.ticks()
+        for i in self.board.changed:
+            card = self.cards_deck[i]
+            visible = self.board.is_visible(i)
+            matched = self.board.is_matched(i)
+            if visible != card.visible:
+                self.animator.flip(card, visible, now)
+            if matched and not card.matched:
+                self.animator.match(card, now)
+            card.visible = visible
+            card.matched = matched
+
+    def process_selected_cards(self, result):
+        if result == MATCH:
+            self.gui.match_sound.play()
+        else:
+            self.handle_no_match_found()
+            self.update_player_turn_text()
 
     def handle_no_match_found(self):
-        if self.game_state == GameState.TIME_ATTACK_MODE:
-            self.attack_mode_logic()
-        elif self.game_state == GameState.VOICE_CONTROL:
-            self.voice_control_logic()
-        else:    
-            self.regular_game_logic()
-            
-        pygame.display.flip()
         self.gui.unmatch_sound.play()
-        pygame.time.wait(500)  # Wait half a second
-        for card in self.selected_cards:
-            card.visible = False
+        for i in self.board.pending:
+            self.animator.mismatch(self.cards_deck[i], self.ticks())
+        # Leave both cards face up for a moment; the scheduler flips them back
+        # while the loop keeps handling input and drawing.
+        self.hide_mismatch_handle = self.scheduler.call_later(
+            self.ticks(), self.MISMATCH_REVEAL_MS, self.hide_mismatched_cards)
+
+    def hide_mismatched_cards(self):
+        """Flip the last mismatched pair back. Runs early if the player clicks on."""
+        self.scheduler.cancel(self.hide_mismatch_handle)
+        self.hide_mismatch_handle = None
+        self.board.conceal()
+        self.sync_cards()
                  
     def reset_game(self):
         """Resets the game to the initial state."""
-        self.cards_deck.clear()
-        self.selected_cards.clear()
-        self.matched_cards = 0
-        self.match_tries_count = 0
-        self.player_scores = [0, 0]
-        self.current_player = 0
+        self.animator.clear()
+        self.board.reset()
+        self.scheduler.clear()
+        self.hide_mismatch_handle = None
+        self.prepare_handle = None
+        self.cpu_handle = None
+        self.cpu = None
+        self.game_over_result = None
         self.load_card_images()
         self.fill_cards_deck()
-        self.start_ticks = pygame.time.get_ticks()
+        if self.game_state != GameState.PLAYER_SELECTION:
+            self.prepare_animations()
+        self.start_ticks = self.ticks()
         self.elapsed_time = 0
         Card.current_card_index = 0
+        self.gui.invalidate()
         
         if self.game_state == GameState.PLAYER_SELECTION:
             self.update_player_turn_text()
@@ -179,47 +397,198 @@ class MemGame:
     def handle_player_selection(self, position):
         
         if self.gui.ONE_PLAYER_BUTTON_RECT.collidepoint(position):
-            self.num_players = 1
-            self.game_state = GameState.SINGLE_PLAYER
+            self.start_mode(GameState.SINGLE_PLAYER)
         elif self.gui.TWO_PLAYER_BUTTON_RECT.collidepoint(position):
-            self.num_players = 2
-            self.game_state = GameState.TWO_PLAYERS
+            self.start_mode(GameState.TWO_PLAYERS)
         elif self.gui.TIME_ATTACK_BUTTON_RECT.collidepoint(position):
-            self.num_players = 1
-            self.game_state = GameState.TIME_ATTACK_MODE
+            self.start_mode(GameState.TIME_ATTACK_MODE)
         elif self.gui.VOICE_CONTROL_BUTTON_RECT.collidepoint(position):
-            self.num_players = 1
-            self.game_state = GameState.VOICE_CONTROL
+            self.start_mode(GameState.VOICE_CONTROL)
+        elif self.gui.VS_CPU_BUTTON_RECT.collidepoint(position):
+            self.start_mode(GameState.VS_CPU)
+        elif self.gui.LEADERBOARD_BUTTON_RECT.collidepoint(position):
+            self.game_state = GameState.LEADERBOARD
+            self.load_leaderboard()
+        elif self.can_resume and self.gui.RESUME_BUTTON_RECT.collidepoint(position):
+            self.resume_game()
+            return
+        elif self.gui.CPU_LEVEL_BUTTON_RECT.collidepoint(position):
+            levels = CpuOpponent.LEVELS
+            self.cpu_level = levels[(levels.index(self.cpu_level) + 1) % len(levels)]
+            if self.cpu_level == 'hard':
+                import StrategyTable
+                StrategyTable.warm_up(self.board.size)
             
-        self.start_ticks = pygame.time.get_ticks()
+        self.start_ticks = self.ticks()
+
+    def start_mode(self, state):
+        """Leave the menu for a game mode, from a menu click or --mode."""
+        self.num_players = 2 if state in (GameState.TWO_PLAYERS, GameState.VS_CPU) else 1
+        self.enter_mode(state)
+        self.prepare_animations()
+
+    def enter_mode(self, state):
+        self.game_state = state
+        self.record(MODE, state.value)
+        if state == GameState.VOICE_CONTROL and not self.replaying:
+            self.voice_service.on_change = self.wake
+            self.voice_service.hands_free = self.hands_free
+            self.voice_service.set_max_number(self.board.size)
+            self.voice_service.start()
+        elif state == GameState.VS_CPU:
+            self.cpu = CpuOpponent(self.board, self.cpu_level)
+        self.start_ticks = self.ticks()
             
     def handle_events(self):
-        for event in pygame.event.get():
+        events = pygame.event.get()
+        if self.idle_event is not None:
+            # The event that ended an idle wait comes first
+            events.insert(0, self.idle_event)
+            self.idle_event = None
+        new_size = None
+        for event in events:
             if event.type == pygame.QUIT:
                 return False
-            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            elif event.type == pygame.VIDEORESIZE:
+                new_size = event.size  # dragging a window edge sends many; only the last one counts
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.profiler.toggle()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
+                self.toggle_fullscreen()
+            elif event.type == pygame.MOUSEMOTION:
+                self.update_cursor(event.pos)
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and not self.replaying:
+                self.input_events += 1
                 self.process_mouse_click(event.pos)
+                self.update_cursor(event.pos)
+        if new_size is not None and new_size != (self.gui.SCREEN_WIDTH, self.gui.SCREEN_HEIGHT):
+            self.resize(*new_size)
         return True
     
     def process_mouse_click(self, mouse_pos):
         if self.game_state == GameState.PLAYER_SELECTION:
             self.handle_player_selection(mouse_pos)
+
+        elif self.game_state == GameState.LEADERBOARD:
+            self.handle_leaderboard_click(mouse_pos)
             
         elif self.gui.RESET_BUTTON_RECT.collidepoint(mouse_pos):
-            self.game_state = GameState.PLAYER_SELECTION
-            self.reset_game()    
+            self.back_to_menu()
             
         elif self.gui.PLAY_AGAIN_BUTTON_RECT.collidepoint(mouse_pos) and self.game_state == GameState.GAME_OVER:
-            self.game_state = GameState.PLAYER_SELECTION
-            self.reset_game()
+            self.back_to_menu()
             
-        elif self.game_state in (GameState.SINGLE_PLAYER, GameState.TIME_ATTACK_MODE, GameState.TWO_PLAYERS):
+        elif self.game_state in (GameState.SINGLE_PLAYER, GameState.TIME_ATTACK_MODE, GameState.TWO_PLAYERS, GameState.VS_CPU):
             self.handle_card_selection(mouse_pos)
             
         elif self.game_state == GameState.VOICE_CONTROL:
             if self.gui.SPEAK_BUTTON_RECT.collidepoint(mouse_pos):
                     self.handle_voice_selection()
+            elif self.gui.HANDS_FREE_BUTTON_RECT.collidepoint(mouse_pos):
+                self.toggle_hands_free()
                           
+    def back_to_menu(self):
+        """Reset or Play Again: deal a new board and return to the menu."""
+        self.record(RESET)
+        self.voice_service.pause()
+        self.game_state = GameState.PLAYER_SELECTION
+        self.reset_game()
+
+    def save_snapshot(self):
+        """Hand the game in progress to the background writer; a few bytes a card."""
+        if self.snapshots is None or self.replaying or self.game_state not in self.MODE_NAMES:
+            return
+        self.snapshots.save(Snapshot.encode(self.board, self.game_state.value, self.time_attack_round_duration,
+                                            self.ticks() - self.start_ticks, self.seed))
+        self.can_resume = True
+
+    def resume_game(self):
+        """Put the saved game back as it was left. False if there is none or it cannot be read."""
+        try:
+            snapshot = self.snapshots.load() if self.snapshots is not None else None
+            if snapshot is not None:
+                state = GameState(snapshot.state)
+                board = Board(snapshot.rows, snapshot.cols, len(snapshot.scores), seed=snapshot.seed, deal=False)
+                board.restore(snapshot.pairs, snapshot.flags, snapshot.scores, snapshot.current_player,
+                              snapshot.tries)
+        except ValueError as e:
+            print(f"saved game not restored: {e}")
+            snapshot = None
+        if snapshot is None or state not in self.MODE_NAMES:
+            # Nothing to resume after all: take the button off the menu
+            self.can_resume = False
+            self.gui.invalidate()
+            return False
+        if self.recorder is not None:
+            # A replay log rebuilds its boards from the seed; a restored board is not one of them
+            self.recorder.close()
+            print(f"replay log written to {self.recorder.path} (not recorded after resuming)")
+            self.recorder = None
+
+        self.voice_service.pause()
+        self.animator.clear()
+        self.scheduler.clear()
+        self.hide_mismatch_handle = None
+        self.prepare_handle = None
+        self.cpu_handle = None
+        self.cpu = None
+        self.game_over_result = None
+        self.seed = snapshot.seed
+        self.board = board
+        self.time_attack_round_duration = snapshot.round_duration
+        self.layout = self.board_layout()
+        self.load_card_images()
+        self.fill_cards_deck()  # face-up and matched cards come from the restored flags
+        self.enter_mode(state)
+        if self.cpu is not None:
+            self.cpu.restore()
+        self.start_ticks = self.ticks() - snapshot.elapsed_ms
+        self.update_player_turn_text()
+        self.gui.invalidate()
+        self.prepare_animations_later()
+        self.schedule_cpu_move()
+        return True
+
+    def handle_leaderboard_click(self, position):
+        if self.gui.BACK_BUTTON_RECT.collidepoint(position):
+            self.game_state = GameState.PLAYER_SELECTION
+        elif self.gui.LEADERBOARD_MODE_BUTTON_RECT.collidepoint(position):
+            modes = list(self.MODES)
+            self.leaderboard_mode = modes[(modes.index(self.leaderboard_mode) + 1) % len(modes)]
+            self.load_leaderboard()
+            self.gui.invalidate()
+
+    def load_leaderboard(self):
+        """Query the best results for the shown mode and this board size. An index scan, so it takes milliseconds."""
+        start = time.perf_counter()
+        rows, cols = self.board.rows, self.board.cols
+        lines = []
+        if self.stats is None:
+            lines.append("Stats are not being saved (--no-stats)")
+        elif self.leaderboard_mode == 'time-attack':
+            for i, (elapsed_ms, tries, duration, played_at) in enumerate(
+                    self.stats.round_leaderboard(rows, cols, self.LEADERBOARD_SIZE)):
+                lines.append(f"{i + 1:2}.  {elapsed_ms / 1000:5.1f} s of {duration} s   {tries} tries   "
+                             f"{time.strftime('%Y-%m-%d', time.localtime(played_at))}")
+        else:
+            for i, (tries, elapsed_ms, result, winner, played_at) in enumerate(
+                    self.stats.leaderboard(self.leaderboard_mode, rows, cols, self.LEADERBOARD_SIZE)):
+                line = f"{i + 1:2}.  {tries} tries   {self.gui.format_time(elapsed_ms // 1000)}"
+                if winner is not None:
+                    line += f"   won by player {winner}"
+                lines.append(line + f"   {time.strftime('%Y-%m-%d', time.localtime(played_at))}")
+        if self.stats is not None and not lines:
+            lines.append("No results yet")
+        self.leaderboard_lines = lines
+        self.leaderboard_load_ms = (time.perf_counter() - start) * 1000
+
+    def draw_leaderboard_components(self):
+        title = f"Best {self.leaderboard_mode} games on {self.board.rows}x{self.board.cols}"
+        if self.leaderboard_mode == 'time-attack':
+            title = f"Fastest Time Attack rounds on {self.board.rows}x{self.board.cols}"
+        self.gui.draw_leaderboard(title, self.leaderboard_lines, f"loaded in {self.leaderboard_load_ms:.1f} ms",
+                                  self.leaderboard_mode)
+
     def draw_regular_game_components(self):
         self.gui.draw_board(self.cards_deck)
         self.gui.draw_timer()
@@ -236,69 +605,308 @@ class MemGame:
         self.gui.draw_board(self.cards_deck)
         self.gui.draw_timer()
         self.gui.draw_tries_counter()
-        self.gui.draw_speak_button()
+        self.gui.draw_speak_button(self.voice_service.listening)
+        self.gui.draw_hands_free_button(self.hands_free)
         if(not self.all_matched()):
            self.gui.draw_reset_button()
-        
-    def attack_mode_logic(self):
-        
+
+    def draw_attack_mode_components(self):
         self.gui.draw_board(self.cards_deck)
         self.gui.draw_reset_button()
-        if(self.gui.draw_countdown_timer(self.elapsed_time, self.time_attack_round_duration)):
+        self.gui.draw_countdown_timer(self.elapsed_time, self.time_attack_round_duration)
+
+    def draw_game_over_components(self):
+        result, winner = self.game_over_result
+        if result == 'lost':
+            self.gui.draw_game_over_screen()
+        elif result == 'amazing':
+            self.gui.draw_amazing_screen()
+        else:
+            self.draw_regular_game_components()
+            if result == 'winner':
+                self.gui.draw_winner_message(winner)
+            else:
+                self.gui.draw_well_done_message()
+            self.gui.draw_play_again_button()
+
+    def end_game(self, result, winner=None):
+        if self.stats is not None:
+            scores = self.board.scores if self.num_players == 2 else ()
+            self.stats.record_game(self.MODE_NAMES[self.game_state], self.board.rows, self.board.cols,
+                                   self.board.tries, self.ticks() - self.start_ticks, result, winner, scores)
+        self.game_over_result = (result, winner)
+        self.game_state = GameState.GAME_OVER
+        if self.snapshots is not None and not self.replaying:
+            self.snapshots.discard()
+            self.can_resume = False
+        
+    def attack_mode_logic(self):
+        seconds_left = self.time_attack_round_duration - self.elapsed_time
+        if seconds_left > 0:
             if self.all_matched():
+                self.record_round(cleared=True)
                 if self.time_attack_round_duration == 30:
-                    self.game_state = GameState.GAME_OVER
-                    self.gui.draw_amazing_screen()
+                    self.end_game('amazing')
                 else:    
                     self.time_attack_round_duration -= 5
-                    self.reset_game()     
-        elif self.game_state == GameState.TIME_ATTACK_MODE:
-            self.game_state = GameState.GAME_OVER
-            self.gui.draw_game_over_screen()
+                    self.record(ROUND, self.time_attack_round_duration)
+                    self.reset_game()
+                    self.save_snapshot()     
+        else:
+            self.record_round(cleared=False)
+            self.end_game('lost')
+
+    def record_round(self, cleared):
+        if self.stats is not None:
+            self.stats.record_round(self.board.rows, self.board.cols, self.time_attack_round_duration,
+                                    self.board.tries, self.ticks() - self.start_ticks, cleared)
                          
     def regular_game_logic(self):
-        self.draw_regular_game_components() 
         if self.all_matched():
                 if self.num_players == 2:
-                    winner = 1
-                    if self.player_scores[0] < self.player_scores[1]: winner = 2
-                    self.gui.draw_winner_message(winner)
+                    self.end_game('winner', self.board.winner())
                 else: 
-                    self.gui.draw_well_done_message()    
-                self.game_state = GameState.GAME_OVER
-                self.gui.draw_play_again_button()
+                    self.end_game('well_done')
                                          
     def voice_control_logic(self):
-        self.draw_voice_control_components()
+        if self.hands_free and not self.replaying:
+            # An answer may have come in since the frame started; apply it first so
+            # the next request is made for the board it leaves
+            self.handle_voice_result()
         if self.all_matched():
-            self.game_state = GameState.GAME_OVER
-            self.gui.draw_well_done_message()
-            self.gui.draw_play_again_button()     
+            self.end_game('well_done')
+        elif self.hands_free and not self.replaying and not self.voice_service.listening:
+            # Hands-free: ask for the next card(s) as soon as the last answer is in
+            self.handle_voice_selection()
+
+    def update(self):
+        """Advance timers and game flow by one fixed step. Never draws."""
+        now = self.ticks()
+        self.scheduler.run_due(now)
+
+        if self.game_state not in (GameState.GAME_OVER, GameState.PLAYER_SELECTION, GameState.LEADERBOARD):
+            self.elapsed_time = int((now-self.start_ticks)/1000)
+
+        if self.game_state == GameState.VOICE_CONTROL:
+            self.voice_control_logic()
+        elif self.game_state == GameState.TIME_ATTACK_MODE:
+            self.attack_mode_logic()
+        elif self.game_state in (GameState.SINGLE_PLAYER, GameState.TWO_PLAYERS, GameState.VS_CPU):
+            self.regular_game_logic()
+
+    def draw(self):
+        if self.game_state != self.drawn_state:
+            self.gui.invalidate()
+            self.drawn_state = self.game_state
+        self.animator.update(self.ticks())
+
+        if self.game_state == GameState.VOICE_CONTROL:
+            self.draw_voice_control_components()
+        elif self.game_state == GameState.PLAYER_SELECTION:
+            self.gui.draw_main_menu(self.cpu_level, self.can_resume)
+        elif self.game_state == GameState.TIME_ATTACK_MODE:
+            self.draw_attack_mode_components()
+        elif self.game_state == GameState.GAME_OVER:
+            self.draw_game_over_components()
+        elif self.game_state == GameState.LEADERBOARD:
+            self.draw_leaderboard_components()
+        else:
+            self.draw_regular_game_components()
+        self.gui.present()
+
+    def run_frame(self):
+        """Handle input, run the due fixed-step updates and render one frame."""
+        frame_start = time.perf_counter()
+        self.input_events = 0
+        running = self.handle_events()
+        if self.game_state == GameState.VOICE_CONTROL:
+            self.handle_voice_result()
+
+        now = self.ticks()
+        self.update_accumulator += now - self.last_update_ticks
+        self.last_update_ticks = now
+        self.update_accumulator = min(self.update_accumulator, self.UPDATE_STEP_MS * self.MAX_UPDATE_STEPS)
+        while self.update_accumulator >= self.UPDATE_STEP_MS:
+            self.update()
+            self.update_accumulator -= self.UPDATE_STEP_MS
+
+        self.draw()
+
+        # A click can arrive right after the previous poll, so the worst case
+        # for this frame's input is previous poll -> present.
+        frame_end = time.perf_counter()
+        self.last_present_time = frame_end
+        if self.input_events:
+            self.frame_stats.add_input_latency((frame_end - self.last_poll_time) * 1000)
+        self.last_poll_time = frame_start
+        self.frame_stats.add_frame((frame_end - frame_start) * 1000)
+        self.wait_for_next_frame()
+        return running
+
+    def animating(self):
+        """True while something on screen moves every frame, so the loop must run at full rate."""
+        return self.profiler.enabled or self.replaying or bool(self.animator.active)
+
+    def idle_timeout(self):
+        """Milliseconds until the screen can next change without input: a scheduled
+        callback (CPU move, mismatch flip-back) or the clock reaching its next second."""
+        now = self.ticks()
+        wake = now + self.IDLE_MAX_MS
+        due = self.scheduler.next_due()
+        if due is not None:
+            wake = min(wake, due)
+        if self.game_state in self.TIMED_STATES:
+            wake = min(wake, now + 1000 - (now - self.start_ticks) % 1000)
+        return max(0, wake - now)
+
+    def wake(self):
+        """Interrupt an idle wait from another thread."""
+        try:
+            pygame.event.post(pygame.event.Event(self.VOICE_EVENT))
+        except pygame.error:
+            pass  # already shut down
+
+    def wait_for_next_frame(self):
+        """Cap the frame rate, or when nothing is moving, sleep until input or the next timed change."""
+        if not self.FPS or self.animating():
+            self.clock.tick(self.FPS)
+            return
+        timeout = self.idle_timeout()
+        if timeout > 0:
+            event = pygame.event.wait(timeout)
+            if event.type != pygame.NOEVENT:
+                self.idle_event = event
+            # Whatever ended the wait is handled this frame, so run at least one update step
+            self.update_accumulator = max(self.update_accumulator, self.UPDATE_STEP_MS)
+        self.clock.tick(self.FPS)
     
-    def run(self):
+    def after_first_frame(self):
+        """Report startup time, then do the work that was kept off the path to the first frame."""
+        print(f"first frame after {(self.last_present_time - STARTED) * 1000:.0f} ms "
+              f"(imports {(IMPORTED - STARTED) * 1000:.0f} ms)")
+        self.gui.preload_sounds()
+        self.prepare_animations()
+        if self.warm_up_voice and self.game_state == GameState.PLAYER_SELECTION:
+            self.voice_service.warm_up()
+
+    def run(self, max_frames=None):
         running = True
+        self.last_update_ticks = self.ticks()
+        self.last_poll_time = time.perf_counter()
+        frames = 0
         while running:
-            self.update_cursor()
-            running = self.handle_events()
-           
-            if self.game_state != GameState.GAME_OVER and self.game_state != GameState.PLAYER_SELECTION:
-                self.elapsed_time = int((pygame.time.get_ticks()-self.start_ticks)/1000)
-                
-            if self.game_state == GameState.VOICE_CONTROL:
-                self.voice_control_logic()
-            elif self.game_state == GameState.PLAYER_SELECTION:
-                self.gui.draw_main_menu()
-            elif self.game_state == GameState.TIME_ATTACK_MODE:
-                self.attack_mode_logic()
-            elif self.game_state != GameState.GAME_OVER:
-                self.regular_game_logic() 
-            self.clock.tick(60)
-            
-            pygame.display.flip()
+            running = self.run_frame()
+            frames += 1
+            if frames == 1:
+                self.after_first_frame()
+            if max_frames and frames >= max_frames:
+                break
             
+        self.voice_service.stop()
+        for kind, stats in self.voice_service.latency_report().items():
+            print(f"voice latency ({kind}): {stats['count']} requests, "
+                  f"mean {stats['mean_ms']:.0f} ms, max {stats['max_ms']:.0f} ms")
+        heard = self.voice_service.audio_ms['heard']
+        if heard:
+            print(f"voice audio: decoded {self.voice_service.audio_ms['decoded'] / heard:.0%} "
+                  f"of {heard / 1000:.0f} s heard")
+        frame = self.frame_stats.report()
+        print(f"frame time: p50 {frame['frame']['p50_ms']:.1f} ms, max {frame['frame']['max_ms']:.1f} ms; "
+              f"input latency: max {frame['input_latency']['max_ms']:.1f} ms")
+        if self.profiler.trace_events:
+            print(f"profile trace written to {self.profiler.save_trace()}")
+        if self.stats is not None:
+            self.stats.close()
+        if self.snapshots is not None:
+            self.save_snapshot()
+            self.snapshots.close()
+        if self.recorder is not None:
+            self.recorder.close()
+            print(f"replay log written to {self.recorder.path}")
         pygame.quit()
             
        
 
-game = MemGame()
-game.run()
+def parse_seed(text):
+    seed = int(text, 0)
+    if not 0 <= seed < 2 ** 64:
+        raise argparse.ArgumentTypeError(f"seed must be between 0 and 2**64 - 1, not {text}")
+    return seed
+
+
+def parse_board_side(text):
+    side = int(text)
+    if not 0 < side <= 0xFFFF:
+        # Replay logs and saves keep rows and columns as uint16
+        raise argparse.ArgumentTypeError(f"must be between 1 and 65535, not {text}")
+    return side
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory card game")
+    parser.add_argument('--mode', choices=['menu'] + list(MemGame.MODES), default='menu',
+                        help="skip the menu and start this mode")
+    parser.add_argument('--rows', type=parse_board_side, default=GUI.BOARD_ROWS)
+    parser.add_argument('--cols', type=parse_board_side, default=GUI.BOARD_COLS)
+    parser.add_argument('--size', type=lambda text: tuple(int(n) for n in text.lower().split('x')), metavar='WxH',
+                        help="window size (default: 800x700, larger on big screens)")
+    parser.add_argument('--fullscreen', action='store_true', help="start fullscreen (F11 toggles)")
+    parser.add_argument('--fps', type=int, default=MemGame.FPS, help="frame cap (0 for none)")
+    parser.add_argument('--cpu-level', choices=CpuOpponent.LEVELS, default='hard')
+    parser.add_argument('--headless', action='store_true', help="no window or sound (SDL dummy drivers)")
+    parser.add_argument('--frames', type=int, default=None, help="quit after this many frames")
+    parser.add_argument('--theme', help="folder or .zip of card images")
+    parser.add_argument('--profile', nargs='?', const=Profiler.TRACE_PATH, metavar='TRACE',
+                        help="start with the profiler on (toggle with F3) and write a Chrome trace here")
+    parser.add_argument('--hands-free', action='store_true',
+                        help="voice mode listens all the time instead of on each Speak click (toggle in game)")
+    parser.add_argument('--voice-input', metavar='AUDIO',
+                        help="play a .wav or raw 16 kHz PCM file ('-' for stdin) to voice mode instead of the microphone")
+    parser.add_argument('--voice-server', nargs='?', const='', metavar='SOCKET',
+                        help="decode speech on a running VoiceServer (at its default socket unless given) instead of in the game")
+    parser.add_argument('--seed', type=parse_seed, default=None,
+                        help="board seed (a replay log records the one used)")
+    parser.add_argument('--record', metavar='DIR', default=REPLAY_DIR, help="directory for the replay log of this session")
+    parser.add_argument('--no-record', action='store_true', help="don't write a replay log")
+    parser.add_argument('--stats', metavar='DB', default=STATS_PATH, help="SQLite file for results and leaderboards")
+    parser.add_argument('--no-stats', action='store_true', help="don't save results")
+    parser.add_argument('--save', metavar='FILE', default=Snapshot.DEFAULT_PATH,
+                        help="where the game in progress is saved after every move")
+    parser.add_argument('--no-save', action='store_true', help="don't save the game in progress")
+    parser.add_argument('--resume', action='store_true', help="continue the saved game instead of showing the menu")
+    args = parser.parse_args(argv)
+    if args.rows * args.cols % 2:
+        parser.error(f"a {args.rows}x{args.cols} board has an odd number of cards; make --rows or --cols even")
+
+    if args.headless:
+        # Must be set before pygame opens the display and the mixer
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    game = MemGame(args.rows, args.cols, args.theme, args.seed, args.size, args.fullscreen)
+    if not args.no_stats:
+        game.stats = StatsStore(args.stats)
+    if not args.no_save:
+        game.snapshots = SnapshotStore(args.save)
+        game.can_resume = game.snapshots.exists()
+    if not args.no_record and not args.resume:
+        game.recorder = ReplayRecorder.create(args.record, args.rows, args.cols, game.seed, game.ticks())
+    game.FPS = args.fps
+    game.cpu_level = args.cpu_level
+    game.warm_up_voice = not args.headless
+    game.hands_free = args.hands_free
+    if args.voice_input or args.voice_server is not None:
+        source = (lambda: open_source(args.voice_input, realtime=True)) if args.voice_input else None
+        game.voice_service = VoiceService(open_source=source, server_path=args.voice_server)
+    if args.profile:
+        game.profiler.trace_path = args.profile
+        game.profiler.enable()
+    if args.resume:
+        if not game.resume_game():
+            print("no saved game to resume")
+    elif args.mode != 'menu':
+        game.start_mode(MemGame.MODES[args.mode])
+    game.run(args.frames)
+
+
+if __name__ == "__main__":
+    main()
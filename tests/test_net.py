@@ -0,0 +1,78 @@
+import asyncio
+
+import NetProtocol as proto
+from Engine import Board
+from NetServer import NetServer
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def send(self, kind, *fields):
+        self.writer.write(proto.encode(kind, *fields))
+
+    async def messages_until(self, kind):
+        """(type, fields) of the messages up to and including the next one of this type."""
+        messages = []
+        while not messages or messages[-1][0] != kind:
+            got, payload = await asyncio.wait_for(proto.read_message(self.reader), 5)
+            messages.append((got, payload if got == proto.WELCOME else proto.decode(got, payload)))
+        return messages
+
+
+async def invalid_flip_during_reveal():
+    server = NetServer()
+    listening = await asyncio.start_server(server.handle_client, '127.0.0.1', 0)
+    port = listening.sockets[0].getsockname()[1]
+    clients = []
+    for _ in range(2):
+        client = Client(*await asyncio.open_connection('127.0.0.1', port))
+        client.send(proto.JOIN, 7, 2, 4)
+        await client.messages_until(proto.WELCOME)
+        clients.append(client)
+    room = server.rooms[7]
+    board = room.board
+    pair = [i for i in range(board.size) if board.pairs[i] == board.pairs[0]]
+    others = [i for i in range(board.size) if i not in pair]
+    mismatch = next((a, b) for a in others for b in others if board.pairs[a] != board.pairs[b])
+
+    first = clients[0]
+    for index in pair + list(mismatch):
+        first.send(proto.FLIP, index)
+    for client in clients:
+        await client.messages_until(proto.MISMATCH)
+
+    # Player 2 clicks a matched card while the mismatched pair is still shown
+    clients[1].send(proto.FLIP, pair[0])
+    replies = await clients[1].messages_until(proto.ERROR)
+    assert replies[-1] == (proto.ERROR, (proto.BAD_MOVE,))
+    concealed = [fields for kind, fields in replies if kind == proto.CONCEAL]
+    concealed += [fields for kind, fields in await clients[0].messages_until(proto.CONCEAL)][-1:]
+    flags = list(board.flags)
+    pending_handle = room.conceal_handle
+
+    for client in clients:
+        client.writer.close()
+    listening.close()
+    await listening.wait_closed()
+    return concealed, mismatch, flags, pending_handle
+
+
+def test_invalid_flip_during_mismatch_reveal_conceals_the_pair():
+    concealed, mismatch, flags, pending_handle = asyncio.run(invalid_flip_during_reveal())
+    assert concealed == [mismatch, mismatch]
+    assert flags[mismatch[0]] == flags[mismatch[1]] == 0
+    assert pending_handle is None
+
+
+def test_welcome_and_game_over_carry_large_counts():
+    board = Board(2, 2, 2, seed=1)
+    board.tries = 70000
+    board.scores = [65536, 100000]
+    state = proto.decode_welcome(proto.encode_welcome(1, board, 0, 2)[proto.HEADER.size:])
+    assert state['tries'] == 70000
+    assert state['scores'] == [65536, 100000]
+    message = proto.encode(proto.GAME_OVER, 2, 65536, 100000)
+    assert proto.decode(proto.GAME_OVER, message[proto.HEADER.size:]) == (2, 65536, 100000)
@@ -0,0 +1,50 @@
+import os
+import socket
+import tempfile
+
+import NetProtocol as proto
+import VoiceServer
+
+
+def read_messages(conn, buffer, count):
+    messages = []
+    while len(messages) < count:
+        messages += buffer.feed(conn.recv(65536))
+    return messages
+
+
+def test_remote_listener_keeps_listening_after_an_empty_result():
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'voice.sock')
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    listener = VoiceServer.RemoteListener(20, path)
+    conn, _ = server.accept()
+    conn.settimeout(5)
+    buffer = proto.MessageBuffer()
+    try:
+        listener.listen_for(2)
+        (kind, payload), = read_messages(conn, buffer, 1)
+        first_stream = VoiceServer.START_BODY.unpack(payload)[0]
+
+        # The utterance was noise: the server answers END with no numbers
+        conn.sendall(VoiceServer.encode_result(first_stream, [], 0))
+        assert listener.finish() is None
+        kind, payload = read_messages(conn, buffer, 2)[-1]
+        assert kind == VoiceServer.START
+        stream, max_number, count = VoiceServer.START_BODY.unpack(payload)
+        assert stream != first_stream and (max_number, count) == (20, 2)
+
+        # The next words still reach the server and their numbers come back
+        assert listener.accept(b'\0' * 320) is None
+        kind, payload = read_messages(conn, buffer, 1)[0]
+        assert (kind, payload) == (VoiceServer.AUDIO, b'\0' * 320)
+        conn.sendall(VoiceServer.encode_result(stream, [3, 7], 120))
+        assert listener.finish() == ([3, 7], 120.0)
+    finally:
+        listener.close()
+        conn.close()
+        server.close()
+        os.unlink(path)
+        os.rmdir(directory)
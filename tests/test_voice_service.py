@@ -0,0 +1,50 @@
+import os
+import socket
+import tempfile
+import time
+
+from AudioSource import Buffer
+from VoiceService import VoiceService
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_pause_closes_the_audio_source_until_the_next_start():
+    opened, closed = [], []
+
+    class Source(Buffer):
+        def __init__(self):
+            super().__init__(b'\0' * 32000 * 60, realtime=True)
+            opened.append(self)
+
+        def close(self):
+            closed.append(self)
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'voice.sock')
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    service = VoiceService(open_source=Source, server_path=path)
+    try:
+        service.start()
+        wait_for(lambda: len(opened) == 1)
+        service.pause()
+        wait_for(lambda: len(closed) == 1)
+        time.sleep(0.1)
+        assert len(opened) == 1 and service.error is None
+
+        service.request_numbers()
+        wait_for(lambda: len(opened) == 2)
+        assert service.listening
+    finally:
+        service.stop()
+        server.close()
+        os.unlink(path)
+        os.rmdir(directory)
+    assert len(closed) == 2